@@ -0,0 +1,158 @@
+# backend/benchmarks/fake_openai.py
+# In-process stand-in for the OpenAI client used by service.py, so the pipeline can be
+# benchmarked without network access or API spend.
+#
+#   fake = FakeOpenAI(latency_ms=400, jitter_ms=150, error_rate=0.01, response_chars=600)
+#   install(fake)
+#
+# Responses are real openai response objects with usage filled in (4 characters per token).
+import json
+import random
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import openai
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+CHARS_PER_TOKEN = 4
+
+_ERRORS = {
+    429: openai.RateLimitError,
+    500: openai.InternalServerError,
+    503: openai.InternalServerError,
+}
+
+_WORDS = (
+    "device signal module controller sensor network data layer circuit interface processor memory "
+    "wireless battery display user input output channel frame packet antenna housing surface"
+).split()
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class FakeCompletions:
+    def __init__(self, owner: "FakeOpenAI"):
+        self._owner = owner
+
+    def create(self, model: str, messages: List[Dict[str, str]], response_format: Optional[Dict[str, str]] = None,
+               stream: bool = False, max_tokens: Optional[int] = None, **kwargs) -> Any:
+        return self._owner._complete(model, messages, response_format, stream, max_tokens)
+
+
+class FakeOpenAI:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 response_chars: int = 400, error_status: int = 429, seed: Optional[int] = None):
+        if error_status not in _ERRORS:
+            raise ValueError(f"error_status must be one of {sorted(_ERRORS)}")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.response_chars = response_chars
+        self.error_status = error_status
+        self.chat = SimpleNamespace(completions=FakeCompletions(self))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _text(self, length: int) -> str:
+        words = []
+        size = 0
+        with self._lock:
+            while size < length:
+                word = self._random.choice(_WORDS)
+                words.append(word)
+                size += len(word) + 1
+        return " ".join(words)[:length]
+
+    def _content(self, response_format: Optional[Dict[str, str]], max_tokens: Optional[int]) -> str:
+        length = self.response_chars
+        if max_tokens:
+            length = min(length, max_tokens * CHARS_PER_TOKEN)
+        if response_format and response_format.get("type") == "json_object":
+            return json.dumps({
+                "relevant_claims": [{"num": "00001", "text": self._text(80)}],
+                "likelihood": self._random.choice(["High", "Moderate", "Low"]),
+                "specific_features": [self._text(30) for _ in range(3)],
+                "explanation": self._text(max(1, length - 200)),
+            })
+        return self._text(length)
+
+    def _complete(self, model: str, messages: List[Dict[str, str]], response_format: Optional[Dict[str, str]],
+                  stream: bool, max_tokens: Optional[int]) -> Any:
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+            self.stats["calls"] += 1
+        time.sleep(delay)
+
+        if failed:
+            with self._lock:
+                self.stats["errors"] += 1
+            request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+            response = httpx.Response(self.error_status, request=request)
+            raise _ERRORS[self.error_status](f"Simulated error {self.error_status}", response=response, body=None)
+
+        content = self._content(response_format, max_tokens)
+        usage = CompletionUsage(
+            prompt_tokens=sum(_tokens(message["content"]) for message in messages),
+            completion_tokens=_tokens(content),
+            total_tokens=0,
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+        with self._lock:
+            self.stats["prompt_tokens"] += usage.prompt_tokens
+            self.stats["completion_tokens"] += usage.completion_tokens
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if stream:
+            return self._stream(completion_id, model, content, usage)
+        return ChatCompletion(
+            id=completion_id,
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            usage=usage,
+        )
+
+    def _stream(self, completion_id: str, model: str, content: str, usage: CompletionUsage) -> Iterator[ChatCompletionChunk]:
+        created = int(time.time())
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield ChatCompletionChunk(
+                id=completion_id,
+                object="chat.completion.chunk",
+                created=created,
+                model=model,
+                choices=[{
+                    "index": 0,
+                    "finish_reason": "stop" if last else None,
+                    "delta": {"content": word if last else word + " "},
+                }],
+                usage=usage if last else None,
+            )
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+
+# Swap the module-level client in service.py for the fake, returns the client it replaced
+def install(fake: FakeOpenAI) -> Any:
+    import service
+
+    previous = service.client
+    service.client = fake
+    return previous
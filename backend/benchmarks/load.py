@@ -0,0 +1,596 @@
+# backend/benchmarks/load.py
+# Load test every endpoint in main.py against a synthetic corpus, with the OpenAI client
+# replaced by benchmarks.fake_openai so results do not depend on the network or API spend.
+#
+#   python -m benchmarks.load --patents 10000 --companies 1000 --concurrency 16 \
+#       --requests 200 --latency-ms 400 --jitter-ms 150 --output bench.json
+#
+# The corpus is generated into its own SQLite database (--database) and reused by later runs
+# with the same corpus options. --database-url runs against another database instead, e.g. a local
+# Postgres; --database then only names the file that remembers the corpus options. Requests go through the ASGI app in-process, so the numbers
+# cover the application and the database but not uvicorn or the network.
+#
+# The JSON output has, per scenario, p50/p95/p99 latency, requests per second, status codes,
+# and the DB time, query count and process CPU time per operation; and per pipeline stage
+# (summarize, rank, analyze, ...) the wall, thread CPU and DB time per call.
+import argparse
+import contextvars
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_DATABASE = "benchmark.db"
+CORPUS_BATCH_SIZE = 2000
+POLL_INTERVAL = 0.01
+# Analyses seeded as already saved, read by the saved_report scenario
+SEEDED_SAVED_REPORTS = 100
+
+# Accumulators the current request and pipeline stages charge their DB time to
+_timers: contextvars.ContextVar = contextvars.ContextVar("benchmark_timers", default=())
+
+
+class _Timer:
+    __slots__ = ("db_seconds", "queries")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.queries = 0
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _summary_ms(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": percentile(values, 0.50) * 1000,
+        "p95": percentile(values, 0.95) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "mean": statistics.mean(values) * 1000 if values else 0.0,
+        "max": max(values) * 1000 if values else 0.0,
+    }
+
+
+# --- Synthetic corpus -------------------------------------------------------------------
+
+def _vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+
+class _TextGenerator:
+    # Zipf-like word frequencies, so term statistics look like natural text
+    def __init__(self, rng: random.Random):
+        self._rng = rng
+        self._words = _vocabulary(rng)
+        self._weights = [1 / rank for rank in range(1, len(self._words) + 1)]
+
+    def words(self, n: int, capitalized: float = 0.1) -> str:
+        words = self._rng.choices(self._words, self._weights, k=n)
+        return " ".join(word.title() if self._rng.random() < capitalized else word for word in words)
+
+
+def corpus_options(args) -> Dict[str, int]:
+    return {
+        "patents": args.patents,
+        "claims_per_patent": args.claims_per_patent,
+        "companies": args.companies,
+        "products_per_company": args.products_per_company,
+        "seed": args.seed,
+    }
+
+
+def build_corpus(options: Dict[str, int]) -> Dict[str, float]:
+    from sqlalchemy import insert
+
+    from fulltext import refresh_patents
+    from models import Claim, Company, Patent, Product, engine
+    from ranking import count_key_phrases, query_terms
+
+    rng = random.Random(options["seed"])
+    text = _TextGenerator(rng)
+    started = time.perf_counter()
+
+    for start in range(0, options["patents"], CORPUS_BATCH_SIZE):
+        patent_rows, claim_rows = [], []
+        for i in range(start, min(start + CORPUS_BATCH_SIZE, options["patents"])):
+            patent_id = str(uuid.uuid4())
+            claims = [text.words(rng.randint(20, 60)) for _ in range(options["claims_per_patent"])]
+            patent_rows.append({
+                "id": patent_id,
+                "publication_number": f"US-{10000000 + i}-B2",
+                "title": text.words(8, capitalized=0.5),
+                "abstract": text.words(120),
+                "description": text.words(400),
+                "assignee": text.words(2, capitalized=1.0),
+                "key_phrases": count_key_phrases(claims),
+                "claim_terms": query_terms(claims),
+            })
+            claim_rows.extend(
+                {"id": str(uuid.uuid4()), "patent_id": patent_id, "text": claim, "num": f"{num:05d}"}
+                for num, claim in enumerate(claims, start=1)
+            )
+        with engine.begin() as conn:
+            conn.execute(insert(Patent.__table__), patent_rows)
+            if claim_rows:
+                conn.execute(insert(Claim.__table__), claim_rows)
+            refresh_patents(conn, [row["id"] for row in patent_rows])
+
+    for start in range(0, options["companies"], CORPUS_BATCH_SIZE):
+        company_rows, product_rows = [], []
+        for i in range(start, min(start + CORPUS_BATCH_SIZE, options["companies"])):
+            company_id = str(uuid.uuid4())
+            company_rows.append({"id": company_id, "name": f"{text.words(2, capitalized=1.0)} {i} Inc."})
+            product_rows.extend(
+                {
+                    "id": str(uuid.uuid4()),
+                    "company_id": company_id,
+                    "name": text.words(3, capitalized=1.0),
+                    "description": text.words(rng.randint(40, 120)),
+                }
+                for _ in range(options["products_per_company"])
+            )
+        with engine.begin() as conn:
+            conn.execute(insert(Company.__table__), company_rows)
+            if product_rows:
+                conn.execute(insert(Product.__table__), product_rows)
+
+    return {"build_seconds": time.perf_counter() - started}
+
+
+# Analyses and saved reports for the report endpoints, written straight to the database
+def seed_reports(db, publication_numbers: List[str], company_ids: List[str], count: int, rng: random.Random) -> List[str]:
+    from models import InfringementAnalysis, InfringingProduct
+
+    analysis_ids = []
+    for _ in range(count):
+        analysis = InfringementAnalysis(
+            id=str(uuid.uuid4()),
+            patent_id=rng.choice(publication_numbers),
+            company_id=rng.choice(company_ids),
+            analysis_date=datetime.now(timezone.utc).date(),
+            overall_risk_assessment="Seeded risk assessment",
+        )
+        analysis.top_infringing_products = [
+            InfringingProduct(
+                product_name=f"Seeded product {i}",
+                infringement_likelihood="Moderate",
+                relevant_claims=[{"num": "00001", "text": "Seeded claim"}],
+                explanation="Seeded explanation",
+                specific_features=["seeded feature"],
+            )
+            for i in range(2)
+        ]
+        db.add(analysis)
+        analysis_ids.append(analysis.id)
+    db.commit()
+    return analysis_ids
+
+
+# --- Instrumentation --------------------------------------------------------------------
+
+def _instrument_engine(engine) -> None:
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("benchmark_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["benchmark_started"].pop()
+        for timer in _timers.get():
+            timer.db_seconds += elapsed
+            timer.queries += 1
+
+
+class StageRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[tuple]] = defaultdict(list)
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        @wraps(func)
+        def timed(*args, **kwargs):
+            timer = _Timer()
+            token = _timers.set(_timers.get() + (timer,))
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+                _timers.reset(token)
+                with self._lock:
+                    self.samples[stage].append((wall, cpu, timer.db_seconds, timer.queries))
+        return timed
+
+    def install(self) -> None:
+        import main
+        import service
+        from search_index import company_index, patent_index
+
+        for stage, owner, name in (
+            ("resolve_company", service, "search_company_by_name"),
+            ("resolve_company", main, "search_company_by_name"),
+            ("company_index", company_index, "search"),
+            ("patent_index", patent_index, "search"),
+            ("summarize", service, "summarize_text"),
+            ("rank_products", service, "score_products"),
+            ("analyze_product", service, "get_detailed_infringement_analysis"),
+            ("risk_assessment", service, "generate_overall_risk_assessment"),
+            ("load_report", service, "get_infringement_report"),
+            ("save_report", main, "save_infringement_report"),
+            ("list_saved_reports", main, "list_saved_reports"),
+            ("list_patents", main, "list_patents"),
+            ("list_companies", main, "list_companies"),
+        ):
+            setattr(owner, name, self.wrap(stage, getattr(owner, name)))
+
+    def results(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+        return {
+            stage: {
+                "calls": len(values),
+                "wall_ms": _summary_ms([wall for wall, _, _, _ in values]),
+                "cpu_ms_per_call": statistics.mean(cpu for _, cpu, _, _ in values) * 1000,
+                "db_ms_per_call": statistics.mean(db for _, _, db, _ in values) * 1000,
+                "queries_per_call": statistics.mean(queries for _, _, _, queries in values),
+            }
+            for stage, values in sorted(samples.items())
+        }
+
+
+# ASGI wrapper that charges DB time to the scenario named in the X-Benchmark-Scenario header.
+# Sync endpoints and streaming bodies run in the threadpool with a copy of this context.
+class RequestRecorder:
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self.totals: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        scenario = dict(scope["headers"]).get(b"x-benchmark-scenario", b"").decode()
+        timer = _Timer()
+        token = _timers.set(_timers.get() + (timer,))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _timers.reset(token)
+            with self._lock:
+                self.totals[scenario][0] += timer.db_seconds
+                self.totals[scenario][1] += timer.queries
+
+
+# --- Scenarios --------------------------------------------------------------------------
+
+class Workload:
+    def __init__(self, client, publication_numbers: List[str], company_names: List[str], analysis_ids: List[str],
+                 saved_report_ids: List[str], top_n: int):
+        self.client = client
+        self.publication_numbers = publication_numbers
+        self.company_names = company_names
+        self.analysis_ids = analysis_ids
+        self.saved_report_ids = saved_report_ids
+        self.top_n = top_n
+        self._unsaved = list(analysis_ids)
+        self._lock = threading.Lock()
+
+    def _typo(self, rng: random.Random, value: str) -> str:
+        i = rng.randrange(len(value))
+        return value[:i] + rng.choice(string.ascii_uppercase + string.digits) + value[i + 1:]
+
+    def _poll(self, headers, analysis_id: str):
+        while True:
+            response = self.client.get(f"/infringement-report/{analysis_id}", headers=headers)
+            if response.status_code != 200 or response.json()["status"] in ("done", "failed", "cancelled"):
+                return response
+            time.sleep(POLL_INTERVAL)
+
+    def scenarios(self) -> Dict[str, Callable]:
+        client = self.client
+
+        def list_patents(rng, headers):
+            return client.get("/patents/", params={"limit": 100}, headers=headers)
+
+        def stream_patents(rng, headers):
+            return client.get("/patents/", params={"format": "ndjson", "limit": 1000, "include_claims": False},
+                              headers=headers)
+
+        def list_companies(rng, headers):
+            return client.get("/companies/", params={"limit": 100}, headers=headers)
+
+        def stream_companies(rng, headers):
+            return client.get("/companies/", params={"format": "ndjson", "limit": 1000}, headers=headers)
+
+        def search_patent(rng, headers):
+            return client.get("/patents/search", params={"publication_number": rng.choice(self.publication_numbers)},
+                              headers=headers)
+
+        def search_patent_fuzzy(rng, headers):
+            query = self._typo(rng, rng.choice(self.publication_numbers))
+            return client.get("/patents/search", params={"publication_number": query, "limit": 10}, headers=headers)
+
+        def search_company(rng, headers):
+            return client.get("/companies/search", params={"name": self._typo(rng, rng.choice(self.company_names))},
+                              headers=headers)
+
+        def infringement(rng, headers):
+            return client.post("/patent-infringement", headers=headers, params={
+                "patent_id": rng.choice(self.publication_numbers),
+                "company_name": rng.choice(self.company_names),
+                "top_n": self.top_n,
+            })
+
+        # Submit a background analysis and poll the report until the job finishes
+        def infringement_async(rng, headers):
+            response = client.post("/patent-infringement", headers=headers, params={
+                "patent_id": rng.choice(self.publication_numbers),
+                "company_name": rng.choice(self.company_names),
+                "top_n": self.top_n,
+                "async_mode": True,
+            })
+            if response.status_code != 202:
+                return response
+            return self._poll(headers, response.json()["analysis_id"])
+
+        def cancel(rng, headers):
+            response = client.post("/patent-infringement", headers=headers, params={
+                "patent_id": rng.choice(self.publication_numbers),
+                "company_name": rng.choice(self.company_names),
+                "top_n": self.top_n,
+                "async_mode": True,
+            })
+            if response.status_code != 202:
+                return response
+            return client.delete(f"/patent-infringement/{response.json()['analysis_id']}", headers=headers)
+
+        def batch(rng, headers):
+            return client.post("/patent-infringement/batch", headers=headers, json={
+                "publication_numbers": rng.sample(self.publication_numbers, 2),
+                "company_names": rng.sample(self.company_names, 2),
+                "top_n": self.top_n,
+            })
+
+        def report(rng, headers):
+            return client.get(f"/infringement-report/{rng.choice(self.analysis_ids)}", headers=headers)
+
+        def report_not_modified(rng, headers):
+            analysis_id = rng.choice(self.analysis_ids)
+            etag = client.get(f"/infringement-report/{analysis_id}", headers=headers).headers.get("etag", "")
+            return client.get(f"/infringement-report/{analysis_id}", headers={**headers, "If-None-Match": etag})
+
+        def save_report(rng, headers):
+            with self._lock:
+                analysis_id = self._unsaved.pop() if self._unsaved else rng.choice(self.analysis_ids)
+            return client.post("/save-report", params={"analysis_id": analysis_id}, headers=headers)
+
+        def saved_reports(rng, headers):
+            return client.get("/saved-reports", headers=headers)
+
+        def saved_report(rng, headers):
+            return client.get(f"/saved-reports/{rng.choice(self.saved_report_ids)}", headers=headers)
+
+        return {
+            "list_patents": list_patents,
+            "stream_patents": stream_patents,
+            "list_companies": list_companies,
+            "stream_companies": stream_companies,
+            "search_patent": search_patent,
+            "search_patent_fuzzy": search_patent_fuzzy,
+            "search_company": search_company,
+            "infringement": infringement,
+            "infringement_async": infringement_async,
+            "cancel": cancel,
+            "batch": batch,
+            "report": report,
+            "report_not_modified": report_not_modified,
+            "save_report": save_report,
+            "saved_reports": saved_reports,
+            "saved_report": saved_report,
+        }
+
+
+def run_scenario(name: str, operation: Callable, requests: int, concurrency: int, seed: int,
+                 recorder: RequestRecorder, fake) -> Dict[str, Any]:
+    headers = {"X-Benchmark-Scenario": name}
+    latencies: List[float] = []
+    statuses = Counter()
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(worker_id: int):
+        rng = random.Random(f"{seed}-{name}-{worker_id}")
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                status = operation(rng, headers).status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] += 1
+
+    llm_before = fake.snapshot()
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu_seconds = time.process_time() - cpu_before
+    llm_after = fake.snapshot()
+
+    db_seconds, queries = recorder.totals[name]
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_codes": dict(sorted(statuses.items())),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": _summary_ms(latencies),
+        "db_ms_per_request": db_seconds / len(latencies) * 1000 if latencies else 0.0,
+        "queries_per_request": queries / len(latencies) if latencies else 0.0,
+        # Process-wide, so it includes the load generator and any background jobs
+        "cpu_ms_per_request": cpu_seconds / len(latencies) * 1000 if latencies else 0.0,
+        "llm": {key: llm_after[key] - llm_before[key] for key in llm_after},
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    import main
+    from benchmarks.fake_openai import FakeOpenAI, install
+    from models import Company, Patent, SavedReport, SessionLocal, engine
+
+    options = corpus_options(args)
+    corpus_file = args.database + ".corpus.json"
+    corpus = {"options": options}
+    if os.path.exists(corpus_file):
+        with open(corpus_file, encoding="utf-8") as f:
+            reusable = json.load(f).get("options") == options
+    else:
+        reusable = False
+    if not reusable:
+        db = SessionLocal()
+        empty = db.query(Patent).first() is None and db.query(Company).first() is None
+        db.close()
+        if not empty:
+            raise SystemExit(f"{args.database} holds a different corpus, remove it or pass another --database")
+        corpus.update(build_corpus(options))
+        with open(corpus_file, "w", encoding="utf-8") as f:
+            json.dump(corpus, f, indent=2)
+
+    rng = random.Random(args.seed)
+    db = SessionLocal()
+    publication_numbers = [number for number, in db.query(Patent.publication_number)]
+    companies = db.query(Company.id, Company.name).all()
+    analysis_ids = seed_reports(db, publication_numbers, [company_id for company_id, _ in companies],
+                                args.requests + SEEDED_SAVED_REPORTS, rng)
+    saved_report_ids = []
+    for analysis_id in analysis_ids[:SEEDED_SAVED_REPORTS]:
+        saved_report = SavedReport(id=str(uuid.uuid4()), analysis_id=analysis_id,
+                                   report_date=datetime.now(timezone.utc).date())
+        db.add(saved_report)
+        saved_report_ids.append(saved_report.id)
+    db.commit()
+    db.close()
+
+    fake = FakeOpenAI(args.latency_ms, args.jitter_ms, args.error_rate, args.response_chars, args.error_status,
+                      seed=args.seed)
+    install(fake)
+    _instrument_engine(engine)
+    stages = StageRecorder()
+    stages.install()
+    recorder = RequestRecorder(main.app)
+
+    results: Dict[str, Any] = {}
+    with TestClient(recorder, raise_server_exceptions=False) as client:
+        workload = Workload(client, publication_numbers, [name for _, name in companies],
+                            analysis_ids[SEEDED_SAVED_REPORTS:], saved_report_ids, args.top_n)
+        scenarios = workload.scenarios()
+        selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+        unknown = [name for name in selected if name not in scenarios]
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}. Known: {', '.join(scenarios)}")
+        for name in selected:
+            results[name] = run_scenario(name, scenarios[name], args.requests, args.concurrency, args.seed,
+                                         recorder, fake)
+            print(f"{name}: {results[name]['requests_per_second']:.1f} req/s, "
+                  f"p95 {results[name]['latency_ms']['p95']:.1f} ms, {results[name]['errors']} errors")
+
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "top_n": args.top_n,
+            "fake_openai": {
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate,
+                "error_status": args.error_status,
+                "response_chars": args.response_chars,
+            },
+        },
+        "corpus": corpus,
+        "scenarios": results,
+        "stages": stages.results(),
+        "llm": fake.snapshot(),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the API against a synthetic corpus and a fake OpenAI client.")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="SQLite file holding the synthetic corpus")
+    parser.add_argument("--database-url", help="SQLAlchemy URL of an empty database to use instead of --database")
+    parser.add_argument("--patents", type=int, default=10000, help="Patents in the synthetic corpus")
+    parser.add_argument("--claims-per-patent", type=int, default=5, help="Claims per synthetic patent")
+    parser.add_argument("--companies", type=int, default=1000, help="Companies in the synthetic corpus")
+    parser.add_argument("--products-per-company", type=int, default=10, help="Products per synthetic company")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the corpus and the request mix")
+    parser.add_argument("--scenarios", help="Comma-separated scenarios to run, default all")
+    parser.add_argument("--requests", type=int, default=100, help="Operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients per scenario")
+    parser.add_argument("--top-n", type=int, default=2, help="top_n passed to the infringement endpoints")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Mean fake OpenAI latency")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="Uniform jitter added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake OpenAI calls that fail")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of failed fake calls")
+    parser.add_argument("--response-chars", type=int, default=400, help="Length of fake completions")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # models.py builds its engine from the environment at import time
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.abspath(args.database)}"
+    # The benchmark corpus is synthetic, keep the startup sync from replacing it with the JSON sources
+    os.environ["SYNC_ON_STARTUP"] = "false"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    # The fake has no account limits, export OPENAI_RPM / OPENAI_TPM to benchmark under real ones
+    os.environ.setdefault("OPENAI_RPM", "1000000")
+    os.environ.setdefault("OPENAI_TPM", "1000000000")
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
@@ -0,0 +1,130 @@
+# backend/benchmarks/ranking.py
+# Compare the fuzzy and BM25 product ranking backends on speed and ranking quality.
+#
+#   python -m benchmarks.ranking --patents 50 --scale 10 --top-k 5 --output ranking.json
+#
+# There are no relevance labels, so quality is measured against a proxy: the word overlap
+# between a product and the patent's title and abstract, which neither backend looks at.
+import argparse
+import json
+import math
+import statistics
+import time
+from collections import defaultdict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Base, Company, Patent, Product, SessionLocal
+from ranking import ProductRanker, STOPWORDS, query_terms, tokenize
+from service import fuzzy_score_products, patent_phrases
+
+
+def _proxy_relevance(patent, product) -> float:
+    patent_terms = set(query_terms([patent.title or "", patent.abstract or ""]))
+    product_terms = {term for term in tokenize(f"{product.name} {product.description}") if term not in STOPWORDS}
+    if not patent_terms or not product_terms:
+        return 0.0
+    return len(patent_terms & product_terms) / len(product_terms)
+
+
+def _ndcg(ranked_ids, relevance, k):
+    dcg = sum(relevance[pid] / math.log2(i + 2) for i, pid in enumerate(ranked_ids[:k]))
+    ideal = sorted(relevance.values(), reverse=True)[:k]
+    idcg = sum(rel / math.log2(i + 2) for i, rel in enumerate(ideal))
+    return dcg / idcg if idcg else None
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+# Copy the products into an in-memory database, `scale` copies of each
+def _scaled_products_session(products, scale):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    company_ids = {product.company_id for product in products}
+    session.add_all(Company(id=company_id, name=company_id) for company_id in company_ids)
+    session.add_all(
+        Product(id=f"{product.id}-{copy}", company_id=product.company_id,
+                name=f"{product.name} #{copy}", description=product.description)
+        for product in products for copy in range(scale)
+    )
+    session.commit()
+    return session
+
+
+def run(patent_limit: int, scale: int, top_k: int):
+    db = SessionLocal()
+    patents = db.query(Patent).options(selectinload(Patent.claims)).order_by(Patent.publication_number).limit(patent_limit).all()
+    products = db.query(Product).all()
+    product_db = _scaled_products_session(products, scale) if scale > 1 else db
+    products_by_company = defaultdict(list)
+    for product in product_db.query(Product).all():
+        products_by_company[product.company_id].append(product)
+
+    ranker = ProductRanker()
+    started = time.perf_counter()
+    ranker.score(product_db, [], {})
+    build_seconds = time.perf_counter() - started
+
+    timings = {"fuzzy": [], "bm25": []}
+    ndcg = {"fuzzy": [], "bm25": []}
+    overlap = []
+    for patent in patents:
+        key_phrases, terms = patent_phrases(patent, [claim.text for claim in patent.claims])
+        for company_products in products_by_company.values():
+            started = time.perf_counter()
+            fuzzy_scores = [score for _, score in fuzzy_score_products(key_phrases, company_products)]
+            timings["fuzzy"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            bm25_scores = ranker.score(product_db, [product.id for product in company_products], terms)
+            timings["bm25"].append(time.perf_counter() - started)
+
+            relevance = {product.id: _proxy_relevance(patent, product) for product in company_products}
+            rankings = {}
+            for backend, scores in (("fuzzy", fuzzy_scores), ("bm25", bm25_scores)):
+                order = sorted(range(len(company_products)), key=lambda i: scores[i], reverse=True)
+                rankings[backend] = [company_products[i].id for i in order]
+                value = _ndcg(rankings[backend], relevance, top_k)
+                if value is not None:
+                    ndcg[backend].append(value)
+            overlap.append(len(set(rankings["fuzzy"][:top_k]) & set(rankings["bm25"][:top_k])) / top_k)
+
+    return {
+        "patents": len(patents),
+        "products": sum(len(items) for items in products_by_company.values()),
+        "companies": len(products_by_company),
+        "top_k": top_k,
+        "bm25_build_seconds": build_seconds,
+        "backends": {
+            backend: {
+                "queries": len(timings[backend]),
+                "total_seconds": sum(timings[backend]),
+                "mean_ms": statistics.mean(timings[backend]) * 1000 if timings[backend] else 0.0,
+                "p95_ms": _percentile(timings[backend], 0.95) * 1000,
+                "ndcg_at_k": statistics.mean(ndcg[backend]) if ndcg[backend] else None,
+            }
+            for backend in timings
+        },
+        "top_k_overlap": statistics.mean(overlap) if overlap else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fuzzy and BM25 product rankers.")
+    parser.add_argument("--patents", type=int, default=50, help="Number of patents used as queries")
+    parser.add_argument("--scale", type=int, default=1, help="Copies of each product to rank")
+    parser.add_argument("--top-k", type=int, default=5, help="Cut-off for NDCG and overlap")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.patents, args.scale, args.top_k)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,126 @@
+# backend/benchmarks/startup.py
+# Cold start of main:app: how long `import main` takes, and how long after launching uvicorn the
+# server answers /healthz, /readyz ("accepting") and /readyz?warm=true ("warm").
+#
+#   python -m benchmarks.startup --runs 5 --output startup.json
+#
+# Every run is a fresh process, once with the default startup and once with LAZY_STARTUP=true.
+# The database is DATABASE_URL (or the app's default); pass --skip-sync to leave out the data sync,
+# e.g. when the database was loaded by benchmarks.load.
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from benchmarks.load import _git_revision
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POLL_INTERVAL = 0.01
+IMPORT_SCRIPT = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status(url: str) -> Optional[int]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def measure_import(env: Dict[str, str]) -> float:
+    result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+# Seconds from spawning uvicorn until each endpoint first answers 200
+def measure_ready(env: Dict[str, str], timeout: float) -> Dict[str, Optional[float]]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    pending = {"healthz": f"{base}/healthz", "accepting": f"{base}/readyz", "warm": f"{base}/readyz?warm=true"}
+    times: Dict[str, Optional[float]] = {name: None for name in pending}
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while pending and time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            for name, url in list(pending.items()):
+                if _status(url) == 200:
+                    times[name] = time.perf_counter() - started
+                    del pending[name]
+                else:
+                    break  # the later endpoints cannot be ready before this one
+            time.sleep(POLL_INTERVAL)
+    finally:
+        server.terminate()
+        server.wait()
+    return times
+
+
+def _summary(values: List[Optional[float]]) -> Dict[str, Optional[float]]:
+    done = [value for value in values if value is not None]
+    if not done:
+        return {"median": None, "min": None, "max": None, "timeouts": len(values)}
+    return {"median": statistics.median(done), "min": min(done), "max": max(done), "timeouts": len(values) - len(done)}
+
+
+def run(args) -> Dict[str, Any]:
+    modes = {}
+    for mode, lazy in (("default", "false"), ("lazy", "true")):
+        env = dict(os.environ, LAZY_STARTUP=lazy)
+        if args.skip_sync:
+            env["SYNC_ON_STARTUP"] = "false"
+        samples: Dict[str, List[Optional[float]]] = {"import": [], "healthz": [], "accepting": [], "warm": []}
+        for _ in range(args.runs):
+            samples["import"].append(measure_import(env))
+            for name, seconds in measure_ready(env, args.timeout).items():
+                samples[name].append(seconds)
+        modes[mode] = {name: _summary(values) for name, values in samples.items()}
+        print(f"{mode}: " + ", ".join(
+            f"{name} {summary['median']:.3f}s" if summary["median"] is not None else f"{name} timed out"
+            for name, summary in modes[mode].items()
+        ))
+
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {"runs": args.runs, "skip_sync": args.skip_sync},
+        "seconds": modes,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import and ready latency of main:app.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per startup mode")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for a server to be warm")
+    parser.add_argument("--skip-sync", action="store_true", help="Start with SYNC_ON_STARTUP=false")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
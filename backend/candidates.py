@@ -0,0 +1,318 @@
+# backend/app/candidates.py
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, func, insert
+from sqlalchemy.orm import Session
+
+import metrics
+from models import CandidateSource, Claim, Company, Patent, PatentCandidate, Product, SessionLocal, engine
+from ranking import product_ranker, query_terms
+
+# Candidates stored per patent. Checks can use them as long as the company has enough products
+# among them (see precomputed_top_products), so this should be well above ANALYSIS_TOP_N.
+# Changing it needs a --full run.
+CANDIDATES_TOP_K = int(os.getenv("CANDIDATES_TOP_K", "100"))
+# Patents scored per sparse matrix product
+DEFAULT_BLOCK_SIZE = 512
+WRITE_BATCH_SIZE = 500
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def product_fingerprint(description: Optional[str]) -> str:
+    return hashlib.sha256((description or "").encode("utf-8")).hexdigest()
+
+
+# Patents are fingerprinted by the ingest source hash, which covers their claims
+def _patent_fingerprints(db: Session) -> Dict[str, str]:
+    return dict(db.query(Patent.id, func.coalesce(Patent.source_hash, Patent.id)))
+
+
+# Product weights shared with the worker processes, set once per process by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(weights_t: sparse.csr_matrix, top_k: int) -> None:
+    _worker["weights_t"] = weights_t
+    _worker["top_k"] = top_k
+
+
+# Top-k (column, score) pairs of each query row against every product column
+def _score_block(queries: sparse.csr_matrix) -> List[List[Tuple[int, float]]]:
+    scores = (queries @ _worker["weights_t"]).tocsr()
+    top_k = _worker["top_k"]
+    results = []
+    for i in range(scores.shape[0]):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        columns, values = scores.indices[start:end], scores.data[start:end]
+        if len(values) > top_k:
+            keep = np.argpartition(-values, top_k - 1)[:top_k]
+            columns, values = columns[keep], values[keep]
+        order = np.lexsort((columns, -values))
+        results.append([(int(columns[j]), float(values[j])) for j in order if values[j] > 0])
+    return results
+
+
+# BM25 query rows (term weight * idf) for the given patents, built from their stored claim terms
+def _query_rows(db: Session, patent_ids: List[str], vocabulary: Dict[str, int], idf: np.ndarray) -> sparse.csr_matrix:
+    terms_by_patent = dict(db.query(Patent.id, Patent.claim_terms).filter(Patent.id.in_(patent_ids)))
+    missing = [patent_id for patent_id in patent_ids if terms_by_patent.get(patent_id) is None]
+    if missing:
+        claims: Dict[str, List[str]] = {patent_id: [] for patent_id in missing}
+        for patent_id, text in db.query(Claim.patent_id, Claim.text).filter(Claim.patent_id.in_(missing)):
+            claims[patent_id].append(text)
+        terms_by_patent.update({patent_id: query_terms(texts) for patent_id, texts in claims.items()})
+
+    indptr, indices, data = [0], [], []
+    for patent_id in patent_ids:
+        known = [(vocabulary[term], weight) for term, weight in (terms_by_patent.get(patent_id) or {}).items() if term in vocabulary]
+        indices.extend(term_id for term_id, _ in known)
+        data.extend(weight * idf[term_id] for term_id, weight in known)
+        indptr.append(len(indices))
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(patent_ids), len(idf)))
+
+
+class _Scorer:
+    def __init__(self, weights: sparse.csr_matrix, top_k: int, workers: int):
+        weights_t = weights.T.tocsr()
+        self._executor = None
+        if workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(weights_t, top_k))
+        else:
+            _init_worker(weights_t, top_k)
+
+    def map(self, blocks: List[sparse.csr_matrix]) -> Iterator[List[List[Tuple[int, float]]]]:
+        if self._executor is not None:
+            return self._executor.map(_score_block, blocks)
+        return map(_score_block, blocks)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+# Score the given patents in blocks and yield (patent id, [(product index, score), ...])
+def _score_patents(db: Session, scorer: _Scorer, patent_ids: List[str], vocabulary: Dict[str, int],
+                   idf: np.ndarray, block_size: int) -> Iterator[Tuple[str, List[Tuple[int, float]]]]:
+    # Build a few blocks ahead, so the pool always has work while the results are written
+    for group in _batched(_batched(patent_ids, block_size), 4 * max(1, os.cpu_count() or 1)):
+        blocks = [_query_rows(db, block, vocabulary, idf) for block in group]
+        for block, results in zip(group, scorer.map(blocks)):
+            yield from zip(block, results)
+
+
+# Score the given patents against every product and replace their stored rows
+def _rescore(db: Session, scorer: _Scorer, patent_ids: List[str], vocabulary: Dict[str, int], idf: np.ndarray,
+             block_size: int, product_ids: List[str], company_of: Dict[str, str]) -> None:
+    rows_by_patent: Dict[str, List[Tuple[str, str, float]]] = {}
+    for patent_id, results in _score_patents(db, scorer, patent_ids, vocabulary, idf, block_size):
+        rows_by_patent[patent_id] = [
+            (product_ids[column], company_of[product_ids[column]], score) for column, score in results
+        ]
+        if len(rows_by_patent) >= WRITE_BATCH_SIZE:
+            with engine.begin() as conn:
+                _write_rows(conn, rows_by_patent)
+            rows_by_patent = {}
+    with engine.begin() as conn:
+        _write_rows(conn, rows_by_patent)
+
+
+def _write_rows(conn, rows_by_patent: Dict[str, List[Tuple[str, str, float]]]) -> None:
+    patent_ids = list(rows_by_patent)
+    for chunk in _batched(patent_ids, WRITE_BATCH_SIZE):
+        conn.execute(delete(PatentCandidate).where(PatentCandidate.patent_id.in_(chunk)))
+    rows = [
+        {"patent_id": patent_id, "rank": rank, "product_id": product_id, "company_id": company_id, "score": score}
+        for patent_id, candidates in rows_by_patent.items()
+        for rank, (product_id, company_id, score) in enumerate(candidates, start=1)
+    ]
+    for chunk in _batched(rows, WRITE_BATCH_SIZE):
+        conn.execute(insert(PatentCandidate.__table__), chunk)
+
+
+def _set_fingerprints(conn, kind: str, fingerprints: Dict[str, str], removed: Set[str]) -> None:
+    for chunk in _batched(list(fingerprints) + list(removed), WRITE_BATCH_SIZE):
+        conn.execute(delete(CandidateSource).where(CandidateSource.kind == kind, CandidateSource.id.in_(chunk)))
+    rows = [{"kind": kind, "id": key, "fingerprint": fingerprint} for key, fingerprint in fingerprints.items()]
+    for chunk in _batched(rows, WRITE_BATCH_SIZE):
+        conn.execute(insert(CandidateSource.__table__), chunk)
+
+
+# Bring patent_candidates up to date. Only patents and products whose fingerprint changed since the
+# last run are scored: a new or changed patent recomputes its own row against every product, a new
+# or changed product is scored against every patent and the rows it makes the top k of are
+# recomputed. Patents whose stored candidates include a changed or removed product are recomputed
+# too. A row is always written from one scoring pass, never merged with scores computed under other
+# corpus statistics (idf, average length); untouched rows keep those of the run that wrote them.
+# full=True recomputes everything.
+def refresh_candidates(top_k: int = CANDIDATES_TOP_K, workers: int = 1, block_size: int = DEFAULT_BLOCK_SIZE,
+                       full: bool = False) -> Dict[str, int]:
+    db = SessionLocal()
+    scorer = None
+    try:
+        if full:
+            with engine.begin() as conn:
+                conn.execute(delete(PatentCandidate))
+                conn.execute(delete(CandidateSource))
+
+        products = db.query(Product.id, Product.company_id, Product.description).all()
+        product_fingerprints = {product.id: product_fingerprint(product.description) for product in products}
+        company_of = {product.id: product.company_id for product in products}
+        patent_fingerprints = _patent_fingerprints(db)
+        stored: Dict[str, Dict[str, str]] = {"patent": {}, "product": {}}
+        for kind, key, fingerprint in db.query(CandidateSource.kind, CandidateSource.id, CandidateSource.fingerprint):
+            stored[kind][key] = fingerprint
+
+        changed_products = {key for key, fp in product_fingerprints.items() if stored["product"].get(key) != fp}
+        removed_products = set(stored["product"]) - set(product_fingerprints)
+        rescore = {key for key, fp in patent_fingerprints.items() if stored["patent"].get(key) != fp}
+        removed_patents = set(stored["patent"]) - set(patent_fingerprints)
+        # A row that holds a product which changed or went away can't be patched, the product
+        # that would take its place is unknown
+        for chunk in _batched((changed_products & set(stored["product"])) | removed_products, WRITE_BATCH_SIZE):
+            rescore.update(
+                patent_id for patent_id, in db.query(PatentCandidate.patent_id)
+                .filter(PatentCandidate.product_id.in_(chunk)).distinct()
+                if patent_id in patent_fingerprints
+            )
+        stats = {"patents scored": len(rescore), "products scored": 0, "patents updated": 0,
+                 "patents removed": len(removed_patents)}
+
+        if (rescore or changed_products) and products:
+            weights, idf, product_ids, vocabulary = product_ranker.weight_matrix(db)
+            scorer = _Scorer(weights, top_k, workers)
+
+            _rescore(db, scorer, sorted(rescore), vocabulary, idf, block_size, product_ids, company_of)
+
+            # Score the new and changed products against every other patent
+            column_products = sorted(changed_products)
+            if column_products:
+                stats["products scored"] = len(column_products)
+                row_of = {product_id: row for row, product_id in enumerate(product_ids)}
+                columns = [row_of[product_id] for product_id in column_products]
+                scorer.close()
+                scorer = _Scorer(weights[columns], top_k, workers)
+                others = sorted(set(patent_fingerprints) - rescore)
+                scored = [
+                    (patent_id, results)
+                    for patent_id, results in _score_patents(db, scorer, others, vocabulary, idf, block_size)
+                    if results
+                ]
+                updated = []
+                for chunk in _batched(scored, WRITE_BATCH_SIZE):
+                    last: Dict[str, Tuple[int, float]] = {}
+                    for patent_id, rank, score in (
+                        db.query(PatentCandidate.patent_id, PatentCandidate.rank, PatentCandidate.score)
+                        .filter(PatentCandidate.patent_id.in_([patent_id for patent_id, _ in chunk]))
+                    ):
+                        if rank > last.get(patent_id, (0, 0.0))[0]:
+                            last[patent_id] = (rank, score)
+                    # Only rows the new scores get into need to be rewritten
+                    updated.extend(
+                        patent_id for patent_id, results in chunk
+                        if last.get(patent_id, (0, 0.0))[0] < top_k or any(score > last[patent_id][1] for _, score in results)
+                    )
+                scorer.close()
+                scorer = _Scorer(weights, top_k, workers)
+                _rescore(db, scorer, updated, vocabulary, idf, block_size, product_ids, company_of)
+                stats["patents updated"] = len(updated)
+
+        with engine.begin() as conn:
+            for chunk in _batched(list(removed_patents), WRITE_BATCH_SIZE):
+                conn.execute(delete(PatentCandidate).where(PatentCandidate.patent_id.in_(chunk)))
+            _set_fingerprints(conn, "patent", {key: patent_fingerprints[key] for key in rescore}, removed_patents)
+            _set_fingerprints(conn, "product", {key: product_fingerprints[key] for key in changed_products},
+                              removed_products)
+        return stats
+    finally:
+        if scorer is not None:
+            scorer.close()
+        db.close()
+
+
+candidate_stats = {"hits": 0, "misses": 0}
+metrics.register_cache("candidates", lambda: (candidate_stats["hits"], candidate_stats["misses"]))
+
+
+# Stored candidates of a patent, best first, with product and company names
+def get_candidates(db: Session, patent: Patent, company_id: Optional[str] = None,
+                   limit: int = CANDIDATES_TOP_K) -> List[Dict[str, Any]]:
+    query = (
+        db.query(PatentCandidate, Product.name, Company.name)
+        .join(Product, Product.id == PatentCandidate.product_id)
+        .join(Company, Company.id == PatentCandidate.company_id)
+        .filter(PatentCandidate.patent_id == patent.id)
+    )
+    if company_id is not None:
+        query = query.filter(PatentCandidate.company_id == company_id)
+    return [
+        {
+            "rank": candidate.rank,
+            "product_id": candidate.product_id,
+            "product_name": product_name,
+            "company_id": candidate.company_id,
+            "company_name": company_name,
+            "score": candidate.score,
+        }
+        for candidate, product_name, company_name in query.order_by(PatentCandidate.rank).limit(limit)
+    ]
+
+
+# The company's top_n products for the patent from the precomputed candidates, in the same order
+# rank_products would give, or None when they can't be trusted: the patent or one of the company's
+# products changed since the last run, or the company has too few products among the candidates.
+def precomputed_top_products(db: Session, patent: Patent, products: List[Product],
+                             top_n: int) -> Optional[List[Tuple[Product, float]]]:
+    with metrics.stage("load_candidates"):
+        keys = [patent.id] + [product.id for product in products]
+        fingerprints = {
+            (kind, key): fingerprint for kind, key, fingerprint in db.query(
+                CandidateSource.kind, CandidateSource.id, CandidateSource.fingerprint
+            ).filter(CandidateSource.id.in_(keys))
+        }
+        fresh = fingerprints.get(("patent", patent.id)) == (patent.source_hash or patent.id) and all(
+            fingerprints.get(("product", product.id)) == product_fingerprint(product.description) for product in products
+        )
+        result = None
+        if fresh:
+            by_id = {product.id: product for product in products}
+            rows = db.query(PatentCandidate.product_id, PatentCandidate.score).filter(
+                PatentCandidate.patent_id == patent.id
+            ).order_by(PatentCandidate.rank).all()
+            ranked = [(by_id[product_id], score) for product_id, score in rows if product_id in by_id]
+            wanted = min(top_n, len(products))
+            if len(ranked) >= wanted:
+                result = ranked[:top_n]
+            elif len(rows) < CANDIDATES_TOP_K:
+                # Every product with a score above 0 is stored, the rest of the company's products score 0
+                listed = {product.id for product, _ in ranked}
+                result = (ranked + [(product, 0.0) for product in products if product.id not in listed])[:top_n]
+    candidate_stats["hits" if result is not None else "misses"] += 1
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the top BM25 candidate products of every patent.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to score patent blocks")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="Patents per matrix product")
+    parser.add_argument("--full", action="store_true", help="Recompute every patent instead of only what changed")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = refresh_candidates(CANDIDATES_TOP_K, args.workers, args.block_size, args.full)
+    print(", ".join(f"{n} {name}" for name, n in stats.items()) + f" in {time.perf_counter() - started:.2f}s")
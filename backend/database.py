@@ -1,8 +1,12 @@
 # backend/app/database.py
 from sqlalchemy.orm import Session
+
+import invalidation
 from models import SessionLocal
 
 def get_db():
+    # Cached indexes answer without touching the database, so look for other processes' writes first
+    invalidation.check()
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,283 @@
+# backend/app/export.py
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import date
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Company, InfringementAnalysis, InfringingProduct, SavedReport, SessionLocal
+
+# Rows fetched from the server-side cursor at a time, and analyses per Parquet row group
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# One CSV row per infringing product, analyses without products get a single row with empty product columns
+CSV_COLUMNS = [
+    "analysis_id", "patent_id", "company_name", "analysis_date", "overall_risk_assessment",
+    "saved_report_id", "report_date", "product_name", "infringement_likelihood", "relevant_claims",
+    "explanation", "specific_features",
+]
+
+
+class ExportFilters:
+    def __init__(self, since: Optional[date] = None, until: Optional[date] = None, company_id: Optional[str] = None,
+                 patent_id: Optional[str] = None, saved_only: bool = False):
+        self.since = since
+        self.until = until
+        self.company_id = company_id
+        self.patent_id = patent_id
+        self.saved_only = saved_only
+
+
+# Analyses joined with their company, saved report and infringing products, ordered by analysis
+# so the rows of one analysis come off the cursor together
+def _export_statement(filters: ExportFilters):
+    stmt = (
+        select(
+            InfringementAnalysis.id.label("analysis_id"),
+            InfringementAnalysis.patent_id,
+            Company.name.label("company_name"),
+            InfringementAnalysis.analysis_date,
+            InfringementAnalysis.overall_risk_assessment,
+            SavedReport.id.label("saved_report_id"),
+            SavedReport.report_date,
+            InfringingProduct.product_name,
+            InfringingProduct.infringement_likelihood,
+            InfringingProduct.relevant_claims,
+            InfringingProduct.explanation,
+            InfringingProduct.specific_features,
+        )
+        .select_from(InfringementAnalysis)
+        .join(Company, Company.id == InfringementAnalysis.company_id)
+        .outerjoin(InfringingProduct, InfringingProduct.analysis_id == InfringementAnalysis.id)
+    )
+    if filters.saved_only:
+        stmt = stmt.join(SavedReport, SavedReport.analysis_id == InfringementAnalysis.id)
+    else:
+        stmt = stmt.outerjoin(SavedReport, SavedReport.analysis_id == InfringementAnalysis.id)
+    if filters.since is not None:
+        stmt = stmt.where(InfringementAnalysis.analysis_date >= filters.since)
+    if filters.until is not None:
+        stmt = stmt.where(InfringementAnalysis.analysis_date <= filters.until)
+    if filters.company_id is not None:
+        stmt = stmt.where(InfringementAnalysis.company_id == filters.company_id)
+    if filters.patent_id is not None:
+        stmt = stmt.where(InfringementAnalysis.patent_id == filters.patent_id)
+    # Analyses still running have no risk assessment yet
+    stmt = stmt.where(InfringementAnalysis.overall_risk_assessment != "")
+    return stmt.order_by(InfringementAnalysis.id)
+
+
+def _product(row) -> Dict[str, Any]:
+    return {
+        "product_name": row.product_name,
+        "infringement_likelihood": row.infringement_likelihood,
+        # Claim numbers only, as in the report. Older rows store them as integers, every format
+        # takes them as text.
+        "relevant_claims": [str(claim["num"]) for claim in row.relevant_claims or []],
+        "explanation": row.explanation,
+        "specific_features": [str(feature) for feature in row.specific_features or []],
+    }
+
+
+# Exported analyses, one dict at a time, in the shape of GET /infringement-report/{analysis_id}
+# plus the saved report if there is one. stream_results asks the driver for a server-side cursor
+# (a named cursor on Postgres), so only EXPORT_CHUNK_SIZE rows are held in memory at any time.
+def iter_analyses(db: Session, filters: ExportFilters) -> Iterator[Dict[str, Any]]:
+    rows = db.execute(
+        _export_statement(filters).execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE)
+    )
+    for analysis_id, group in groupby(rows, key=lambda row: row.analysis_id):
+        first = next(group)
+        products = [_product(row) for row in (first, *group) if row.product_name is not None]
+        yield {
+            "analysis_id": analysis_id,
+            "patent_id": first.patent_id,
+            "company_name": first.company_name,
+            "analysis_date": first.analysis_date.isoformat() if first.analysis_date else None,
+            "overall_risk_assessment": first.overall_risk_assessment,
+            "top_infringing_products": products,
+            "saved_report": {
+                "id": first.saved_report_id,
+                "report_date": first.report_date.isoformat() if first.report_date else None,
+            } if first.saved_report_id is not None else None,
+        }
+
+
+def _csv_rows(analysis: Dict[str, Any]) -> Iterator[List[Any]]:
+    saved = analysis["saved_report"] or {}
+    head = [
+        analysis["analysis_id"], analysis["patent_id"], analysis["company_name"], analysis["analysis_date"],
+        analysis["overall_risk_assessment"], saved.get("id"), saved.get("report_date"),
+    ]
+    for product in analysis["top_infringing_products"] or [None]:
+        if product is None:
+            yield head + [None] * 5
+            continue
+        yield head + [
+            product["product_name"],
+            product["infringement_likelihood"],
+            "; ".join(product["relevant_claims"] or []),
+            product["explanation"],
+            "; ".join(product["specific_features"] or []),
+        ]
+
+
+def _ndjson(analyses: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for analysis in analyses:
+        yield (json.dumps(analysis) + "\n").encode("utf-8")
+
+
+def _csv(analyses: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for analysis in analyses:
+        for row in _csv_rows(analysis):
+            writer.writerow(row)
+        # Hand over what has been written so far instead of building the whole file
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Write-only file handed to the Parquet writer, its bytes are taken out after every row group
+class _Sink(io.RawIOBase):
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+# Parquet is written one row group per EXPORT_CHUNK_SIZE analyses, with the products as a nested
+# list column. pyarrow is optional, it is only needed for this format.
+def _parquet(analyses: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    product = pa.struct([
+        ("product_name", pa.string()),
+        ("infringement_likelihood", pa.string()),
+        ("relevant_claims", pa.list_(pa.string())),
+        ("explanation", pa.string()),
+        ("specific_features", pa.list_(pa.string())),
+    ])
+    schema = pa.schema([
+        ("analysis_id", pa.string()),
+        ("patent_id", pa.string()),
+        ("company_name", pa.string()),
+        ("analysis_date", pa.string()),
+        ("overall_risk_assessment", pa.string()),
+        ("top_infringing_products", pa.list_(product)),
+        ("saved_report", pa.struct([("id", pa.string()), ("report_date", pa.string())])),
+    ])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema)
+    batch: List[Dict[str, Any]] = []
+    for analysis in analyses:
+        batch.append(analysis)
+        if len(batch) >= EXPORT_CHUNK_SIZE:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            batch.clear()
+            yield sink.drain()
+    if batch:
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+
+_WRITERS = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}
+
+
+# The export as a stream of bytes. The generator owns its session because it outlives the
+# request-scoped one.
+def stream_export(export_format: str, filters: ExportFilters) -> Iterator[bytes]:
+    if export_format not in _WRITERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    if export_format == "parquet" and not parquet_available():
+        raise ValueError("Parquet export needs pyarrow (pip install -r requirements-parquet.txt), or use ndjson or csv")
+    return _stream(_WRITERS[export_format], filters)
+
+
+def _stream(write, filters: ExportFilters) -> Iterator[bytes]:
+    db = SessionLocal()
+    try:
+        for chunk in write(iter_analyses(db, filters)):
+            if chunk:
+                yield chunk
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export infringement analyses with their products and saved reports.")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", "-o", help="File to write, standard output if omitted")
+    parser.add_argument("--since", type=date.fromisoformat, help="First analysis date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last analysis date (YYYY-MM-DD)")
+    parser.add_argument("--company", help="Company name, fuzzy matched like in the API")
+    parser.add_argument("--patent", help="Patent publication number")
+    parser.add_argument("--saved-only", action="store_true", help="Only analyses that were saved as reports")
+    args = parser.parse_args()
+
+    company_id = None
+    if args.company is not None:
+        from service import search_company_by_name
+
+        db = SessionLocal()
+        try:
+            company_id = search_company_by_name(args.company, db).id
+        except ValueError as e:
+            sys.exit(str(e))
+        finally:
+            db.close()
+
+    filters = ExportFilters(args.since, args.until, company_id, args.patent, args.saved_only)
+    try:
+        chunks = stream_export(args.format, filters)
+    except ValueError as e:
+        sys.exit(str(e))
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
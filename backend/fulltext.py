@@ -0,0 +1,160 @@
+# backend/app/fulltext.py
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+# BM25 column weights: a hit in the title counts most, one in the claims least
+TITLE_WEIGHT = 10.0
+ABSTRACT_WEIGHT = 5.0
+CLAIMS_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+
+# One row per patent (rowid = patents.rowid) with its title, abstract and all claim texts.
+# Triggers keep it in sync with writes to patents. Claims have no triggers: a claim trigger has to
+# concatenate all of its patent's claims, which makes writing a patent's claims quadratic. Whoever
+# writes claims refreshes their patents once instead, see refresh_patents.
+FTS_TABLE_DDL = """
+CREATE VIRTUAL TABLE patents_fts USING fts5(title, abstract, claims, tokenize = 'porter unicode61')
+"""
+
+_REFRESH_PATENT = """
+    DELETE FROM patents_fts WHERE rowid = (SELECT rowid FROM patents WHERE id = {patent_id});
+    INSERT INTO patents_fts (rowid, title, abstract, claims)
+    SELECT rowid, title, abstract, (SELECT group_concat(text, char(10)) FROM claims WHERE patent_id = {patent_id})
+    FROM patents WHERE id = {patent_id};
+"""
+
+FTS_TRIGGERS = {
+    "patents_fts_insert": f"""
+        CREATE TRIGGER patents_fts_insert AFTER INSERT ON patents BEGIN
+        {_REFRESH_PATENT.format(patent_id="NEW.id")}
+        END
+    """,
+    "patents_fts_update": f"""
+        CREATE TRIGGER patents_fts_update AFTER UPDATE OF title, abstract ON patents BEGIN
+        {_REFRESH_PATENT.format(patent_id="NEW.id")}
+        END
+    """,
+    "patents_fts_delete": """
+        CREATE TRIGGER patents_fts_delete AFTER DELETE ON patents BEGIN
+            DELETE FROM patents_fts WHERE rowid = OLD.rowid;
+        END
+    """,
+}
+
+# Triggers of earlier versions, dropped from existing databases
+OBSOLETE_TRIGGERS = ["claims_fts_insert", "claims_fts_update", "claims_fts_delete"]
+
+_REFRESH_PATENTS = [
+    text("DELETE FROM patents_fts WHERE rowid IN (SELECT rowid FROM patents WHERE id IN :patent_ids)")
+    .bindparams(bindparam("patent_ids", expanding=True)),
+    text("""
+        INSERT INTO patents_fts (rowid, title, abstract, claims)
+        SELECT patents.rowid, patents.title, patents.abstract, group_concat(claims.text, char(10))
+        FROM patents LEFT JOIN claims ON claims.patent_id = patents.id
+        WHERE patents.id IN :patent_ids
+        GROUP BY patents.rowid
+    """).bindparams(bindparam("patent_ids", expanding=True)),
+]
+
+
+# Create the full-text table and its triggers where missing. A newly created table is filled
+# from the existing rows in one statement, later patent writes are picked up by the triggers.
+def create_fulltext_index(engine: Engine) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        existing = {
+            row.name for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"))
+        }
+        if "patents_fts" not in existing:
+            conn.execute(text(FTS_TABLE_DDL))
+            conn.execute(text("""
+                INSERT INTO patents_fts (rowid, title, abstract, claims)
+                SELECT patents.rowid, patents.title, patents.abstract, group_concat(claims.text, char(10))
+                FROM patents LEFT JOIN claims ON claims.patent_id = patents.id
+                GROUP BY patents.rowid
+            """))
+        for name, ddl in FTS_TRIGGERS.items():
+            if name not in existing:
+                conn.execute(text(ddl))
+        for name in OBSOLETE_TRIGGERS:
+            if name in existing:
+                conn.execute(text(f"DROP TRIGGER {name}"))
+
+
+# Rebuild the full-text rows of the given patents from their current title, abstract and claims,
+# one statement for all of them. Call it after writing claims, in the same transaction.
+def refresh_patents(conn: Connection, patent_ids: List[str]) -> None:
+    if conn.dialect.name != "sqlite" or not patent_ids:
+        return
+    for statement in _REFRESH_PATENTS:
+        conn.execute(statement, {"patent_ids": list(patent_ids)})
+
+
+# Claims written through the ORM are refreshed once per flush. The table is matched by name,
+# models imports this module (through migrations).
+@event.listens_for(Session, "after_flush")
+def _refresh_flushed_claims(session: Session, flush_context) -> None:
+    patent_ids = {
+        obj.patent_id for obj in (*session.new, *session.dirty, *session.deleted)
+        if getattr(obj, "__tablename__", None) == "claims" and obj.patent_id is not None
+    }
+    if patent_ids:
+        refresh_patents(session.connection(), sorted(patent_ids))
+
+
+# Free text becomes a conjunction of quoted terms, so user input can never be an FTS5 syntax error.
+# A trailing * on a term is kept as a prefix match.
+def fts_query(query: str) -> str:
+    terms = []
+    for term in re.findall(r"[\w*]+", query):
+        prefix = term.endswith("*")
+        term = term.strip("*")
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+# BM25-ranked page of patents matching the query, optionally limited to assignees containing any
+# of the given names. The match runs on the FTS index, patents rows are only read for the hits.
+def search_fulltext(db: Session, query: str, assignees: Optional[List[str]] = None, limit: int = 20,
+                    offset: int = 0) -> List[Dict[str, Any]]:
+    match = fts_query(query)
+    if not match:
+        return []
+    params: Dict[str, Any] = {"match": match, "limit": limit, "offset": offset}
+    assignee_filter = ""
+    if assignees:
+        clauses = []
+        for i, assignee in enumerate(assignees):
+            clauses.append(f"patents.assignee LIKE :assignee_{i} ESCAPE '\\'")
+            escaped = assignee.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params[f"assignee_{i}"] = f"%{escaped}%"
+        assignee_filter = "AND (" + " OR ".join(clauses) + ")"
+
+    rows = db.execute(text(f"""
+        SELECT patents.id, patents.publication_number, patents.title, patents.assignee,
+               bm25(patents_fts, {TITLE_WEIGHT}, {ABSTRACT_WEIGHT}, {CLAIMS_WEIGHT}) AS rank,
+               snippet(patents_fts, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM patents_fts
+        JOIN patents ON patents.rowid = patents_fts.rowid
+        WHERE patents_fts MATCH :match {assignee_filter}
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """), params)
+    return [
+        {
+            "id": row.id,
+            "publication_number": row.publication_number,
+            "title": row.title,
+            "assignee": row.assignee,
+            # bm25() is lower for better matches, flip it so higher scores rank first
+            "score": -row.rank,
+            "snippet": row.snippet,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,394 @@
+# backend/app/ingest.py
+import argparse
+import hashlib
+import json
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from os import path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+import invalidation
+from fulltext import refresh_patents
+from models import Claim, Company, Patent, Product, engine
+from ranking import count_key_phrases, query_terms
+
+BASE_DIR = path.dirname(path.abspath(__file__))
+PATENTS_PATH = path.join(BASE_DIR, 'json', 'patents.json')
+PRODUCTS_PATH = path.join(BASE_DIR, 'json', 'company_products.json')
+
+DEFAULT_BATCH_SIZE = 500
+READ_CHUNK_SIZE = 1 << 16
+
+
+# Stream the items of a JSON array without loading the whole file.
+# If `key` is given, the array is the value of that key in the top-level object.
+def iter_json_array(file_path: str, key: Optional[str] = None) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    marker = '[' if key is None else json.dumps(key)
+
+    with open(file_path, encoding="utf-8") as f:
+        buf = f.read(READ_CHUNK_SIZE)
+        eof = not buf
+
+        # Find the opening bracket of the array we want to stream
+        while True:
+            start = buf.find(marker)
+            if start != -1 and key is not None:
+                start = buf.find('[', start + len(marker))
+            if start != -1:
+                pos = start + 1
+                break
+            if eof:
+                raise ValueError(f"No JSON array found in {file_path}")
+            more = f.read(READ_CHUNK_SIZE)
+            eof = not more
+            buf += more
+
+        while True:
+            # Skip whitespace and separators between items
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                end = None
+
+            # An item ending exactly at the buffer boundary may be truncated, so read more first. So may
+            # a number followed by anything but a separator: "-0." decodes as -0 until its digits arrive.
+            if end is None or ((end == len(buf) or buf[end] not in ' \t\r\n,]') and not eof):
+                if eof:
+                    raise ValueError(f"Truncated JSON array in {file_path}")
+                more = f.read(READ_CHUNK_SIZE)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            yield item
+            pos = end
+            if pos > READ_CHUNK_SIZE:
+                buf = buf[pos:]
+                pos = 0
+
+
+def _batched(iterable, size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_claims(claims_json: str) -> List[Dict[str, Any]]:
+    return json.loads(claims_json) if claims_json else []
+
+
+# Parse a patent's claims and count its key phrases and claim terms (runs in the worker pool)
+def prepare_claims(claims_json: str) -> Tuple[List[Dict[str, Any]], Dict[str, int], Dict[str, int]]:
+    claims = parse_claims(claims_json)
+    claims_text = [claim['text'] for claim in claims]
+    return claims, count_key_phrases(claims_text), query_terms(claims_text)
+
+
+# Fingerprints of the source fields that end up in the database. A record whose fingerprint matches
+# the stored source_hash is skipped, so reloading a source only writes what changed in it.
+PATENT_SOURCE_FIELDS = ("publication_number", "title", "description", "abstract", "assignee", "claims")
+
+
+def _fingerprint(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def patent_source_hash(patent: Dict[str, Any]) -> str:
+    return _fingerprint([patent.get(field) for field in PATENT_SOURCE_FIELDS])
+
+
+def company_source_hash(company: Dict[str, Any]) -> str:
+    return _fingerprint([company['name'], [[product['name'], product['description']] for product in company['products']]])
+
+
+# Delete rows by id in chunks, keeping each IN list well below SQLite's variable limit
+def _delete_ids(conn, column, ids: List[str], batch_size: int) -> None:
+    for chunk in _batched(ids, batch_size):
+        conn.execute(delete(column.table).where(column.in_(chunk)))
+
+
+# Upsert patents keyed by publication number. Only new or changed records are parsed and written
+# (a changed patent keeps its id and has its claims replaced); with prune=True, patents that are
+# no longer in the source are removed once the whole file has been read.
+def ingest_patents(file_path: str = PATENTS_PATH, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1,
+                   prune: bool = True) -> Dict[str, int]:
+    stats = {"new patents": 0, "changed patents": 0, "unchanged patents": 0, "removed patents": 0, "claims written": 0}
+    seen = set()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for batch in _batched(iter_json_array(file_path), batch_size):
+            # A publication number repeated in the source is loaded from its last occurrence
+            records = {patent['publication_number']: patent for patent in batch}
+            seen.update(records)
+            hashes = {number: patent_source_hash(patent) for number, patent in records.items()}
+            with engine.connect() as conn:
+                existing = {
+                    row.publication_number: row for row in conn.execute(
+                        select(Patent.id, Patent.publication_number, Patent.source_hash)
+                        .where(Patent.publication_number.in_(list(records)))
+                    )
+                }
+            changed = [
+                patent for number, patent in records.items()
+                if number not in existing or existing[number].source_hash != hashes[number]
+            ]
+            stats["unchanged patents"] += len(records) - len(changed)
+            if not changed:
+                continue
+
+            claims_json = [patent['claims'] for patent in changed]
+            if executor:
+                prepared = list(executor.map(prepare_claims, claims_json, chunksize=max(1, len(changed) // workers)))
+            else:
+                prepared = [prepare_claims(claims) for claims in claims_json]
+
+            new_rows = []
+            updated_rows = []
+            claim_rows = []
+            for patent, (claims, key_phrases, claim_terms) in zip(changed, prepared):
+                row = existing.get(patent['publication_number'])
+                patent_id = row.id if row is not None else str(uuid.uuid4())
+                values = {
+                    "title": patent['title'],
+                    "description": patent['description'],
+                    "abstract": patent['abstract'],
+                    "assignee": patent['assignee'],
+                    "key_phrases": key_phrases,
+                    "claim_terms": claim_terms,
+                    "source_hash": hashes[patent['publication_number']],
+                }
+                if row is None:
+                    new_rows.append({"id": patent_id, "publication_number": patent['publication_number'], **values})
+                else:
+                    updated_rows.append({"patent_id": patent_id, **values})
+                claim_rows.extend(
+                    {"id": str(uuid.uuid4()), "patent_id": patent_id, "text": claim['text'], "num": claim['num']}
+                    for claim in claims
+                )
+
+            # One transaction per chunk, executemany for each table
+            with engine.begin() as conn:
+                if new_rows:
+                    conn.execute(insert(Patent.__table__), new_rows)
+                if updated_rows:
+                    conn.execute(update(Patent).where(Patent.id == bindparam("patent_id")), updated_rows)
+                    _delete_ids(conn, Claim.patent_id, [row["patent_id"] for row in updated_rows], batch_size)
+                if claim_rows:
+                    conn.execute(insert(Claim.__table__), claim_rows)
+                refresh_patents(conn, [row["id"] for row in new_rows] + [row["patent_id"] for row in updated_rows])
+
+            stats["new patents"] += len(new_rows)
+            stats["changed patents"] += len(updated_rows)
+            stats["claims written"] += len(claim_rows)
+
+        if prune:
+            with engine.begin() as conn:
+                removed = [
+                    row.id for row in conn.execute(select(Patent.id, Patent.publication_number))
+                    if row.publication_number not in seen
+                ]
+                _delete_ids(conn, Claim.patent_id, removed, batch_size)
+                _delete_ids(conn, Patent.id, removed, batch_size)
+            stats["removed patents"] = len(removed)
+    finally:
+        if executor:
+            executor.shutdown()
+        if stats["new patents"] or stats["changed patents"] or stats["removed patents"]:
+            invalidation.publish(Patent)
+
+    return stats
+
+
+# Upsert companies keyed by name, and their products keyed by name within the company.
+# Products of a changed company are diffed so unchanged products keep their ids (and their
+# place in the ranking index); with prune=True, companies no longer in the source are removed.
+def ingest_companies(file_path: str = PRODUCTS_PATH, batch_size: int = DEFAULT_BATCH_SIZE,
+                     prune: bool = True) -> Dict[str, int]:
+    stats = {"new companies": 0, "changed companies": 0, "unchanged companies": 0, "removed companies": 0,
+             "products written": 0, "products removed": 0}
+    seen = set()
+    changed_products: List[str] = []
+    try:
+        for batch in _batched(iter_json_array(file_path, key='companies'), batch_size):
+            records = {company['name']: company for company in batch}
+            seen.update(records)
+            hashes = {name: company_source_hash(company) for name, company in records.items()}
+            with engine.connect() as conn:
+                existing = {
+                    row.name: row for row in conn.execute(
+                        select(Company.id, Company.name, Company.source_hash).where(Company.name.in_(list(records)))
+                    )
+                }
+                changed_ids = [
+                    existing[name].id for name in records
+                    if name in existing and existing[name].source_hash != hashes[name]
+                ]
+                stored_products: Dict[str, Dict[str, Any]] = {company_id: {} for company_id in changed_ids}
+                for chunk in _batched(changed_ids, batch_size):
+                    for row in conn.execute(
+                        select(Product.id, Product.company_id, Product.name, Product.description)
+                        .where(Product.company_id.in_(chunk))
+                    ):
+                        stored_products[row.company_id][row.name] = row
+
+            company_rows = []
+            hash_rows = []
+            product_rows = []
+            product_updates = []
+            removed_products = []
+            for name, company in records.items():
+                row = existing.get(name)
+                if row is not None and row.source_hash == hashes[name]:
+                    stats["unchanged companies"] += 1
+                    continue
+                if row is None:
+                    company_id = str(uuid.uuid4())
+                    company_rows.append({"id": company_id, "name": name, "source_hash": hashes[name]})
+                    stored: Dict[str, Any] = {}
+                else:
+                    company_id = row.id
+                    hash_rows.append({"company_id": company_id, "source_hash": hashes[name]})
+                    stored = stored_products[company_id]
+
+                products = {product['name']: product for product in company['products']}
+                for product_name, product in products.items():
+                    current = stored.get(product_name)
+                    if current is None:
+                        product_rows.append({
+                            "id": str(uuid.uuid4()),
+                            "company_id": company_id,
+                            "name": product_name,
+                            "description": product['description'],
+                        })
+                    elif current.description != product['description']:
+                        product_updates.append({"product_id": current.id, "description": product['description']})
+                removed_products.extend(
+                    current.id for product_name, current in stored.items() if product_name not in products
+                )
+
+            with engine.begin() as conn:
+                if company_rows:
+                    conn.execute(insert(Company.__table__), company_rows)
+                if hash_rows:
+                    conn.execute(update(Company).where(Company.id == bindparam("company_id")), hash_rows)
+                if product_rows:
+                    conn.execute(insert(Product.__table__), product_rows)
+                if product_updates:
+                    conn.execute(update(Product).where(Product.id == bindparam("product_id")), product_updates)
+                _delete_ids(conn, Product.id, removed_products, batch_size)
+
+            changed_products.extend(row["id"] for row in product_rows)
+            changed_products.extend(row["product_id"] for row in product_updates)
+            changed_products.extend(removed_products)
+            stats["new companies"] += len(company_rows)
+            stats["changed companies"] += len(hash_rows)
+            stats["products written"] += len(product_rows) + len(product_updates)
+            stats["products removed"] += len(removed_products)
+
+        if prune:
+            with engine.begin() as conn:
+                removed = [row.id for row in conn.execute(select(Company.id, Company.name)) if row.name not in seen]
+                removed_products = []
+                for chunk in _batched(removed, batch_size):
+                    removed_products.extend(
+                        product_id for product_id, in conn.execute(select(Product.id).where(Product.company_id.in_(chunk)))
+                    )
+                _delete_ids(conn, Product.id, removed_products, batch_size)
+                _delete_ids(conn, Company.id, removed, batch_size)
+            changed_products.extend(removed_products)
+            stats["removed companies"] = len(removed)
+            stats["products removed"] += len(removed_products)
+    finally:
+        if stats["new companies"] or stats["changed companies"] or stats["removed companies"]:
+            invalidation.publish(Company)
+        if changed_products:
+            invalidation.publish(Product, ids=changed_products)
+
+    return stats
+
+
+# Fill in key phrases and claim terms for patents ingested before they were stored
+def backfill_key_phrases(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    updated = 0
+    while True:
+        with engine.begin() as conn:
+            patent_ids = [
+                row.id for row in conn.execute(
+                    select(Patent.id).where(Patent.key_phrases.is_(None) | Patent.claim_terms.is_(None)).limit(batch_size)
+                )
+            ]
+            if not patent_ids:
+                return updated
+
+            claims_by_patent: Dict[str, List[str]] = {patent_id: [] for patent_id in patent_ids}
+            for row in conn.execute(select(Claim.patent_id, Claim.text).where(Claim.patent_id.in_(patent_ids))):
+                claims_by_patent[row.patent_id].append(row.text)
+
+            conn.execute(
+                update(Patent).where(Patent.id == bindparam("patent_id")),
+                [
+                    {
+                        "patent_id": patent_id,
+                        "key_phrases": count_key_phrases(claims_text),
+                        "claim_terms": query_terms(claims_text),
+                    }
+                    for patent_id, claims_text in claims_by_patent.items()
+                ],
+            )
+            updated += len(patent_ids)
+
+
+# Bring the database in line with the source files. Safe to run repeatedly: only the delta is written.
+def load_all(patents_path: str = PATENTS_PATH, products_path: str = PRODUCTS_PATH,
+             batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1, prune: bool = True) -> Dict[str, int]:
+    stats = {}
+    for label, load in (
+        ("patents", lambda: ingest_patents(patents_path, batch_size, workers, prune)),
+        ("companies", lambda: ingest_companies(products_path, batch_size, prune)),
+    ):
+        started = time.perf_counter()
+        counts = load()
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        print(
+            f"Loaded {label}: " + ", ".join(f"{n} {name}" for name, n in counts.items())
+            + f" in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+        stats.update(counts)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load patents and company products into the database, writing only new or changed records."
+    )
+    parser.add_argument("--patents", default=PATENTS_PATH, help="Path to patents.json")
+    parser.add_argument("--products", default=PRODUCTS_PATH, help="Path to company_products.json")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per insert transaction")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to parse claims")
+    parser.add_argument("--no-prune", action="store_true",
+                        help="Keep patents and companies that are no longer in the source files")
+    parser.add_argument("--backfill-key-phrases", action="store_true",
+                        help="Only compute stored key phrases for patents that are missing them")
+    args = parser.parse_args()
+
+    if args.backfill_key_phrases:
+        started = time.perf_counter()
+        count = backfill_key_phrases(args.batch_size)
+        print(f"Backfilled key phrases for {count} patents in {time.perf_counter() - started:.2f}s")
+    else:
+        load_all(args.patents, args.products, args.batch_size, args.workers, prune=not args.no_prune)
@@ -0,0 +1,127 @@
+# backend/app/invalidation.py
+import os
+import threading
+import time
+from collections import defaultdict
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import DataVersion, engine
+
+# How often a process looks for data written by another one (e.g. `python ingest.py` next to the server)
+DATA_VERSION_CHECK_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "1"))
+
+# Callbacks to run after rows of a model are inserted, updated or deleted.
+# Callbacks registered with with_ids=True receive the primary keys of the changed
+# rows, or None when they are unknown (e.g. after a bulk load) and everything is suspect.
+_listeners: Dict[type, List[Tuple[Callable, bool]]] = defaultdict(list)
+
+
+def on_change(model: Type, callback: Callable, with_ids: bool = False) -> None:
+    _listeners[model].append((callback, with_ids))
+
+
+def notify(*models: Type, ids: Optional[Iterable] = None) -> None:
+    changed_ids = set(ids) if ids is not None else None
+    for model in models:
+        for callback, with_ids in _listeners.get(model, []):
+            if with_ids:
+                callback(changed_ids)
+            else:
+                callback()
+
+
+# ORM writes are tracked per session and only announced once they are committed,
+# so a concurrent rebuild can never pick up rows that are later rolled back.
+# Bulk Core inserts (see ingest.py) bypass the session and call notify() directly.
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changed: Dict[type, Set] = session.info.setdefault("changed_models", {})
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if type(obj) in _listeners:
+            changed.setdefault(type(obj), set()).add(_primary_key(obj))
+
+
+# The identity is not assigned yet for pending objects at after_flush, read the key columns instead.
+# None (everything is suspect) only when the key really is unknown.
+def _primary_key(obj):
+    key = inspect(obj).mapper.primary_key_from_instance(obj)
+    if any(value is None for value in key):
+        return None
+    return key[0] if len(key) == 1 else tuple(key)
+
+
+@event.listens_for(Session, "after_commit")
+def _announce_changes(session):
+    changed = session.info.pop("changed_models", None)
+    for model, ids in (changed or {}).items():
+        notify(model, ids=None if None in ids else ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("changed_models", None)
+
+
+# Versions of the data_versions table this process has caught up with
+_seen_versions: Optional[Dict[str, int]] = None
+_checked_at = 0.0
+_check_lock = threading.Lock()
+
+
+def _read_versions(conn) -> Dict[str, int]:
+    return dict(conn.execute(select(DataVersion.model, DataVersion.version)).all())
+
+
+# Like notify(), for writes other processes must hear about too: the data version of each model
+# is bumped so their next check() drops what they cached, then this process is notified directly.
+def publish(*models: Type, ids: Optional[Iterable] = None) -> None:
+    with engine.begin() as conn:
+        for model in models:
+            bump = update(DataVersion).where(DataVersion.model == model.__name__).values(version=DataVersion.version + 1)
+            if conn.execute(bump).rowcount == 0:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(DataVersion).values(model=model.__name__, version=1))
+                except IntegrityError:
+                    # Another process inserted it first
+                    conn.execute(bump)
+        versions = _read_versions(conn)
+    with _check_lock:
+        if _seen_versions is not None:
+            for model in models:
+                # Someone else published in between too, and their ids are unknown here
+                if versions[model.__name__] != _seen_versions.get(model.__name__, 0) + 1:
+                    ids = None
+                _seen_versions[model.__name__] = versions[model.__name__]
+    notify(*models, ids=ids)
+
+
+# Notify the listeners of every model another process has published changes to since the last check.
+# Runs for every request (database.get_db) and whenever a session starts a transaction, at most
+# every DATA_VERSION_CHECK_SECONDS.
+def check() -> None:
+    global _seen_versions, _checked_at
+    if time.monotonic() - _checked_at < DATA_VERSION_CHECK_SECONDS or not _check_lock.acquire(blocking=False):
+        return
+    try:
+        _checked_at = time.monotonic()
+        with engine.connect() as conn:
+            versions = _read_versions(conn)
+        previous, _seen_versions = _seen_versions, versions
+        # Nothing can be cached from before the first check
+        if previous is None:
+            return
+        changed = [model for model in _listeners if versions.get(model.__name__, 0) != previous.get(model.__name__, 0)]
+    finally:
+        _check_lock.release()
+    notify(*changed)
+
+
+@event.listens_for(Session, "after_begin")
+def _check_versions(session, transaction, connection):
+    check()
@@ -0,0 +1,241 @@
+# backend/app/jobs.py
+import copy
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+
+from models import AnalysisJobRecord, SessionLocal, engine
+from service import DEFAULT_TOP_N, AnalysisCancelled, patent_infringement_check_logic
+
+# Analyses running at the same time in each worker process; further jobs wait in its queue
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "4"))
+# Jobs accepted (queued + running, across all workers) before new submissions are rejected
+MAX_PENDING_JOBS = int(os.getenv("MAX_PENDING_JOBS", "100"))
+# How long finished jobs stay pollable; afterwards the report is read from the analysis tables
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# Unfinished jobs that have not been written for this long belonged to a worker that stopped
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "3600"))
+# How often a running job reads its cancel flag, which a DELETE on another worker may have set
+JOB_CANCEL_CHECK_SECONDS = float(os.getenv("JOB_CANCEL_CHECK_SECONDS", "1"))
+# Streamed risk assessment text is written to the job at most this often
+JOB_PROGRESS_WRITE_SECONDS = float(os.getenv("JOB_PROGRESS_WRITE_SECONDS", "1"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_jobs = AnalysisJobRecord.__table__
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# Set by a cancel on this worker, or found set in the database when the DELETE reached another one
+class _CancelEvent(threading.Event):
+    def __init__(self, analysis_id: str):
+        super().__init__()
+        self.analysis_id = analysis_id
+        self._checked_at = time.monotonic()
+
+    def is_set(self) -> bool:
+        if not super().is_set() and time.monotonic() - self._checked_at >= JOB_CANCEL_CHECK_SECONDS:
+            self._checked_at = time.monotonic()
+            with engine.connect() as conn:
+                if conn.execute(select(_jobs.c.cancel_requested).where(_jobs.c.id == self.analysis_id)).scalar():
+                    self.set()
+        return super().is_set()
+
+
+class AnalysisJob:
+    def __init__(self, publication_number: str, company_name: str, top_n: int, analysis_id: Optional[str] = None):
+        self.analysis_id = analysis_id or str(uuid.uuid4())
+        self.publication_number = publication_number
+        self.company_name = company_name
+        self.top_n = top_n
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.cancel_event = _CancelEvent(self.analysis_id)
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+        self._written_at = 0.0
+        # Partial report, filled in as the pipeline reports progress
+        self.analysis: Dict[str, Any] = {
+            "id": self.analysis_id,
+            "patent_id": publication_number,
+            "company_name": company_name,
+            "analysis_date": date.today().isoformat(),
+            "overall_risk_assessment": "",
+            "top_infringing_products": [],
+        }
+
+    @classmethod
+    def from_record(cls, row) -> "AnalysisJob":
+        job = cls(row.publication_number, row.company_name, row.top_n, row.id)
+        job.status = row.status
+        job.error = row.error
+        job.analysis = row.analysis
+        return job
+
+    def update(self, event: str, data: Any) -> None:
+        with self._lock:
+            if event == "resolved":
+                self.analysis.update(data)
+            elif event == "product":
+                self.analysis["top_infringing_products"].append(data)
+            elif event == "risk_assessment":
+                self.analysis["overall_risk_assessment"] += data
+                if time.monotonic() - self._written_at < JOB_PROGRESS_WRITE_SECONDS:
+                    return
+            else:
+                return
+        self._write()
+
+    def set_status(self, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.status = status
+            self.error = error
+        values: Dict[str, Any] = {"status": status, "error": error}
+        if status in FINISHED:
+            values["finished_at"] = datetime.utcnow()
+        self._write(**values)
+
+    # The job's row is what every worker polls
+    def _write(self, **values: Any) -> None:
+        with self._lock:
+            analysis = copy.deepcopy(self.analysis)
+            self._written_at = time.monotonic()
+        with engine.begin() as conn:
+            conn.execute(
+                update(_jobs).where(_jobs.c.id == self.analysis_id)
+                .values(analysis=analysis, updated_at=datetime.utcnow(), **values)
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.status,
+                "error": self.error,
+                "infringement_analysis": {
+                    **self.analysis,
+                    "top_infringing_products": list(self.analysis["top_infringing_products"]),
+                },
+            }
+
+
+# Runs infringement analyses on a bounded thread pool. Job status, partial reports and cancel flags
+# are kept in the analysis_jobs table, so with several uvicorn workers any of them can answer a poll
+# or a cancel for a job another one is running.
+class JobManager:
+    def __init__(self, max_workers: int = MAX_CONCURRENT_JOBS, max_pending: int = MAX_PENDING_JOBS):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        # Jobs queued or running in this process
+        self._local: Dict[str, AnalysisJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, publication_number: str, company_name: str, top_n: int = DEFAULT_TOP_N) -> AnalysisJob:
+        job = AnalysisJob(publication_number, company_name, top_n)
+        with self._lock, engine.begin() as conn:
+            self._prune(conn)
+            # Workers may both pass this check at the limit, so it can be exceeded by a job per worker
+            pending = conn.execute(
+                select(func.count()).select_from(_jobs).where(_jobs.c.status.in_([QUEUED, RUNNING]))
+            ).scalar()
+            if pending >= self.max_pending:
+                raise JobQueueFull("Too many analyses in progress, try again later")
+            conn.execute(insert(_jobs).values(
+                id=job.analysis_id,
+                publication_number=publication_number,
+                company_name=company_name,
+                top_n=top_n,
+                status=QUEUED,
+                analysis=job.analysis,
+                cancel_requested=False,
+                updated_at=datetime.utcnow(),
+            ))
+            self._local[job.analysis_id] = job
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, analysis_id: str) -> Optional[AnalysisJob]:
+        with engine.connect() as conn:
+            row = conn.execute(select(_jobs).where(_jobs.c.id == analysis_id)).first()
+        return AnalysisJob.from_record(row) if row is not None else None
+
+    def cancel(self, analysis_id: str) -> Optional[AnalysisJob]:
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            # A queued job is cancelled right away, whichever worker queued it; it is skipped when its turn comes
+            conn.execute(
+                update(_jobs).where(_jobs.c.id == analysis_id, _jobs.c.status == QUEUED)
+                .values(status=CANCELLED, cancel_requested=True, updated_at=now, finished_at=now)
+            )
+            # A running one stops at its next check
+            conn.execute(
+                update(_jobs).where(_jobs.c.id == analysis_id, _jobs.c.status == RUNNING).values(cancel_requested=True)
+            )
+        with self._lock:
+            job = self._local.get(analysis_id)
+        if job is not None:
+            job.cancel_event.set()
+            # Drop a job that has not started from this worker's queue
+            if job.future is not None and job.future.cancel():
+                self._forget(job)
+        return self.get(analysis_id)
+
+    def _run(self, job: AnalysisJob) -> None:
+        db = SessionLocal()
+        try:
+            with engine.begin() as conn:
+                started = conn.execute(
+                    update(_jobs).where(_jobs.c.id == job.analysis_id, _jobs.c.status == QUEUED)
+                    .values(status=RUNNING, updated_at=datetime.utcnow())
+                ).rowcount
+            if not started:
+                return  # cancelled while queued
+            job.status = RUNNING
+            patent_infringement_check_logic(
+                job.publication_number,
+                job.company_name,
+                db,
+                top_n=job.top_n,
+                analysis_id=job.analysis_id,
+                progress=job.update,
+                cancel_event=job.cancel_event,
+            )
+            job.set_status(DONE)
+        except AnalysisCancelled:
+            job.set_status(CANCELLED)
+        except Exception as e:
+            job.set_status(FAILED, str(e))
+        finally:
+            db.close()
+            self._forget(job)
+
+    def _forget(self, job: AnalysisJob) -> None:
+        with self._lock:
+            self._local.pop(job.analysis_id, None)
+
+    # Drop jobs finished longer than JOB_RETENTION_SECONDS ago, and fail the ones left behind by a
+    # worker that stopped so they no longer count as pending
+    def _prune(self, conn) -> None:
+        now = datetime.utcnow()
+        conn.execute(delete(_jobs).where(_jobs.c.finished_at < now - timedelta(seconds=JOB_RETENTION_SECONDS)))
+        conn.execute(
+            update(_jobs)
+            .where(_jobs.c.status.in_([QUEUED, RUNNING]), _jobs.c.updated_at < now - timedelta(seconds=JOB_STALE_SECONDS))
+            .values(status=FAILED, error="The worker running this analysis stopped", finished_at=now)
+        )
+
+
+job_manager = JobManager()
@@ -0,0 +1,85 @@
+# backend/app/listing.py
+import json
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy.orm import Query, Session, load_only, noload, selectinload
+
+from models import Company, Patent, SessionLocal
+
+STREAM_BATCH_SIZE = 500
+
+
+def _patent_query(db: Session, after: Optional[str], include_claims: bool) -> Query:
+    # Never load the description or the stored phrase columns, the response has no use for them
+    query = db.query(Patent).options(load_only(
+        Patent.id, Patent.publication_number, Patent.title, Patent.abstract, Patent.assignee
+    ))
+    query = query.options(selectinload(Patent.claims) if include_claims else noload(Patent.claims))
+    if after is not None:
+        query = query.filter(Patent.id > after)
+    return query.order_by(Patent.id)
+
+
+def _company_query(db: Session, after: Optional[str], include_products: bool) -> Query:
+    query = db.query(Company).options(selectinload(Company.products) if include_products else noload(Company.products))
+    if after is not None:
+        query = query.filter(Company.id > after)
+    return query.order_by(Company.id)
+
+
+def serialize_patent(patent: Patent, include_claims: bool) -> Dict[str, Any]:
+    return {
+        "id": patent.id,
+        "publication_number": patent.publication_number,
+        "title": patent.title,
+        "abstract": patent.abstract,
+        "assignee": patent.assignee,
+        "claims": [{"num": claim.num, "text": claim.text} for claim in patent.claims] if include_claims else None,
+    }
+
+
+def serialize_company(company: Company, include_products: bool) -> Dict[str, Any]:
+    return {
+        "id": company.id,
+        "name": company.name,
+        "products": [
+            {"id": product.id, "name": product.name, "description": product.description}
+            for product in company.products
+        ] if include_products else [],
+    }
+
+
+# One keyset page: rows with an id greater than `after`, plus the cursor for the next page.
+# Without a limit every remaining row is returned and there is no next page.
+def list_patents(db: Session, after: Optional[str], limit: Optional[int], include_claims: bool = True):
+    patents = _patent_query(db, after, include_claims).limit(limit).all()
+    next_cursor = patents[-1].id if limit is not None and len(patents) == limit else None
+    return [serialize_patent(patent, include_claims) for patent in patents], next_cursor
+
+
+def list_companies(db: Session, after: Optional[str], limit: Optional[int], include_products: bool = True):
+    companies = _company_query(db, after, include_products).limit(limit).all()
+    next_cursor = companies[-1].id if limit is not None and len(companies) == limit else None
+    return [serialize_company(company, include_products) for company in companies], next_cursor
+
+
+# NDJSON lines serialized as rows come off the cursor. The generator owns its session
+# because it outlives the request-scoped one.
+def _stream(query_for, serialize, after: Optional[str], limit: Optional[int], include: bool) -> Iterator[str]:
+    db = SessionLocal()
+    try:
+        query = query_for(db, after, include)
+        if limit is not None:
+            query = query.limit(limit)
+        for row in query.yield_per(STREAM_BATCH_SIZE):
+            yield json.dumps(serialize(row, include)) + "\n"
+    finally:
+        db.close()
+
+
+def stream_patents(after: Optional[str], limit: Optional[int], include_claims: bool = True) -> Iterator[str]:
+    return _stream(_patent_query, serialize_patent, after, limit, include_claims)
+
+
+def stream_companies(after: Optional[str], limit: Optional[int], include_products: bool = True) -> Iterator[str]:
+    return _stream(_company_query, serialize_company, after, limit, include_products)
@@ -0,0 +1,177 @@
+# backend/app/llm.py
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from prompts import estimate_tokens
+
+# Account limits for the model, see https://platform.openai.com/account/limits
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+# Bounds for the adaptive limit on concurrent calls
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+# Completion tokens assumed for calls without max_tokens, until the response reports the real usage
+DEFAULT_COMPLETION_TOKENS = 512
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+# Requests or tokens per minute. Reservations may drive the balance negative; the caller then
+# waits until the bucket has refilled past its reservation, so waiters are served in order.
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # Take `amount` and return how long to wait before using it
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    # Correct an earlier reservation once the real cost is known (negative gives tokens back)
+    def adjust(self, amount: float) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+    # Hold back all new reservations for `seconds`, e.g. after the API asked us to slow down
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+# Additive-increase / multiplicative-decrease limit on calls in flight: every success raises the
+# limit by about one per limit's worth of calls, every throttling response halves it.
+class AdaptiveConcurrency:
+    def __init__(self, minimum: int, maximum: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(self.maximum)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        metrics.llm_concurrency_limit.set(self.limit)
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            metrics.llm_concurrency_limit.set(self.limit)
+            self._condition.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            self.limit = max(self.minimum, self.limit / 2)
+            metrics.llm_concurrency_limit.set(self.limit)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Imported here so the app does not pay for importing openai before the first call
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    # An exhausted quota is reported as a 429 too, but waiting will not fix it
+    if getattr(error, "code", None) == "insufficient_quota":
+        return False
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+# Throttles, retries and adapts the concurrency of OpenAI chat completion calls so that
+# sustained load stays close to the account's RPM/TPM limits instead of failing with 429s
+class RateLimiter:
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM, min_concurrency: int = LLM_MIN_CONCURRENCY,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads out retries of calls that failed together
+        return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+    def call(self, call: str, func: Callable[[], Any], messages: List[Dict[str, str]],
+             max_tokens: Optional[int] = None) -> Any:
+        estimate = sum(estimate_tokens(message["content"]) for message in messages) + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            self.concurrency.acquire()
+            try:
+                delay = max(self.requests.reserve(1), self.tokens.reserve(estimate))
+                if delay:
+                    time.sleep(delay)
+                metrics.llm_queue_wait.observe(time.perf_counter() - queued, call)
+                response = func()
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                error = e
+            else:
+                self.concurrency.on_success()
+                usage = getattr(response, "usage", None)
+                if usage is not None and usage.total_tokens:
+                    self.tokens.adjust(usage.total_tokens - estimate)
+                return response
+            finally:
+                self.concurrency.release()
+
+            wait = _retry_after(error)
+            if wait is None:
+                wait = self._backoff(attempt)
+            if _status_code(error) == 429:
+                self.concurrency.on_throttle()
+                self.requests.pause(wait)
+                metrics.llm_retries.inc(call, "throttled")
+            else:
+                metrics.llm_retries.inc(call, "error")
+            attempt += 1
+            time.sleep(wait)
+
+
+limiter = RateLimiter()
@@ -0,0 +1,55 @@
+# backend/app/locks.py
+import fcntl
+import os
+import tempfile
+import zlib
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Lock files for SQLite live next to the database file, in-memory databases use the temp dir
+LOCK_DIR = os.getenv("LOCK_DIR", "")
+
+
+def _lock_path(engine: Engine, name: str) -> str:
+    directory = LOCK_DIR
+    if not directory:
+        database = engine.url.database
+        directory = os.path.dirname(os.path.abspath(database)) if database and database != ":memory:" else tempfile.gettempdir()
+    return os.path.join(directory, f".{name}.lock")
+
+
+# Lock held by at most one process using the database at a time: a Postgres advisory lock, or an
+# flock()ed file for SQLite (whose processes share a host). Yields True if the lock was free and
+# False if another process held it and this one had to wait, so callers can skip work that the
+# other process has just done.
+@contextmanager
+def database_lock(engine: Engine, name: str) -> Iterator[bool]:
+    if engine.dialect.name == "postgresql":
+        key = zlib.crc32(name.encode("utf-8"))
+        # Advisory locks belong to the session, so the same connection takes and releases it
+        with engine.connect() as conn:
+            free = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+            if not free:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+            conn.commit()
+            try:
+                yield bool(free)
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                conn.commit()
+        return
+
+    with open(_lock_path(engine, name), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            free = True
+        except BlockingIOError:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            free = False
+        try:
+            yield free
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
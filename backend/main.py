@@ -1,17 +1,28 @@
 # backend/main.py
-from typing import List
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from os import path
-from fuzzywuzzy import fuzz
-import json
-import uuid
+from datetime import date
+from typing import List, Optional, Union
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy.orm import Session
 
+import metrics
 import schemas
+from candidates import CANDIDATES_TOP_K, get_candidates
 from database import get_db
-from models import Claim, Patent, Product, Company, SavedReport
-from service import get_infringement_report, list_saved_reports, patent_infringement_check_logic, save_infringement_report, search_company_by_name
+from export import EXPORT_FORMATS, ExportFilters, stream_export
+from fulltext import search_fulltext
+from ingest import load_all
+from jobs import DONE, JobQueueFull, job_manager
+from listing import list_companies, list_patents, stream_companies, stream_patents
+from locks import database_lock
+from models import IS_SQLITE, LAZY_STARTUP, Patent, SavedReport, SessionLocal, engine, init_schema
+from ranking import RANKING_BACKEND, product_ranker
+from search_index import company_index, patent_index
+from service import DEFAULT_TOP_N, batch_infringement_check_logic, get_client, get_infringement_report_cached, list_saved_reports, patent_infringement_check_logic, save_infringement_report, search_company_by_name
+from streaming import AnalysisStream
+from warmup import warmup
 import os
+import time
 from starlette.middleware.cors import CORSMiddleware
 
 app = FastAPI()
@@ -29,91 +40,151 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
 )
-DATABASE_PATH = os.getenv("DATABASE_PATH", "./patent_data.db")
+# Set to false for databases that are loaded some other way (e.g. the load benchmark)
+SYNC_ON_STARTUP = os.getenv("SYNC_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+MAX_BATCH_PAIRS = int(os.getenv("MAX_BATCH_PAIRS", "500"))
+# Page size when `after` is given without a `limit`
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
 
+# Request counts, latency and DB queries per route, plus the optional Server-Timing header
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    timings, token = metrics.start_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    metrics.finish_request(token, timings, request.method, route.path if route else "unmatched",
+                           response.status_code, elapsed)
+    if metrics.SERVER_TIMING_HEADER:
+        response.headers["Server-Timing"] = timings.server_timing(elapsed)
+    return response
 
-# Import data from JSON files into the database
-@app.on_event("startup")
+# Sync the database with the JSON files. Only new or changed records are written, so this is cheap
+# on an existing database and picks up records added to the sources since the last start.
+# With several workers the first one to start syncs while the others wait for it, then skip.
 def load_data():
-    db = next(get_db())
+    if not SYNC_ON_STARTUP:
+        print("Skipping data sync on startup.")
+        return
+    with database_lock(engine, "load_data") as first:
+        if not first:
+            print("Data was synced by another worker.")
+            return
+        load_all()
 
-    # Check if the database file already exists
-    if path.exists(DATABASE_PATH) and db.query(Patent).first() is not None:
-        print("Database file exists. Skipping data load.")
-        return  # Exit the function if the database file exists
-    
-    print("Database file not found or empty. Loading initial data...")
-
-    # Get the directory of the current file (main.py) and locate JSON files
-    base_dir = path.dirname(path.abspath(__file__))
-    patents_path = path.join(base_dir, 'json', 'patents.json')
-    products_path = path.join(base_dir, 'json', 'company_products.json')
-    with open(patents_path, encoding="utf-8") as f:
-        patents_data = json.load(f)
-        for patent in patents_data:
-            db_patent = Patent(
-                id=str(uuid.uuid4()),
-                publication_number=patent['publication_number'],
-                title=patent['title'],
-                description=patent['description'],
-                abstract=patent['abstract'],
-                assignee=patent['assignee']
-            )
-            db.add(db_patent)
-            db.commit()
-            claims = json.loads(patent['claims'])
-            for claim in claims:
-                db_claim = Claim(
-                    id=str(uuid.uuid4()),
-                    patent_id=db_patent.id,
-                    text=claim['text'],
-                    num=claim['num']  
-                )
-                db.add(db_claim)
-            db.commit()
-
-    with open(products_path, encoding="utf-8") as f:
-        products_data = json.load(f)
-        for company in products_data['companies']:
-            db_company = Company(id=str(uuid.uuid4()), name=company['name'])
-            db.add(db_company)
-            db.commit()
-
-            for product in company['products']:
-                db_product = Product(
-                    id=str(uuid.uuid4()),
-                    company_id=db_company.id,
-                    name=product['name'],
-                    description=product['description']
-                )
-                db.add(db_product)
-            db.commit()
+# Build the in-memory search indexes and the BM25 term matrix before the first request needs them
+def warm_indexes():
+    db = SessionLocal()
+    try:
+        patent_index.warm(db)
+        company_index.warm(db)
+        if RANKING_BACKEND == "bm25":
+            product_ranker.warm(db)
+    finally:
+        db.close()
+
+warmup.add("schema", init_schema, required=True)
+warmup.add("data", load_data, required=True)
+warmup.add("indexes", warm_indexes)
+warmup.add("llm_client", get_client)
+
+# By default the schema and data are ready before the server accepts requests. With LAZY_STARTUP
+# the server accepts right away and they are set up on the warm-up thread, see /readyz.
+# The remaining steps always run in the background.
+@app.on_event("startup")
+def start_warmup():
+    if not LAZY_STARTUP:
+        warmup.run(required=True, raise_errors=True)
+    warmup.start()
+
+# Liveness: the process is up and answering requests
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+# Readiness: 200 once the schema and data are set up ("accepting"), or with warm=true only once the
+# indexes and the OpenAI client are ready too ("warm"). 503 before that, with the state of each step.
+# Both are async so they answer even while every worker thread is busy.
+@app.get("/readyz", include_in_schema=False)
+async def readyz(response: Response, warm: bool = False):
+    if not (warmup.warm if warm else warmup.accepting):
+        response.status_code = 503
+    return warmup.status()
+
+# Keyset pagination: pass `limit` (or `after`) to get one page, and the X-Next-Cursor header of a
+# page as `after` to get the next one. Without either every row is returned, as before pagination.
+# format=ndjson streams every remaining row (up to `limit` if given) instead of one page.
+def _page_size(after: Optional[str], limit: Optional[int]) -> Optional[int]:
+    if limit is None and after is None:
+        return None
+    return limit or DEFAULT_PAGE_SIZE
 
 @app.get("/patents/", response_model=List[schemas.Patent])
-def get_patents(db: Session = Depends(get_db)):
-    return db.query(Patent).all()
+def get_patents(response: Response, db: Session = Depends(get_db), after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), include_claims: bool = True, format: str = Query("json", pattern="^(json|ndjson)$")):
+    if format == "ndjson":
+        return StreamingResponse(stream_patents(after, limit, include_claims), media_type="application/x-ndjson")
+    patents, next_cursor = list_patents(db, after, _page_size(after, limit), include_claims)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return patents
 
 @app.get("/companies/", response_model=List[schemas.Company])
-def get_companies(db: Session = Depends(get_db)):
-    companies = db.query(Company).options(joinedload(Company.products)).all()
+def get_companies(response: Response, db: Session = Depends(get_db), after: Optional[str] = None, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), include_products: bool = True, format: str = Query("json", pattern="^(json|ndjson)$")):
+    if format == "ndjson":
+        return StreamingResponse(stream_companies(after, limit, include_products), media_type="application/x-ndjson")
+    companies, next_cursor = list_companies(db, after, _page_size(after, limit), include_products)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return companies
 
-@app.get("/patents/search", response_model=schemas.Patent)
-def search_patent(publication_number: str, db: Session = Depends(get_db), threshold: int = 60):
-    patents = db.query(Patent).all()
-    
-    # Use rapidfuzz to find matches with a similarity above the threshold
-    matches = [
-        (patent, fuzz.ratio(patent.publication_number, publication_number)) for patent in patents 
-        if fuzz.ratio(patent.publication_number, publication_number) >= threshold
-    ]
+@app.get("/patents/search", response_model=Union[schemas.Patent, List[schemas.PatentMatch]])
+def search_patent(publication_number: str, db: Session = Depends(get_db), threshold: int = 60, limit: Optional[int] = Query(None, ge=1, le=100)):
+    # Candidates come from the in-memory publication number index, no text columns are read
+    matches = patent_index.search(publication_number, db, threshold, limit or 1)
     
     if not matches:
         raise HTTPException(status_code=404, detail="No matching patents found")
     
-    best_match = max(matches, key=lambda x: x[1])[0]  # Get the patent with the highest score
-    return best_match
+    if limit is None:
+        # Get the patent with the highest score. The index may still list a patent another
+        # process has just removed, until invalidation.check() catches up.
+        patent = db.get(Patent, matches[0][0])
+        if patent is None:
+            raise HTTPException(status_code=404, detail="No matching patents found")
+        return patent
+    return [
+        {"id": patent_id, "publication_number": number, "score": score}
+        for patent_id, number, score in matches
+    ]
+
+# Full-text search over titles, abstracts and claims, best BM25 match first. Snippets mark the
+# matched terms with <mark>. Pass the X-Next-Offset header of a page as `offset` to get the next one.
+@app.get("/patents/fulltext", response_model=List[schemas.PatentSearchHit])
+def fulltext_search_patents(q: str, response: Response, db: Session = Depends(get_db), assignee: Optional[List[str]] = Query(None), limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    if not IS_SQLITE:
+        raise HTTPException(status_code=501, detail="Full-text search is only available with SQLite (FTS5)")
+    hits = search_fulltext(db, q, assignee, limit, offset)
+    if len(hits) == limit:
+        response.headers["X-Next-Offset"] = str(offset + limit)
+    return hits
+
+# Products most likely to be relevant to the patent, precomputed by candidates.py (best first).
+# Pass company_name to only get the candidates of that company.
+@app.get("/patents/{publication_number}/candidates", response_model=List[schemas.PatentCandidate])
+def get_patent_candidates(publication_number: str, db: Session = Depends(get_db), company_name: Optional[str] = None, limit: int = Query(20, ge=1, le=CANDIDATES_TOP_K)):
+    patent = db.query(Patent).filter(Patent.publication_number == publication_number).first()
+    if patent is None:
+        raise HTTPException(status_code=404, detail="Patent not found")
+    company_id = None
+    if company_name is not None:
+        try:
+            company_id = search_company_by_name(company_name, db).id
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    return get_candidates(db, patent, company_id, limit)
 
 # Endpoint to get a company by fuzzy matching on name
 @app.get("/companies/search", response_model=schemas.Company)
@@ -129,23 +200,80 @@ def search_company(name: str, db: Session = Depends(get_db), threshold: int = 60
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@app.post("/patent-infringement", response_model=schemas.InfringementResponse)
-def patent_infringement_check(patent_id: str, company_name: str, db: Session = Depends(get_db)):
+@app.post("/patent-infringement", response_model=Union[schemas.InfringementResponse, schemas.AnalysisJob])
+def patent_infringement_check(patent_id: str, company_name: str, response: Response, db: Session = Depends(get_db), top_n: int = Query(DEFAULT_TOP_N, ge=1, le=20), async_mode: bool = False):
+    if async_mode:
+        # Run the analysis in the background and let the client poll /infringement-report/{analysis_id}
+        try:
+            job = job_manager.submit(patent_id, company_name, top_n)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        response.status_code = 202
+        return {"analysis_id": job.analysis_id, "status": job.status}
+
     try:
-        response = patent_infringement_check_logic(patent_id, company_name, db)
+        result = patent_infringement_check_logic(patent_id, company_name, db, top_n)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
-    return response
+    return result
+
+# Same check as POST /patent-infringement, answered with server-sent events as each stage finishes.
+# The last event ("report") carries the same body as GET /infringement-report/{analysis_id}.
+@app.post("/patent-infringement/stream", response_class=StreamingResponse)
+def stream_patent_infringement_check(patent_id: str, company_name: str, top_n: int = Query(DEFAULT_TOP_N, ge=1, le=20)):
+    stream = AnalysisStream(patent_id, company_name, top_n)
+    stream.first()
+    if stream.error is not None:
+        raise HTTPException(status_code=stream.error["status_code"], detail=stream.error["detail"])
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Check a list of patents against a list of companies in one request
+@app.post("/patent-infringement/batch", response_model=schemas.BatchInfringementResponse)
+def batch_patent_infringement_check(request: schemas.BatchInfringementRequest, db: Session = Depends(get_db)):
+    pairs = len(set(request.publication_numbers)) * len(set(request.company_names))
+    if pairs == 0:
+        raise HTTPException(status_code=400, detail="At least one publication number and one company name are required")
+    if pairs > MAX_BATCH_PAIRS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {MAX_BATCH_PAIRS} patent/company pairs")
+    top_n = request.top_n or DEFAULT_TOP_N
+    if not 1 <= top_n <= 20:
+        raise HTTPException(status_code=400, detail="top_n must be between 1 and 20")
+    return batch_infringement_check_logic(request.publication_numbers, request.company_names, db, top_n)
 
+@app.delete("/patent-infringement/{analysis_id}", response_model=schemas.AnalysisJob)
+def cancel_patent_infringement_check(analysis_id: str):
+    job = job_manager.cancel(analysis_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return {"analysis_id": job.analysis_id, "status": job.status}
+
+# Finished reports are served from an in-process cache with an ETag, so pollers can use If-None-Match
 @app.get("/infringement-report/{analysis_id}", response_model=schemas.InfringementResponse)
-def get_infringement_report_api(analysis_id: str, db: Session = Depends(get_db)):
-    return get_infringement_report(analysis_id, db)
+def get_infringement_report_api(analysis_id: str, request: Request, db: Session = Depends(get_db)):
+    # Jobs that have not completed yet are read from the job table, their analysis is still partial
+    job = job_manager.get(analysis_id)
+    if job is not None and job.status != DONE:
+        return job.snapshot()
+
+    body, etag = get_infringement_report_cached(analysis_id, db)
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.post("/save-report", response_model=schemas.SavedReport)
 def save_infringement_report_api(analysis_id: str, db: Session = Depends(get_db)):
     return save_infringement_report(analysis_id, db)
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/saved-reports", response_model=List[schemas.SavedReport])
 def get_saved_reports_api(db: Session = Depends(get_db)):
     return list_saved_reports(db)
@@ -155,4 +283,24 @@ def get_saved_report_by_id_api(report_id: str, db: Session = Depends(get_db)):
     saved_report = db.query(SavedReport).filter(SavedReport.id == report_id).first()
     if not saved_report:
         raise HTTPException(status_code=404, detail="Report not found")
-    return saved_report
\ No newline at end of file
+    return saved_report
+
+# Bulk export of finished analyses with their infringing products and saved report, streamed as
+# NDJSON (one analysis per line), CSV (one row per product) or Parquet. Filters combine with AND.
+@app.get("/export/analyses", response_class=StreamingResponse)
+def export_analyses(db: Session = Depends(get_db), format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"), since: Optional[date] = None, until: Optional[date] = None, company_name: Optional[str] = None, patent_id: Optional[str] = None, saved_only: bool = False):
+    company_id = None
+    if company_name is not None:
+        try:
+            company_id = search_company_by_name(company_name, db).id
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    try:
+        chunks = stream_export(format, ExportFilters(since, until, company_id, patent_id, saved_only))
+    except ValueError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="analyses.{format}"'},
+    )
\ No newline at end of file
@@ -0,0 +1,256 @@
+# backend/app/metrics.py
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from models import engine
+
+# Adds a Server-Timing header with the per-stage and DB time of each request
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() in ("1", "true", "yes")
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(self.labels, key)} {value}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][i] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+http_requests = Counter("http_requests_total", "HTTP requests served.", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "Time to produce the response headers.",
+                                  ("method", "route"))
+http_request_db_queries = Histogram("http_request_db_queries", "Database queries run per request.", ("route",),
+                                    COUNT_BUCKETS)
+stage_duration = Histogram("analysis_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",))
+db_queries = Counter("db_queries_total", "Database statements executed.")
+db_query_duration = Histogram("db_query_duration_seconds", "Database statement execution time.")
+llm_requests = Counter("llm_requests_total", "OpenAI chat completion requests.", ("call", "outcome"))
+llm_request_duration = Histogram("llm_request_duration_seconds", "OpenAI chat completion latency.", ("call",))
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by OpenAI responses.", ("call", "kind"))
+llm_queue_wait = Histogram("llm_queue_wait_seconds", "Time OpenAI calls waited for rate limit budget and a slot.",
+                           ("call",))
+llm_retries = Counter("llm_retries_total", "OpenAI calls retried, by reason.", ("call", "reason"))
+llm_concurrency_limit = Gauge("llm_concurrency_limit", "Current adaptive limit on concurrent OpenAI calls.")
+analysis_coalesced = Counter("analysis_coalesced_total", "Analyses answered by waiting on an identical one in flight.")
+
+_metrics = [
+    http_requests, http_request_duration, http_request_db_queries, stage_duration,
+    db_queries, db_query_duration, llm_requests, llm_request_duration, llm_tokens,
+    llm_queue_wait, llm_retries, llm_concurrency_limit, analysis_coalesced,
+]
+# Cache name -> callable returning (hits, misses)
+_caches: Dict[str, Callable[[], Tuple[int, int]]] = {}
+
+
+def register_cache(name: str, counts: Callable[[], Tuple[int, int]]) -> None:
+    _caches[name] = counts
+
+
+def _render_caches() -> List[str]:
+    counts = {name: read() for name, read in sorted(_caches.items())}
+    lines = []
+    for metric, kind, documentation, value in (
+        ("cache_hits_total", "counter", "Cache lookups that found an entry.", lambda hits, misses: hits),
+        ("cache_misses_total", "counter", "Cache lookups that missed.", lambda hits, misses: misses),
+        ("cache_hit_ratio", "gauge", "Share of cache lookups that hit since startup.",
+         lambda hits, misses: hits / (hits + misses) if hits + misses else 0.0),
+    ):
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+        lines.extend(f'{metric}{{cache="{name}"}} {value(*pair)}' for name, pair in counts.items())
+    return lines
+
+
+# Prometheus text exposition of every metric
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    lines.extend(_render_caches())
+    return "\n".join(lines) + "\n"
+
+
+# Stage and DB time of the request being served, shared with the threads it fans out to
+class RequestTimings:
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_query(self, seconds: float) -> None:
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def server_timing(self, total: float) -> str:
+        with self._lock:
+            entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+            entries.append(f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"')
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_request: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request() -> Tuple[RequestTimings, contextvars.Token]:
+    timings = RequestTimings()
+    return timings, _request.set(timings)
+
+
+def finish_request(token: contextvars.Token, timings: RequestTimings, method: str, route: str, status: int,
+                   seconds: float) -> None:
+    _request.reset(token)
+    http_requests.inc(method, route, str(status))
+    http_request_duration.observe(seconds, method, route)
+    http_request_db_queries.observe(timings.db_queries, route)
+
+
+class _Stage:
+    __slots__ = ("name", "_started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self._started
+        stage_duration.observe(elapsed, self.name)
+        timings = _request.get()
+        if timings is not None:
+            timings.add_stage(self.name, elapsed)
+        return False
+
+
+# Times a block as one pipeline stage: `with metrics.stage("summarize"): ...`
+def stage(name: str) -> _Stage:
+    return _Stage(name)
+
+
+# Wrap a function submitted to a thread pool so it runs in (a copy of) the caller's context,
+# which keeps its stages and queries attributed to the request that started it
+def bind_context(func: Callable) -> Callable:
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+def record_llm_call(call: str, seconds: float, response=None, error: Optional[BaseException] = None) -> None:
+    llm_requests.inc(call, "error" if error is not None else "ok")
+    llm_request_duration.observe(seconds, call)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        llm_tokens.inc(call, "prompt", amount=usage.prompt_tokens or 0)
+        llm_tokens.inc(call, "completion", amount=usage.completion_tokens or 0)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    db_queries.inc()
+    db_query_duration.observe(elapsed)
+    timings = _request.get()
+    if timings is not None:
+        timings.add_query(elapsed)
+
+
+@event.listens_for(engine, "handle_error")
+def _query_failed(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
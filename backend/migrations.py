@@ -0,0 +1,155 @@
+# backend/app/migrations.py
+import sys
+from typing import List, Tuple
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import AddConstraint, CreateColumn
+
+from fulltext import create_fulltext_index
+
+
+# create_all() only creates missing tables, so columns added to existing models are
+# appended here. New columns must be nullable (or have a server default) for this to work.
+def add_missing_columns(engine: Engine, metadata: MetaData) -> None:
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+# Same for indexes declared on tables that already existed
+def create_missing_indexes(engine: Engine, metadata: MetaData) -> None:
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+# Foreign keys whose target (referred table and columns) or ON DELETE rule changed in the models
+# are dropped and created again. SQLite
+# neither enforces foreign keys here nor can alter them, so this only applies to other databases.
+def update_foreign_keys(engine: Engine, metadata: MetaData) -> None:
+    if engine.dialect.name == "sqlite":
+        return
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {tuple(fk["constrained_columns"]): fk for fk in inspector.get_foreign_keys(table.name)}
+            for constraint in table.foreign_key_constraints:
+                fk = existing.get(tuple(constraint.column_keys))
+                if fk is None:
+                    continue
+                current = (
+                    fk["referred_table"],
+                    list(fk["referred_columns"]),
+                    (fk.get("options", {}).get("ondelete") or "NO ACTION").upper(),
+                )
+                wanted = (
+                    constraint.referred_table.name,
+                    [element.column.name for element in constraint.elements],
+                    (constraint.ondelete or "NO ACTION").upper(),
+                )
+                if current == wanted:
+                    continue
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} DROP CONSTRAINT {quote(fk['name'])}"))
+                conn.execute(AddConstraint(constraint))
+
+
+def upgrade(engine: Engine, metadata: MetaData) -> None:
+    add_missing_columns(engine, metadata)
+    create_missing_indexes(engine, metadata)
+    update_foreign_keys(engine, metadata)
+    create_fulltext_index(engine)
+    # Pooled connections may still hold the old schema, start over with fresh ones
+    engine.dispose()
+
+
+# The queries the service runs on hot paths, each of which must be answered from an index
+def _hot_queries(db) -> List[Tuple[str, object]]:
+    from models import (
+        CandidateSource, Claim, Company, InfringementAnalysis, InfringingProduct, Patent, PatentCandidate, PatentSummary,
+        Product, SavedReport,
+    )
+
+    return [
+        ("patent by publication number", db.query(Patent).filter(Patent.publication_number == "x")),
+        ("claims of a patent", db.query(Claim).filter(Claim.patent_id.in_(["x"]))),
+        ("company by id", db.query(Company).filter(Company.id == "x")),
+        ("products of a company", db.query(Product).filter(Product.company_id == "x")),
+        ("analyses of a patent and company", db.query(InfringementAnalysis).filter(
+            InfringementAnalysis.patent_id == "x", InfringementAnalysis.company_id == "x")),
+        ("infringement report", db.query(InfringementAnalysis, Company.name, Patent.publication_number, InfringingProduct)
+            .outerjoin(Company, Company.id == InfringementAnalysis.company_id)
+            .outerjoin(Patent, Patent.publication_number == InfringementAnalysis.patent_id)
+            .outerjoin(InfringingProduct, InfringingProduct.analysis_id == InfringementAnalysis.id)
+            .filter(InfringementAnalysis.id == "x")),
+        ("fresh analysis by cache key", db.query(InfringementAnalysis).filter(
+            InfringementAnalysis.cache_key == "x", InfringementAnalysis.created_at >= "2000-01-01")
+            .order_by(InfringementAnalysis.created_at.desc())),
+        ("candidates of a patent", db.query(PatentCandidate).filter(PatentCandidate.patent_id == "x")
+            .order_by(PatentCandidate.rank)),
+        ("patents with a product among their candidates", db.query(PatentCandidate.patent_id)
+            .filter(PatentCandidate.product_id.in_(["x"])).distinct()),
+        ("candidate fingerprints", db.query(CandidateSource).filter(CandidateSource.id.in_(["x"]))),
+        ("saved report by analysis", db.query(SavedReport).filter(SavedReport.analysis_id == "x")),
+        ("saved reports by date", db.query(SavedReport).order_by(SavedReport.report_date.desc())),
+        ("summary by key", db.query(PatentSummary).filter(PatentSummary.key == "x")),
+        ("least recently used summaries", db.query(PatentSummary.key).order_by(PatentSummary.last_used_at).limit(10)),
+    ]
+
+
+# EXPLAIN QUERY PLAN every hot query and flag any table scan that does not use an index
+def check_query_plans(engine: Engine) -> List[Tuple[str, List[str], bool]]:
+    from models import SessionLocal
+
+    results = []
+    db = SessionLocal()
+    try:
+        for name, query in _hot_queries(db):
+            sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+            full_scans = [
+                step for step in plan
+                if step.startswith("SCAN") and "INDEX" not in step and "CONSTANT ROW" not in step
+            ]
+            results.append((name, plan, not full_scans))
+    finally:
+        db.close()
+    return results
+
+
+if __name__ == "__main__":
+    from models import engine
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("upgrade", "check-plans"):
+        print("usage: python migrations.py upgrade|check-plans")
+        sys.exit(2)
+
+    # Importing models already runs upgrade(); the command exists to do it without starting the server
+    if sys.argv[1] == "upgrade":
+        print("Database schema is up to date.")
+        sys.exit(0)
+
+    if engine.dialect.name != "sqlite":
+        print("check-plans reads SQLite query plans, use EXPLAIN on the server for other databases")
+        sys.exit(2)
+
+    failures = 0
+    for name, plan, ok in check_query_plans(engine):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        for step in plan:
+            print(f"       {step}")
+        failures += not ok
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,120 @@
+# backend/app/prompts.py
+import math
+import os
+import re
+from typing import Any, Dict, List
+
+# Rough token estimate for OpenAI models, good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+# Largest piece of text sent to the model in one summarize call
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "4000"))
+# Tokens from the end of each chunk repeated at the start of the next, for context across the cut
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", "0"))
+# Token budget for the claims block of the per-product analysis prompt
+CLAIMS_TOKEN_BUDGET = int(os.getenv("CLAIMS_TOKEN_BUDGET", "2500"))
+
+# Section headings in patent descriptions are upper-case lines, e.g. "BACKGROUND OF INVENTION"
+SECTION_HEADING = re.compile(r"^[ \t]*([A-Z][A-Z0-9 ,;:'()&/-]{2,100})[ \t]*$", re.MULTILINE)
+# Dependent claims refer back to another claim ("The method of claim 1, wherein ...")
+CLAIM_REFERENCE = re.compile(r"\bclaims?\s+\d+", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+# Split on section headings, each section keeps its heading as its first line
+def split_sections(text: str) -> List[str]:
+    starts = [match.start() for match in SECTION_HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [text[start:end].strip() for start, end in zip(starts, starts[1:] + [len(text)])]
+    return [section for section in sections if section]
+
+
+# Break a piece of text that is over budget on paragraphs, then sentences, then characters
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    # Sentences keep their full stop, only the space after it is a separator
+    for pattern, separator in (("\n\n", "\n\n"), ("\n", "\n"), (r"(?<=\.) ", " ")):
+        parts = [part for part in re.split(pattern, text) if part.strip()]
+        if len(parts) > 1:
+            pieces = []
+            for part in parts:
+                pieces.extend(_split_oversized(part.strip(), max_tokens))
+            return _pack(pieces, max_tokens, separator)
+    size = max_tokens * CHARS_PER_TOKEN
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+# Greedily join consecutive pieces while they fit the budget
+def _pack(pieces: List[str], max_tokens: int, separator: str = "\n\n") -> List[str]:
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece + separator)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+# Up to `tokens` worth of the end of a chunk, starting at a word boundary. Two characters are
+# left for the paragraph break it is joined to the next chunk with.
+def _tail(text: str, tokens: int) -> str:
+    tail = text[-(tokens * CHARS_PER_TOKEN - 2):]
+    if len(tail) < len(text) and not text[-len(tail) - 1].isspace():
+        words = tail.split(None, 1)
+        tail = words[1] if len(words) > 1 else tail
+    return tail.strip()
+
+
+# Section-aware chunks of at most max_tokens. Whole sections are kept together when they fit,
+# so an edit to one section only changes the chunks covering that section. With overlap_tokens,
+# each chunk after the first starts with the end of the previous one; the overlap comes out of
+# the chunk's budget, so chunks still fit max_tokens.
+def chunk_text(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS,
+               overlap_tokens: int = SUMMARY_CHUNK_OVERLAP_TOKENS) -> List[str]:
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("overlap_tokens must be at least 0 and less than max_tokens")
+    budget = max_tokens - overlap_tokens
+    pieces = []
+    for section in split_sections(text):
+        pieces.extend(_split_oversized(section, budget))
+    chunks = _pack(pieces, budget)
+    if not overlap_tokens:
+        return chunks
+    return chunks[:1] + [
+        "\n\n".join(part for part in (_tail(previous, overlap_tokens), chunk) if part)
+        for previous, chunk in zip(chunks, chunks[1:])
+    ]
+
+
+def is_independent_claim(text: str) -> bool:
+    return CLAIM_REFERENCE.search(text) is None
+
+
+# Claims that fit the token budget, in their original order. Independent claims are picked
+# first since they define the scope, dependent claims fill whatever budget is left.
+# A single independent claim that is over budget on its own is truncated rather than dropped.
+def budget_claims(claims: List[Dict[str, Any]], max_tokens: int = CLAIMS_TOKEN_BUDGET) -> List[Dict[str, Any]]:
+    ordered = sorted(range(len(claims)), key=lambda i: not is_independent_claim(claims[i]["text"]))
+    selected = {}
+    remaining = max_tokens
+    for i in ordered:
+        claim = claims[i]
+        # Account for the "Claim <num>: " prefix and line break added by the prompt
+        tokens = estimate_tokens(claim["text"]) + 3
+        if tokens <= remaining:
+            selected[i] = claim
+            remaining -= tokens
+        elif not selected:
+            selected[i] = {**claim, "text": claim["text"][:max(0, remaining - 3) * CHARS_PER_TOKEN]}
+            remaining = 0
+    return [selected[i] for i in sorted(selected)]
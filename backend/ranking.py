@@ -0,0 +1,204 @@
+# backend/app/ranking.py
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+import invalidation
+from models import Product
+
+# "bm25" scores products with the sparse term matrix below, "fuzzy" keeps the original
+# fuzz.partial_ratio scorer (see service.score_products)
+RANKING_BACKEND = os.getenv("RANKING_BACKEND", "bm25")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+# Function words and claim boilerplate that would otherwise dominate claim queries
+STOPWORDS = frozenset("""
+a an and any are as at be by each for from has have in into is it its least more of on one or other said
+such than that the their then there these this to via when where wherein which with claim claims comprising
+comprises comprise including includes configured method system device further first second plurality
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", (text or "").lower())
+
+
+class _Document(NamedTuple):
+    term_ids: np.ndarray
+    counts: np.ndarray
+    length: int
+
+
+# BM25 index over Product.description.
+# Each product is tokenized once and kept as (term ids, counts); document frequencies are
+# updated in place as products change, and the CSR term matrix is re-assembled from those
+# arrays (no re-tokenization) the next time a query needs it.
+class ProductRanker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._pending: Set[str] = set()
+        self._vocabulary: Dict[str, int] = {}
+        self._df: List[int] = []
+        self._documents: Dict[str, _Document] = {}
+        self._total_length = 0
+        self._matrix: Optional[sparse.csr_matrix] = None
+        self._rows: Dict[str, int] = {}
+        self._lengths: Optional[np.ndarray] = None
+
+    # Called with the ids of changed products, or None to reload everything
+    def invalidate(self, product_ids: Optional[Set[str]] = None) -> None:
+        with self._lock:
+            if product_ids is None:
+                self._loaded = False
+                self._pending.clear()
+            else:
+                self._pending.update(product_ids)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocabulary.get(term)
+        if term_id is None:
+            term_id = self._vocabulary[term] = len(self._df)
+            self._df.append(0)
+        return term_id
+
+    def _add(self, product_id: str, description: Optional[str]) -> None:
+        counts = Counter(self._term_id(term) for term in tokenize(description))
+        term_ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        for term_id in term_ids:
+            self._df[term_id] += 1
+        self._documents[product_id] = _Document(
+            term_ids, np.fromiter(counts.values(), dtype=np.float64, count=len(counts)), sum(counts.values())
+        )
+        self._total_length += self._documents[product_id].length
+
+    def _remove(self, product_id: str) -> None:
+        document = self._documents.pop(product_id, None)
+        if document is not None:
+            for term_id in document.term_ids:
+                self._df[term_id] -= 1
+            self._total_length -= document.length
+
+    def _sync(self, db: Session) -> None:
+        if not self._loaded:
+            self._vocabulary, self._df, self._documents, self._total_length = {}, [], {}, 0
+            for product_id, description in db.query(Product.id, Product.description):
+                self._add(product_id, description)
+            self._loaded = True
+            self._matrix = None
+        elif self._pending:
+            changed = dict(
+                db.query(Product.id, Product.description).filter(Product.id.in_(self._pending)).all()
+            )
+            for product_id in self._pending:
+                self._remove(product_id)
+                if product_id in changed:
+                    self._add(product_id, changed[product_id])
+            self._matrix = None
+        self._pending.clear()
+
+        if self._matrix is None:
+            product_ids = list(self._documents)
+            documents = [self._documents[product_id] for product_id in product_ids]
+            indptr = np.zeros(len(documents) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(document.term_ids) for document in documents])
+            indices = np.concatenate([document.term_ids for document in documents]) if documents else np.array([], dtype=np.int64)
+            data = np.concatenate([document.counts for document in documents]) if documents else np.array([])
+            self._matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(documents), len(self._df)))
+            self._rows = {product_id: row for row, product_id in enumerate(product_ids)}
+            self._lengths = np.array([document.length for document in documents], dtype=np.float64)
+
+    # Load the products and build the term matrix now instead of on the first query
+    def warm(self, db: Session) -> None:
+        with self._lock:
+            self._sync(db)
+
+    # Products x terms matrix of BM25 term weights, the idf of each term, the product id of each row
+    # and the vocabulary. Many queries are scored against every product at once as
+    # (query weights * idf) @ weights.T, which gives the same scores as score().
+    def weight_matrix(self, db: Session) -> Tuple[sparse.csr_matrix, np.ndarray, List[str], Dict[str, int]]:
+        with self._lock:
+            self._sync(db)
+            matrix, rows, lengths, vocabulary = self._matrix, self._rows, self._lengths, dict(self._vocabulary)
+            n_documents = len(self._documents)
+            avg_length = self._total_length / n_documents if n_documents else 0.0
+            df = np.asarray(self._df, dtype=np.float64)
+
+        weights = matrix.copy()
+        if avg_length:
+            row_of_value = np.repeat(np.arange(weights.shape[0]), np.diff(weights.indptr))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length)
+            weights.data = weights.data * (BM25_K1 + 1) / (weights.data + norm[row_of_value])
+        idf = np.log1p((n_documents - df + 0.5) / (df + 0.5))
+        product_ids = [None] * len(rows)
+        for product_id, row in rows.items():
+            product_ids[row] = product_id
+        return weights, idf, product_ids, vocabulary
+
+    # BM25 score of every given product against the weighted query terms, in one sparse product
+    def score(self, db: Session, product_ids: List[str], query_terms: Dict[str, float]) -> List[float]:
+        with self._lock:
+            self._sync(db)
+            matrix, rows, lengths, vocabulary = self._matrix, self._rows, self._lengths, self._vocabulary
+            n_documents = len(self._documents)
+            avg_length = self._total_length / n_documents if n_documents else 0.0
+            df = np.asarray(self._df, dtype=np.float64)
+
+        known = [(vocabulary[term], weight) for term, weight in query_terms.items() if term in vocabulary]
+        product_rows = [rows.get(product_id) for product_id in product_ids]
+        present = [i for i, row in enumerate(product_rows) if row is not None]
+        scores = np.zeros(len(product_ids))
+        if not known or not present or not avg_length:
+            return scores.tolist()
+
+        term_ids = np.array([term_id for term_id, _ in known])
+        weights = np.array([weight for _, weight in known], dtype=np.float64)
+        idf = np.log1p((n_documents - df[term_ids] + 0.5) / (df[term_ids] + 0.5))
+
+        # tf of the query terms for the requested products only
+        tf = matrix[[product_rows[i] for i in present]][:, term_ids].tocsr()
+        row_of_value = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[[product_rows[i] for i in present]] / avg_length)
+        tf.data = tf.data * (BM25_K1 + 1) / (tf.data + norm[row_of_value])
+
+        scores[present] = tf @ (idf * weights)
+        return scores.tolist()
+
+
+def extract_key_phrases(claims: List[str]) -> List[str]:
+    key_phrases = []
+    for claim in claims:
+        # Basic word tokenization using regex
+        words = re.findall(r"\b\w+\b", claim)  # Matches words only
+        
+        # Basic noun-like detection (e.g., capitalize first letter or all caps for entities)
+        phrases = [word for word in words if word.istitle() or word.isupper()]
+        key_phrases.extend(phrases)
+    return key_phrases
+
+
+# Distinct key phrases with how often they occur
+def count_key_phrases(claims: List[str]) -> Dict[str, int]:
+    return dict(Counter(extract_key_phrases(claims)))
+
+
+# Query term weights: how often each non-stopword term occurs in the given texts
+def query_terms(texts: Iterable[str]) -> Dict[str, float]:
+    weights: Dict[str, float] = Counter()
+    for text in texts:
+        for term in tokenize(text):
+            if term not in STOPWORDS and not term.isdigit():
+                weights[term] += 1
+    return dict(weights)
+
+
+product_ranker = ProductRanker()
+invalidation.on_change(Product, product_ranker.invalidate, with_ids=True)
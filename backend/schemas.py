@@ -27,6 +27,27 @@ class Patent(PatentBase):
     class Config:
         orm_mode = True
 
+class PatentMatch(BaseModel):
+    id: str
+    publication_number: str
+    score: int
+
+class PatentSearchHit(BaseModel):
+    id: str
+    publication_number: str
+    title: str
+    assignee: Optional[str] = None
+    score: float
+    snippet: str
+
+class PatentCandidate(BaseModel):
+    rank: int
+    product_id: str
+    product_name: str
+    company_id: str
+    company_name: str
+    score: float
+
 class ProductBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -70,7 +91,27 @@ class InfringementAnalysisSchema(BaseModel):
     top_infringing_products: List[InfringingProductSchema]
 
 class InfringementResponse(BaseModel):
-    infringement_analysis: InfringementAnalysisSchema
+    status: str = "done"  # queued/running/done/failed/cancelled for analyses run as background jobs
+    error: Optional[str] = None
+    infringement_analysis: Optional[InfringementAnalysisSchema] = None
+
+class AnalysisJob(BaseModel):
+    analysis_id: str
+    status: str
+
+class BatchInfringementRequest(BaseModel):
+    publication_numbers: List[str]
+    company_names: List[str]
+    top_n: Optional[int] = None
+
+class BatchInfringementError(BaseModel):
+    publication_number: Optional[str] = None
+    company_name: Optional[str] = None
+    detail: str
+
+class BatchInfringementResponse(BaseModel):
+    results: List[InfringementResponse]
+    errors: List[BatchInfringementError] = []
 
 class SavedReport(BaseModel):
     id: str
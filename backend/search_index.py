@@ -0,0 +1,168 @@
+# backend/app/search_index.py
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from rapidfuzz import fuzz
+from sqlalchemy.orm import Session
+
+import invalidation
+import metrics
+from models import Company, Patent
+
+GRAM_SIZE = 3
+MIN_CANDIDATES = 50
+# Grams shared by more than this share of the corpus carry no signal (e.g. "^US")
+STOP_GRAM_RATIO = 0.1
+STOP_GRAM_MIN_POSTINGS = 1000
+
+
+# Legal suffixes that say nothing about which company is meant
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "llc", "ltd", "limited",
+    "plc", "gmbh", "ag", "sa", "nv", "bv", "holdings", "group",
+}
+
+
+def normalize_publication_number(value: str) -> str:
+    return re.sub(r"[^0-9A-Z]", "", value.upper())
+
+
+def normalize_company_name(value: str) -> str:
+    tokens = re.findall(r"[a-z0-9]+", value.lower())
+    meaningful = [token for token in tokens if token not in COMPANY_SUFFIXES]
+    return " ".join(meaningful or tokens)
+
+
+def ngrams(value: str, n: int = GRAM_SIZE) -> Set[str]:
+    padded = f"^{value}$"
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+# Whole words plus character trigrams of each word, so typos still share postings
+def token_grams(value: str) -> Set[str]:
+    grams = set()
+    for token in value.split():
+        grams.add(f"w:{token}")
+        grams.update(ngrams(token))
+    return grams
+
+
+class _Snapshot(NamedTuple):
+    ids: List[str]
+    keys: List[str]
+    exact: Dict[str, int]
+    postings: Dict[str, List[int]]
+    sorted_normalized: List[Tuple[str, int]]
+
+
+# In-memory fuzzy lookup over (id, key) pairs loaded from the database.
+# Exact matches are answered from a dict, everything else is narrowed down with an
+# n-gram inverted index before fuzz.ratio runs on the surviving candidates.
+class FuzzyIndex:
+    def __init__(self, load: Callable[[Session], List[Tuple[str, str]]], normalize: Callable[[str], str],
+                 grams: Callable[[str], Set[str]] = ngrams, name: str = "index"):
+        self.name = name
+        self._load = load
+        self._normalize = normalize
+        self._grams = grams
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def _build(self, db: Session) -> _Snapshot:
+        rows = self._load(db)
+        postings: Dict[str, List[int]] = {}
+        exact: Dict[str, int] = {}
+        normalized = []
+        for i, (_, key) in enumerate(rows):
+            exact.setdefault(key, i)
+            norm = self._normalize(key)
+            normalized.append((norm, i))
+            for gram in self._grams(norm):
+                postings.setdefault(gram, []).append(i)
+
+        return _Snapshot(
+            ids=[row_id for row_id, _ in rows],
+            keys=[key for _, key in rows],
+            exact=exact,
+            postings=postings,
+            sorted_normalized=sorted(normalized),
+        )
+
+    def _get_snapshot(self, db: Session) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                with metrics.stage(f"{self.name}_index_build"):
+                    self._snapshot = self._build(db)
+            return self._snapshot
+
+    # Build the index now instead of on the first search
+    def warm(self, db: Session) -> None:
+        self._get_snapshot(db)
+
+    def _candidates(self, snapshot: _Snapshot, query: str, limit: int) -> List[int]:
+        norm = self._normalize(query)
+        if not norm:
+            return []
+        stop_size = max(STOP_GRAM_MIN_POSTINGS, int(len(snapshot.ids) * STOP_GRAM_RATIO))
+        postings = [snapshot.postings.get(gram, []) for gram in self._grams(norm)]
+        selective = [ids for ids in postings if len(ids) <= stop_size] or postings
+
+        shared = Counter()
+        for ids in selective:
+            shared.update(ids)
+        wanted = max(MIN_CANDIDATES, limit * 10)
+        candidates = [i for i, _ in shared.most_common(wanted)]
+
+        # Keys that start with the query are always worth scoring
+        start = bisect_left(snapshot.sorted_normalized, (norm, -1))
+        for key, i in snapshot.sorted_normalized[start:start + wanted]:
+            if not key.startswith(norm):
+                break
+            candidates.append(i)
+        return candidates
+
+    # Returns up to `limit` (id, key, score) tuples with score >= threshold, best first
+    def search(self, query: str, db: Session, threshold: int = 60, limit: int = 1) -> List[Tuple[str, str, int]]:
+        snapshot = self._get_snapshot(db)
+        ids, keys = snapshot.ids, snapshot.keys
+
+        with metrics.stage(f"{self.name}_search"):
+            exact = snapshot.exact.get(query)
+            if exact is not None and limit == 1:
+                return [(ids[exact], keys[exact], 100)]
+
+            scored = {}
+            for i in self._candidates(snapshot, query, limit):
+                if i not in scored:
+                    scored[i] = round(fuzz.ratio(keys[i], query))
+            ranked = sorted(
+                ((score, i) for i, score in scored.items() if score >= threshold),
+                key=lambda x: (-x[0], x[1])
+            )
+            return [(ids[i], keys[i], score) for score, i in ranked[:limit]]
+
+
+patent_index = FuzzyIndex(
+    lambda db: db.query(Patent.id, Patent.publication_number).all(),
+    normalize_publication_number,
+    name="patent",
+)
+invalidation.on_change(Patent, patent_index.invalidate)
+
+company_index = FuzzyIndex(
+    lambda db: db.query(Company.id, Company.name).all(),
+    normalize_company_name,
+    token_grams,
+    name="company",
+)
+invalidation.on_change(Company, company_index.invalidate)
@@ -1,69 +1,202 @@
 # backend/app/service.py
 
+import hashlib
 import json
 import uuid
-from typing import List, Dict, Any, Tuple
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import func
-from fuzzywuzzy import fuzz
-import re
+from rapidfuzz import fuzz
+import threading
+import time
+import invalidation
+import llm
+import metrics
 import schemas
-from models import Company, InfringingProduct, Patent, Product, InfringementAnalysis, Claim, SavedReport
-from openai import OpenAI
+import summary_cache
+from cache import LRUCache, SingleFlight
+from candidates import precomputed_top_products
+from models import Company, InfringingProduct, Patent, Product, InfringementAnalysis, SavedReport
+from prompts import SUMMARY_CHUNK_TOKENS, budget_claims, chunk_text, estimate_tokens
+from ranking import RANKING_BACKEND, count_key_phrases, product_ranker, query_terms
+from search_index import company_index
 import os
 
 api_key = os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(
-    # defaults to os.environ.get("OPENAI_API_KEY")
-    api_key=api_key,
-)
+# Created on first use or by the startup warm-up: importing openai and building its HTTP client
+# was the slowest part of importing the app
+client = None
+_client_lock = threading.Lock()
 
-def extract_key_phrases(claims: List[str]) -> List[str]:
-    key_phrases = []
-    for claim in claims:
-        # Basic word tokenization using regex
-        words = re.findall(r"\b\w+\b", claim)  # Matches words only
-        
-        # Basic noun-like detection (e.g., capitalize first letter or all caps for entities)
-        phrases = [word for word in words if word.istitle() or word.isupper()]
-        key_phrases.extend(phrases)
-    return key_phrases
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
 
-# Use ChatGPT API for summarizing text
-def summarize_text(text: str, max_length: int = 2048) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+                client = OpenAI(
+                    # defaults to os.environ.get("OPENAI_API_KEY")
+                    api_key=api_key,
+                    max_retries=0,  # retries are handled by llm.limiter
+                )
+    return client
+
+OPENAI_MODEL = "gpt-4o-mini"
+
+# Upper bound on concurrent LLM calls made while analyzing products
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "8"))
+# Number of top ranked products that get a detailed LLM analysis
+DEFAULT_TOP_N = int(os.getenv("ANALYSIS_TOP_N", "2"))
+# How long a finished analysis is reused for an identical check, 0 always runs a new one
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400"))
+# Part of the analysis cache key, bump it whenever the analysis prompts change
+ANALYSIS_PROMPT_VERSION = "1"
+llm_executor = ThreadPoolExecutor(max_workers=ANALYSIS_CONCURRENCY, thread_name_prefix="llm")
+# Chunks of long descriptions are summarized on their own pool, since summarize_text itself
+# may already be running on llm_executor
+SUMMARY_CHUNK_CONCURRENCY = int(os.getenv("SUMMARY_CHUNK_CONCURRENCY", "4"))
+SUMMARY_CHUNK_LENGTH = int(os.getenv("SUMMARY_CHUNK_LENGTH", "1200"))
+summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_CHUNK_CONCURRENCY, thread_name_prefix="summary-chunk")
+
+# Chat completion that records its latency and token usage under the given call name.
+# Calls go through llm.limiter, which keeps them within the account's rate limits and retries failures.
+def create_chat_completion(call: str, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = llm.limiter.call(
+            call,
+            lambda: get_client().chat.completions.create(model=OPENAI_MODEL, **kwargs),
+            kwargs["messages"],
+            kwargs.get("max_tokens"),
+        )
+    except Exception as e:
+        metrics.record_llm_call(call, time.perf_counter() - started, error=e)
+        raise
+    metrics.record_llm_call(call, time.perf_counter() - started, response)
+    return response
+
+# Streamed chat completion, `on_text` is called with each piece of content as it arrives.
+# Returns the full content; usage comes with the last chunk and is recorded like create_chat_completion.
+# A stream that breaks off is retried from the start: its partial content is dropped and `on_restart`
+# tells the consumer to drop the pieces it has seen so far.
+def stream_chat_completion(call: str, on_text: Callable[[str], None],
+                           on_restart: Optional[Callable[[], None]] = None, **kwargs) -> str:
+    started = time.perf_counter()
+    parts: List[str] = []
+
+    def consume():
+        if parts:
+            parts.clear()
+            if on_restart is not None:
+                on_restart()
+        stream = get_client().chat.completions.create(
+            model=OPENAI_MODEL, stream=True, stream_options={"include_usage": True}, **kwargs
+        )
+        last_chunk = None
+        for chunk in stream:
+            last_chunk = chunk
+            # The usage chunk at the end has no choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                on_text(chunk.choices[0].delta.content)
+        return last_chunk
+
+    try:
+        last_chunk = llm.limiter.call(call, consume, kwargs["messages"], kwargs.get("max_tokens"))
+    except Exception as e:
+        metrics.record_llm_call(call, time.perf_counter() - started, error=e)
+        raise
+    metrics.record_llm_call(call, time.perf_counter() - started, last_chunk)
+    return "".join(parts)
+
+# Text that is summarized for a patent, also used to pre-warm the summary cache
+def patent_summary_input(patent) -> str:
+    return (patent.abstract or "") + " " + (patent.description or "")
+
+# Summarize with the given prompt, reusing a cached summary of the same input when there is one
+def _cached_summary(call: str, system_prompt: str, text: str, max_length: int) -> str:
+    key = summary_cache.summary_key(text, OPENAI_MODEL, max_length, kind=call)
+    cached = summary_cache.get_summary(key)
+    if cached is not None:
+        return cached
+
+    response = create_chat_completion(
+        call,
         messages=[
-            {"role": "system", "content": "Summarize the following text."},
+            {"role": "system", "content": system_prompt},
             {"role": "user", "content": text}
         ],
         max_tokens=max_length // 4  # Roughly control the summary length
     )
-    return response.choices[0].message.content.strip()
+    summary = response.choices[0].message.content.strip()
+    summary_cache.store_summary(key, OPENAI_MODEL, max_length, summary)
+    return summary
 
-# Use ChatGPT API to generate an overall risk assessment
-def generate_overall_risk_assessment(top_products: List[Tuple[str, str]]) -> str:
-    product_1, likelihood_1 = top_products[0]
-    product_2, likelihood_2 = top_products[1]
-    prompt = (
-        f"Product 1 Explanation:\n{product_1}\nLikelihood: {likelihood_1}\n\n"
-        f"Product 2 Explanation:\n{product_2}\nLikelihood: {likelihood_2}\n\n"
+def _summarize_chunk(chunk: str) -> str:
+    return _cached_summary(
+        "summarize_chunk", "Summarize the following section of a patent description.", chunk, SUMMARY_CHUNK_LENGTH
     )
-    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "Provide an overall risk assessment for the likelihood of infringement."},
-            {"role": "user", "content": prompt}
-        ]
+
+# Use ChatGPT API for summarizing text. Text over the chunk budget is summarized map-reduce style:
+# section-aware chunks are summarized in parallel (each cached on its own, so an edit only redoes
+# the chunks it touches) and the chunk summaries are combined into the final summary.
+def summarize_text(text: str, max_length: int = 2048) -> str:
+    with metrics.stage("summarize"):
+        if estimate_tokens(text) <= SUMMARY_CHUNK_TOKENS:
+            return _cached_summary("summarize", "Summarize the following text.", text, max_length)
+
+        key = summary_cache.summary_key(text, OPENAI_MODEL, max_length)
+        cached = summary_cache.get_summary(key)
+        if cached is not None:
+            return cached
+
+        summaries = list(summary_executor.map(metrics.bind_context(_summarize_chunk), chunk_text(text)))
+        # Very long inputs can leave more chunk summaries than fit one prompt, reduce them in rounds
+        while estimate_tokens("\n\n".join(summaries)) > SUMMARY_CHUNK_TOKENS:
+            reduced = list(summary_executor.map(
+                metrics.bind_context(_summarize_chunk), chunk_text("\n\n".join(summaries))
+            ))
+            if len(reduced) >= len(summaries):
+                break
+            summaries = reduced
+        summary = _cached_summary(
+            "summarize_reduce",
+            "Combine the following summaries of consecutive sections of one patent into a single summary.",
+            "\n\n".join(summaries),
+            max_length,
+        )
+        summary_cache.store_summary(key, OPENAI_MODEL, max_length, summary)
+        return summary
+
+# Use ChatGPT API to generate an overall risk assessment. With `on_text` the assessment is
+# streamed and each piece is passed to it as soon as the model produces it, see stream_chat_completion.
+def generate_overall_risk_assessment(top_products: List[Tuple[str, str]],
+                                     on_text: Optional[Callable[[str], None]] = None,
+                                     on_restart: Optional[Callable[[], None]] = None) -> str:
+    prompt = "".join(
+        f"Product {i} Explanation:\n{explanation}\nLikelihood: {likelihood}\n\n"
+        for i, (explanation, likelihood) in enumerate(top_products, start=1)
     )
+    
+    messages = [
+        {"role": "system", "content": "Provide an overall risk assessment for the likelihood of infringement."},
+        {"role": "user", "content": prompt}
+    ]
+    with metrics.stage("risk_assessment"):
+        if on_text is not None:
+            return stream_chat_completion("risk_assessment", on_text, on_restart, messages=messages).strip()
+        response = create_chat_completion("risk_assessment", messages=messages)
     return response.choices[0].message.content.strip()
 
 def get_detailed_infringement_analysis(patent_summary, claims, product_description):
-    # Format claims into a readable format for the prompt
-    claims_text = "\n".join(f"Claim {claim['num']}: {claim['text']}" for claim in claims)
+    # Format claims into a readable format for the prompt, keeping to the claims token budget
+    claims_text = "\n".join(f"Claim {claim['num']}: {claim['text']}" for claim in budget_claims(claims))
     
     # ChatGPT prompt to request all needed details in JSON format
     prompt = (
@@ -86,14 +219,15 @@ def get_detailed_infringement_analysis(patent_summary, claims, product_descripti
     )
     
     # Requesting ChatGPT to generate the output
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": "You are an AI assistant helping with patent analysis."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    with metrics.stage("analyze_product"):
+        response = create_chat_completion(
+            "analyze_product",
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": "You are an AI assistant helping with patent analysis."},
+                {"role": "user", "content": prompt}
+            ]
+        )
     
     # Extracting the JSON response from ChatGPT
     response_json = response.choices[0].message.content.strip()
@@ -112,120 +246,494 @@ def get_detailed_infringement_analysis(patent_summary, claims, product_descripti
     
     return parsed_response
 
-# Main function for patent infringement check logic
-def patent_infringement_check_logic(publication_number: str, company_name: str, db: Session) -> Dict[str, Any]:
-    patent = db.query(Patent).filter(Patent.publication_number == publication_number).first()
-    company = search_company_by_name(company_name, db)
-    if not patent:
-        raise ValueError("Patent not found")
-    if not company:
-        raise ValueError("Company not found")
+# Key phrase and claim term counts stored at ingest, computed on the fly for rows not backfilled yet
+def patent_phrases(patent: Patent, claims_text: List[str]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    key_phrases = patent.key_phrases if patent.key_phrases is not None else count_key_phrases(claims_text)
+    claim_terms = patent.claim_terms if patent.claim_terms is not None else query_terms(claims_text)
+    return key_phrases, claim_terms
 
-    patent_summary = summarize_text(patent.abstract + " " + patent.description)
-    claims_text = [claim.text for claim in patent.claims]
-    key_phrases = extract_key_phrases(claims_text)
-    products = db.query(Product).filter(Product.company_id == company.id).all()
+# Relevance of each product to the patent claims, using the configured ranking backend.
+# The fuzzy scorer compares the key phrases, BM25 uses the terms of the full claim text.
+def score_products(key_phrases: Dict[str, int], claim_terms: Dict[str, int], products: List[Product], db: Session,
+                   backend: Optional[str] = None) -> List[Tuple[Product, float]]:
+    with metrics.stage("rank_products"):
+        if (backend or RANKING_BACKEND) == "fuzzy":
+            return fuzzy_score_products(key_phrases, products)
+        scores = product_ranker.score(db, [product.id for product in products], claim_terms)
+        return list(zip(products, scores))
 
+# Average fuzzy match score of the claim key phrases against each product description.
+# Each distinct phrase is scored once and weighted by how often it occurs in the claims.
+def fuzzy_score_products(key_phrases: Dict[str, int], products: List[Product]) -> List[Tuple[Product, float]]:
+    total = sum(key_phrases.values())
     relevance_scores = []
     for product in products:
         description = product.description or ""
         # Calculate the fuzzy match scores for each key phrase
-        scores = [fuzz.partial_ratio(phrase, description) for phrase in key_phrases]
+        scores = [fuzz.partial_ratio(phrase, description) * count for phrase, count in key_phrases.items()]
         
         # Calculate the average score
-        avg_score = sum(scores) / len(scores) if scores else 0  # Handle empty scores gracefully
+        avg_score = sum(scores) / total if total else 0  # Handle empty scores gracefully
         relevance_scores.append((product, avg_score))
+    return relevance_scores
 
-    top_products = sorted(relevance_scores, key=lambda x: x[1], reverse=True)[:2]
-    analysis = InfringementAnalysis(
-        id=str(uuid.uuid4()),
-        patent_id=patent.publication_number,
-        company_id=company.id,
-        analysis_date=func.current_date(),
-        overall_risk_assessment=""
+# The top_n products from the offline candidates job, which has usually ranked them already for the
+# BM25 backend. None when they have to be scored on the spot.
+def precomputed_ranking(db: Session, patent: Patent, products: List[Product],
+                        top_n: int) -> Optional[List[Tuple[Product, float]]]:
+    if RANKING_BACKEND != "bm25":
+        return None
+    return precomputed_top_products(db, patent, products, top_n)
+
+def rank_products(scored_products: List[Tuple[Product, float]], top_n: int) -> List[Tuple[Product, float]]:
+    return sorted(scored_products, key=lambda x: x[1], reverse=True)[:top_n]
+
+def _build_infringing_product(analysis_id: str, product: Product, response: Dict[str, Any],
+                              score: Optional[float] = None) -> InfringingProduct:
+    return InfringingProduct(
+        analysis_id=analysis_id,
+        product_id=product.id,
+        product_name=product.name,
+        infringement_likelihood=response.get("likelihood", "Unknown"),
+        relevant_claims=response.get("relevant_claims", []),
+        explanation=response.get("explanation", "No explanation provided."),
+        specific_features=response.get("specific_features", []),
+        score=score,
     )
-    db.add(analysis)
-    db.commit()
 
-    top_product_explanations = []
-    for product, score in top_products:
-        response = get_detailed_infringement_analysis(
-            patent_summary,
-            [{"num": claim.num, "text": claim.text} for claim in patent.claims],
-            product.description
-        )
-        relevant_claims = response.get("relevant_claims", [])
-        likelihood = response.get("likelihood", "Unknown")
-        specific_features = response.get("specific_features", [])
-        explanation = response.get("explanation", "No explanation provided.")
-        top_product_explanations.append((explanation, likelihood))
-
-        infringing_product = InfringingProduct(
-            analysis_id=analysis.id,
-            product_id=product.id,
-            product_name=product.name,
-            infringement_likelihood=likelihood,
-            relevant_claims=relevant_claims,
-            explanation=explanation,
-            specific_features=specific_features
+class AnalysisCancelled(Exception):
+    pass
+
+def _check_cancelled(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise AnalysisCancelled()
+
+def _serialize_infringing_product(product: InfringingProduct) -> Dict[str, Any]:
+    return {
+        "product_name": product.product_name,
+        "infringement_likelihood": product.infringement_likelihood,
+        "relevant_claims": [claim["num"] for claim in product.relevant_claims],
+        "explanation": product.explanation,
+        "specific_features": product.specific_features
+    }
+
+# Identifies an analysis result: a version of the patent (ingest keeps its id when the claims or
+# text change, source_hash tells them apart), the resolved company and a version of its product set,
+# plus everything else the output depends on (top_n, ranking backend, model and prompt version)
+def analysis_cache_key(patent: Patent, company_id: str, products: List[Product], top_n: int) -> str:
+    digest = hashlib.sha256()
+    digest.update(
+        f"{ANALYSIS_PROMPT_VERSION}\0{OPENAI_MODEL}\0{RANKING_BACKEND}\0{top_n}\0{patent.id}\0{patent.source_hash}\0"
+        f"{company_id}\0".encode("utf-8")
+    )
+    for product in sorted(products, key=lambda product: product.id):
+        digest.update(f"{product.id}\0{product.name}\0{product.description}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+analysis_cache_stats = {"hits": 0, "misses": 0}
+_analysis_cache_lock = threading.Lock()
+metrics.register_cache("analysis", lambda: (analysis_cache_stats["hits"], analysis_cache_stats["misses"]))
+
+# Most recent finished analysis for each key inside the freshness window
+def find_cached_analyses(cache_keys: List[str], db: Session) -> Dict[str, InfringementAnalysis]:
+    found: Dict[str, InfringementAnalysis] = {}
+    if ANALYSIS_CACHE_TTL_SECONDS > 0 and cache_keys:
+        analyses = (
+            db.query(InfringementAnalysis)
+            .options(selectinload(InfringementAnalysis.top_infringing_products))
+            .filter(
+                InfringementAnalysis.cache_key.in_(cache_keys),
+                InfringementAnalysis.created_at >= datetime.utcnow() - timedelta(seconds=ANALYSIS_CACHE_TTL_SECONDS),
+                InfringementAnalysis.overall_risk_assessment != "",
+            )
+            .order_by(InfringementAnalysis.created_at.desc())
+            .all()
         )
-        db.add(infringing_product)
+        for analysis in analyses:
+            found.setdefault(analysis.cache_key, analysis)
+    with _analysis_cache_lock:
+        analysis_cache_stats["hits"] += len(found)
+        analysis_cache_stats["misses"] += len(set(cache_keys)) - len(found)
+    return found
 
-    analysis.overall_risk_assessment = generate_overall_risk_assessment(top_product_explanations)
-    db.commit()
+def find_cached_analysis(cache_key: str, db: Session) -> Optional[InfringementAnalysis]:
+    return find_cached_analyses([cache_key], db).get(cache_key)
 
+def _analysis_result(analysis: InfringementAnalysis, patent_id: str, company_name: str) -> Dict[str, Any]:
     return {
         "infringement_analysis": {
             'id': analysis.id,
-            "patent_id": patent.id,
-            "company_name": company.name,
+            "patent_id": patent_id,
+            "company_name": company_name,
             "analysis_date": analysis.analysis_date.isoformat(),
             "overall_risk_assessment": analysis.overall_risk_assessment,
             "top_infringing_products": [
-                {
-                    "product_name": product.product_name,
-                    "infringement_likelihood": product.infringement_likelihood,
-                    "relevant_claims": [claim["num"] for claim in product.relevant_claims],
-                    "explanation": product.explanation,
-                    "specific_features": product.specific_features
-                }
+                _serialize_infringing_product(product)
                 for product in analysis.top_infringing_products
             ]
         }
     }
 
+# Answer with an existing analysis. Callers that need the result under their own id (background
+# jobs, which are polled by it) get a copy of the analysis instead of a new LLM run.
+def _reuse_analysis(cached: InfringementAnalysis, patent: Patent, company: Company, db: Session,
+                    analysis_id: Optional[str], progress: Callable[[str, Any], None]) -> Dict[str, Any]:
+    analysis = cached
+    if analysis_id is not None and analysis_id != cached.id:
+        analysis = InfringementAnalysis(
+            id=analysis_id,
+            patent_id=cached.patent_id,
+            company_id=cached.company_id,
+            analysis_date=date.today(),
+            overall_risk_assessment=cached.overall_risk_assessment,
+            cache_key=cached.cache_key,
+            created_at=cached.created_at,  # a copy is only as fresh as what it copies
+        )
+        analysis.top_infringing_products = [
+            InfringingProduct(
+                product_id=product.product_id,
+                product_name=product.product_name,
+                infringement_likelihood=product.infringement_likelihood,
+                relevant_claims=product.relevant_claims,
+                explanation=product.explanation,
+                specific_features=product.specific_features,
+                score=product.score,
+            )
+            for product in cached.top_infringing_products
+        ]
+        db.add(analysis)
+        with metrics.stage("commit"):
+            db.commit()
+
+    # Replay the events of a fresh run, so callers see the same sequence whether or not it was reused
+    result = _analysis_result(analysis, patent.id, company.name)
+    progress("ranked", [
+        {"product_name": product.product_name, "score": product.score} for product in analysis.top_infringing_products
+    ])
+    for product in result["infringement_analysis"]["top_infringing_products"]:
+        progress("product", product)
+    if analysis.overall_risk_assessment:
+        progress("risk_assessment", analysis.overall_risk_assessment)
+    return result
+
+# Identical checks running at the same time share one pipeline run
+analysis_flights = SingleFlight()
+
+# Main function for patent infringement check logic.
+# A fresh analysis of the same patent, company product set and settings is reused, and identical
+# checks that are already running are waited on instead of being started again.
+# `progress(event, data)` is called as stages finish ("resolved", "ranked", each "product" and the
+# "risk_assessment") and `cancel_event` is checked between stages, which lets background jobs and
+# streamed checks report partial results and stop early. Only with `stream_text` is the risk
+# assessment streamed from the model, as several "risk_assessment" pieces and a
+# "risk_assessment_restart" if the stream has to be retried; otherwise it comes in one piece.
+def patent_infringement_check_logic(
+    publication_number: str,
+    company_name: str,
+    db: Session,
+    top_n: int = DEFAULT_TOP_N,
+    analysis_id: Optional[str] = None,
+    progress: Optional[Callable[[str, Any], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    stream_text: bool = False,
+) -> Dict[str, Any]:
+    progress = progress or (lambda event, data: None)
+    with metrics.stage("load_patent"):
+        patent = db.query(Patent).filter(Patent.publication_number == publication_number).first()
+    company = search_company_by_name(company_name, db)
+    if not patent:
+        raise ValueError("Patent not found")
+    if not company:
+        raise ValueError("Company not found")
+    progress("resolved", {"patent_id": patent.publication_number, "company_name": company.name})
+
+    with metrics.stage("load_products"):
+        products = db.query(Product).filter(Product.company_id == company.id).all()
+    cache_key = analysis_cache_key(patent, company.id, products, top_n)
+    cached = find_cached_analysis(cache_key, db)
+    if cached is not None:
+        return _reuse_analysis(cached, patent, company, db, analysis_id, progress)
+
+    while True:
+        try:
+            result, leader = analysis_flights.do(
+                cache_key,
+                lambda: _run_analysis(patent, company, products, cache_key, db, top_n, analysis_id, progress,
+                                      cancel_event, stream_text),
+                check=lambda: _check_cancelled(cancel_event),
+            )
+            break
+        except AnalysisCancelled:
+            # Only give up if this caller was cancelled, not the run it was waiting on
+            if cancel_event is not None and cancel_event.is_set():
+                raise
+
+    if leader:
+        return result
+    metrics.analysis_coalesced.inc()
+    shared = db.get(InfringementAnalysis, result["infringement_analysis"]["id"])
+    return _reuse_analysis(shared, patent, company, db, analysis_id, progress)
+
+# Run the full pipeline for one patent and company and store the analysis
+def _run_analysis(
+    patent: Patent,
+    company: Company,
+    products: List[Product],
+    cache_key: str,
+    db: Session,
+    top_n: int,
+    analysis_id: Optional[str],
+    progress: Callable[[str, Any], None],
+    cancel_event: Optional[threading.Event],
+    stream_text: bool = False,
+) -> Dict[str, Any]:
+    patent_summary = summarize_text(patent_summary_input(patent))
+    _check_cancelled(cancel_event)
+    top_products = precomputed_ranking(db, patent, products, top_n)
+    if top_products is None:
+        claims_text = [claim.text for claim in patent.claims]
+        key_phrases, claim_terms = patent_phrases(patent, claims_text)
+        top_products = rank_products(score_products(key_phrases, claim_terms, products, db), top_n)
+    progress("ranked", [{"product_name": product.name, "score": score} for product, score in top_products])
+    _check_cancelled(cancel_event)
+
+    analysis = InfringementAnalysis(
+        id=analysis_id or str(uuid.uuid4()),
+        patent_id=patent.publication_number,
+        company_id=company.id,
+        analysis_date=func.current_date(),
+        overall_risk_assessment="",
+        cache_key=cache_key,
+    )
+    db.add(analysis)
+    with metrics.stage("commit"):
+        db.commit()
+
+    try:
+        # The per-product analyses are independent, so run them concurrently and keep the ranking order
+        claims = [{"num": claim.num, "text": claim.text} for claim in patent.claims]
+        descriptions = [product.description for product, score in top_products]
+        responses = llm_executor.map(
+            metrics.bind_context(
+                lambda description: get_detailed_infringement_analysis(patent_summary, claims, description)
+            ),
+            descriptions
+        )
+
+        top_product_explanations = []
+        for (product, score), response in zip(top_products, responses):
+            infringing_product = _build_infringing_product(analysis.id, product, response, score)
+            top_product_explanations.append((infringing_product.explanation, infringing_product.infringement_likelihood))
+            db.add(infringing_product)
+            progress("product", _serialize_infringing_product(infringing_product))
+        _check_cancelled(cancel_event)
+
+        if stream_text:
+            analysis.overall_risk_assessment = generate_overall_risk_assessment(
+                top_product_explanations,
+                on_text=lambda text: progress("risk_assessment", text),
+                on_restart=lambda: progress("risk_assessment_restart", None),
+            )
+        else:
+            analysis.overall_risk_assessment = generate_overall_risk_assessment(top_product_explanations)
+            progress("risk_assessment", analysis.overall_risk_assessment)
+        _check_cancelled(cancel_event)
+        # Only finished analyses count for the freshness window
+        analysis.created_at = datetime.utcnow()
+        with metrics.stage("commit"):
+            db.commit()
+    except AnalysisCancelled:
+        # Don't leave a half-written analysis behind
+        db.rollback()
+        db.query(InfringementAnalysis).filter(InfringementAnalysis.id == analysis.id).delete()
+        db.commit()
+        raise
+
+    return _analysis_result(analysis, patent.id, company.name)
+
+# Check many patents against many companies. Pairs with a fresh cached analysis are answered from it,
+# for the rest each patent is summarized and tokenized once, every product is scored once per patent,
+# all LLM calls share llm_executor and all analyses are written in a single commit. A pair whose LLM
+# calls fail is reported in `errors`, the other pairs are still answered and stored.
+def batch_infringement_check_logic(
+    publication_numbers: List[str],
+    company_names: List[str],
+    db: Session,
+    top_n: int = DEFAULT_TOP_N,
+) -> Dict[str, Any]:
+    errors = []
+
+    with metrics.stage("load_patent"):
+        patents = (
+            db.query(Patent)
+            .options(selectinload(Patent.claims))
+            .filter(Patent.publication_number.in_(publication_numbers))
+            .all()
+        )
+    patents_by_number = {patent.publication_number: patent for patent in patents}
+    patents = []
+    for publication_number in dict.fromkeys(publication_numbers):
+        if publication_number in patents_by_number:
+            patents.append(patents_by_number[publication_number])
+        else:
+            errors.append({"publication_number": publication_number, "company_name": None, "detail": "Patent not found"})
+
+    companies = {}
+    for company_name in dict.fromkeys(company_names):
+        try:
+            company = search_company_by_name(company_name, db)
+        except ValueError as e:
+            errors.append({"publication_number": None, "company_name": company_name, "detail": str(e)})
+            continue
+        companies.setdefault(company.id, company)
+
+    with metrics.stage("load_products"):
+        products = db.query(Product).filter(Product.company_id.in_(list(companies))).all() if companies else []
+    products_by_company: Dict[str, List[Product]] = {company_id: [] for company_id in companies}
+    for product in products:
+        products_by_company[product.company_id].append(product)
+
+    cache_keys = {
+        (patent.id, company_id): analysis_cache_key(patent, company_id, products_by_company[company_id], top_n)
+        for patent in patents for company_id in companies
+    }
+    cached = find_cached_analyses(list(cache_keys.values()), db)
+    publication_numbers_by_id = {patent.id: patent.publication_number for patent in patents}
+    results_by_pair = {
+        (patent_id, company_id): _analysis_result(
+            cached[cache_key], publication_numbers_by_id[patent_id], companies[company_id].name
+        )
+        for (patent_id, company_id), cache_key in cache_keys.items() if cache_key in cached
+    }
+    patents_to_run = [
+        patent for patent in patents
+        if any((patent.id, company_id) not in results_by_pair for company_id in companies)
+    ]
+
+    def pair_failed(patent: Patent, company: Company, e: Exception):
+        errors.append({
+            "publication_number": patent.publication_number,
+            "company_name": company.name,
+            "detail": f"Analysis failed: {e}",
+        })
+
+    # Per-patent work that does not depend on the company
+    summary_futures = [
+        llm_executor.submit(metrics.bind_context(summarize_text), patent_summary_input(patent)) for patent in patents_to_run
+    ]
+    prepared = []
+    for patent, summary_future in zip(patents_to_run, summary_futures):
+        try:
+            patent_summary = summary_future.result()
+        except Exception as e:
+            for company_id, company in companies.items():
+                if (patent.id, company_id) not in results_by_pair:
+                    pair_failed(patent, company, e)
+            continue
+        claims = [{"num": claim.num, "text": claim.text} for claim in patent.claims]
+        top_by_company = {
+            company_id: precomputed_ranking(db, patent, products_by_company[company_id], top_n)
+            for company_id in companies if (patent.id, company_id) not in results_by_pair
+        }
+
+        # One scoring pass over the products of every company without usable candidates
+        unranked = [company_id for company_id, top_products in top_by_company.items() if top_products is None]
+        if unranked:
+            key_phrases, claim_terms = patent_phrases(patent, [claim["text"] for claim in claims])
+            scored_by_company: Dict[str, List[Tuple[Product, float]]] = {company_id: [] for company_id in unranked}
+            to_score = [product for company_id in unranked for product in products_by_company[company_id]]
+            for product, score in score_products(key_phrases, claim_terms, to_score, db):
+                scored_by_company[product.company_id].append((product, score))
+            for company_id in unranked:
+                top_by_company[company_id] = rank_products(scored_by_company[company_id], top_n)
+
+        for company_id, top_products in top_by_company.items():
+            prepared.append((patent, companies[company_id], patent_summary, claims, top_products))
+
+    # Fan out every per-product analysis at once, then every risk assessment
+    product_futures = [
+        [
+            llm_executor.submit(metrics.bind_context(get_detailed_infringement_analysis), patent_summary, claims, product.description)
+            for product, score in top_products
+        ]
+        for patent, company, patent_summary, claims, top_products in prepared
+    ]
+
+    analyses = []
+    risk_futures = []
+    for (patent, company, patent_summary, claims, top_products), futures in zip(prepared, product_futures):
+        analysis = InfringementAnalysis(
+            id=str(uuid.uuid4()),
+            patent_id=patent.publication_number,
+            company_id=company.id,
+            analysis_date=date.today(),
+            overall_risk_assessment="",
+            cache_key=cache_keys[(patent.id, company.id)],
+        )
+        try:
+            infringing_products = [
+                _build_infringing_product(analysis.id, product, future.result(), score)
+                for (product, score), future in zip(top_products, futures)
+            ]
+        except Exception as e:
+            pair_failed(patent, company, e)
+            continue
+        analysis.top_infringing_products = infringing_products
+        analyses.append((analysis, patent, company))
+        risk_futures.append(llm_executor.submit(
+            metrics.bind_context(generate_overall_risk_assessment),
+            [(product.explanation, product.infringement_likelihood) for product in infringing_products]
+        ))
+
+    finished = []
+    for (analysis, patent, company), future in zip(analyses, risk_futures):
+        try:
+            analysis.overall_risk_assessment = future.result()
+        except Exception as e:
+            pair_failed(patent, company, e)
+            continue
+        analysis.created_at = datetime.utcnow()
+        finished.append(analysis)
+        results_by_pair[(patent.id, company.id)] = _analysis_result(analysis, patent.publication_number, company.name)
+
+    db.add_all(finished)
+    with metrics.stage("commit"):
+        db.commit()
+
+    results = [
+        results_by_pair[(patent.id, company_id)]
+        for patent in patents for company_id in companies if (patent.id, company_id) in results_by_pair
+    ]
+    return {"results": results, "errors": errors}
+
 def get_infringement_report(analysis_id: str, db: Session) -> schemas.InfringementResponse:
-    # Fetch the infringement analysis by ID
-    analysis = db.query(InfringementAnalysis).filter(InfringementAnalysis.id == analysis_id).first()
-    if not analysis:
+    # Fetch the analysis with its company, patent and infringing products in one query
+    with metrics.stage("load_report"):
+        rows = (
+            db.query(InfringementAnalysis, Company.name, Patent.publication_number, InfringingProduct)
+            .outerjoin(Company, Company.id == InfringementAnalysis.company_id)
+            .outerjoin(Patent, Patent.publication_number == InfringementAnalysis.patent_id)
+            .outerjoin(InfringingProduct, InfringingProduct.analysis_id == InfringementAnalysis.id)
+            .filter(InfringementAnalysis.id == analysis_id)
+            .all()
+        )
+    if not rows:
         raise HTTPException(status_code=404, detail="Infringement analysis not found")
-        
-    # Fetch the related company and patent
-    company = db.query(Company).filter(Company.id == analysis.company_id).first()
-    patent = db.query(Patent).filter(Patent.publication_number == analysis.patent_id).first()
-    if not company or not patent:
-        raise HTTPException(status_code=404, detail="Related company or patent not found")
 
-    # Fetch associated infringing products
-    infringing_products = db.query(InfringingProduct).filter(InfringingProduct.analysis_id == analysis_id).all()
+    analysis, company_name, publication_number, _ = rows[0]
+    if company_name is None or publication_number is None:
+        raise HTTPException(status_code=404, detail="Related company or patent not found")
 
     # Prepare the top infringing products in the required format
     top_infringing_products = [
-        {
-            "product_name": product.product_name,
-            "infringement_likelihood": product.infringement_likelihood,
-            "relevant_claims": [claim["num"] for claim in product.relevant_claims],
-            "explanation": product.explanation,
-            "specific_features": product.specific_features
-        }
-        for product in infringing_products
+        _serialize_infringing_product(product) for _, _, _, product in rows if product is not None
     ]
     # Structure the response
     response = {
         "infringement_analysis": {
             "id": analysis.id,
-            "patent_id": patent.publication_number,
-            "company_name": company.name,
+            "patent_id": publication_number,
+            "company_name": company_name,
             "analysis_date": analysis.analysis_date.isoformat(),  # Ensure ISO date format
             "overall_risk_assessment": analysis.overall_risk_assessment,
             "top_infringing_products": top_infringing_products
@@ -234,6 +742,35 @@ def get_infringement_report(analysis_id: str, db: Session) -> schemas.Infringeme
 
     return response
 
+# Serialized reports by analysis id. Finished reports never change, so entries are only
+# dropped when the analysis (or a company it names) is written again.
+report_cache = LRUCache(maxsize=int(os.getenv("REPORT_CACHE_SIZE", "2048")))
+
+def _invalidate_reports(analysis_ids: Optional[Set[str]]):
+    if analysis_ids is None:
+        report_cache.clear()
+    else:
+        for analysis_id in analysis_ids:
+            report_cache.pop(analysis_id)
+
+invalidation.on_change(InfringementAnalysis, _invalidate_reports, with_ids=True)
+invalidation.on_change(Company, report_cache.clear)
+metrics.register_cache("report", lambda: (report_cache.hits, report_cache.misses))
+
+# Read-through cache in front of get_infringement_report, returns the JSON body and its ETag
+def get_infringement_report_cached(analysis_id: str, db: Session) -> Tuple[bytes, str]:
+    cached = report_cache.get(analysis_id)
+    if cached is not None:
+        return cached
+
+    report = get_infringement_report(analysis_id, db)
+    body = json.dumps(jsonable_encoder(schemas.InfringementResponse(**report))).encode("utf-8")
+    entry = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+    # An empty risk assessment means the analysis is still being written
+    if report["infringement_analysis"]["overall_risk_assessment"]:
+        report_cache.set(analysis_id, entry)
+    return entry
+
 def save_infringement_report(analysis_id: str, db: Session) -> schemas.SavedReport:
     # Check if the report already exists
     if db.query(SavedReport).filter(SavedReport.analysis_id == analysis_id).first():
@@ -261,16 +798,24 @@ def list_saved_reports(db: Session):
     saved_reports = db.query(SavedReport).order_by(SavedReport.report_date.desc()).all()
     return saved_reports
 
+# Recent query -> company id resolutions, cleared whenever companies change
+company_match_cache = LRUCache(maxsize=int(os.getenv("COMPANY_MATCH_CACHE_SIZE", "4096")))
+invalidation.on_change(Company, company_match_cache.clear)
+metrics.register_cache("company_match", lambda: (company_match_cache.hits, company_match_cache.misses))
+
 # Retrieve a single company by name (fuzzy match)
 def search_company_by_name(company_name: str, db: Session, threshold: int = 60) -> Company:
-    companies = db.query(Company).all()
-    matches = [
-        (company, fuzz.ratio(company.name, company_name)) for company in companies
-        if fuzz.ratio(company.name, company_name) >= threshold
-    ]
-    
-    if not matches:
+    with metrics.stage("resolve_company"):
+        key = (company_name, threshold)
+        company_id = company_match_cache.get(key)
+        if company_id is None:
+            matches = company_index.search(company_name, db, threshold)
+            if not matches:
+                raise ValueError("No matching companies found")
+            company_id = matches[0][0]  # Get the company with the highest score
+            company_match_cache.set(key, company_id)
+
+        best_match = db.get(Company, company_id)
+    if best_match is None:
         raise ValueError("No matching companies found")
-    
-    best_match = max(matches, key=lambda x: x[1])[0]  # Get the company with the highest score
     return best_match
\ No newline at end of file
@@ -0,0 +1,112 @@
+# backend/app/streaming.py
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from models import SessionLocal
+from service import AnalysisCancelled, get_infringement_report_cached, patent_infringement_check_logic
+
+# Streamed checks running at the same time; further streams wait for a free worker
+MAX_CONCURRENT_STREAMS = int(os.getenv("MAX_CONCURRENT_STREAMS", "16"))
+# A comment line is sent after this long without events, so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# How long a stream waits for a free worker (and its first event) before giving up with "error"
+STREAM_START_TIMEOUT_SECONDS = float(os.getenv("STREAM_START_TIMEOUT_SECONDS", "30"))
+
+stream_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_STREAMS, thread_name_prefix="analysis-stream")
+
+_END = object()
+
+
+def format_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+# One infringement check run on stream_executor, with its progress turned into server-sent events:
+# "resolved", "ranked", each "product", "risk_assessment" text as it streams in and finally "report"
+# with the same body as GET /infringement-report/{analysis_id}. A "risk_assessment_restart" means the
+# model's stream broke off and the risk assessment text received so far is void. Failures end the
+# stream with "error".
+class AnalysisStream:
+    def __init__(self, publication_number: str, company_name: str, top_n: int):
+        self.cancel_event = threading.Event()
+        self.error: Optional[Dict[str, Any]] = None
+        self._events: "queue.Queue[Any]" = queue.Queue()
+        self._first: Optional[Tuple[str, str]] = None
+        self._timed_out = False
+        stream_executor.submit(self._run, publication_number, company_name, top_n)
+
+    def _emit(self, event: str, data: Any) -> None:
+        self._events.put((event, json.dumps(jsonable_encoder(data))))
+
+    def _fail(self, status_code: int, detail: Any) -> None:
+        self.error = {"status_code": status_code, "detail": detail}
+        self._emit("error", self.error)
+
+    def _run(self, publication_number: str, company_name: str, top_n: int) -> None:
+        # Gave up waiting for a worker, nobody reads this stream any more
+        if self.cancel_event.is_set():
+            self._events.put(_END)
+            return
+        db = SessionLocal()
+        try:
+            result = patent_infringement_check_logic(
+                publication_number,
+                company_name,
+                db,
+                top_n=top_n,
+                progress=self._emit,
+                cancel_event=self.cancel_event,
+                stream_text=True,
+            )
+            body, etag = get_infringement_report_cached(result["infringement_analysis"]["id"], db)
+            self._events.put(("report", body.decode("utf-8")))
+        except AnalysisCancelled:
+            pass
+        except ValueError as e:
+            self._fail(404, str(e))
+        except HTTPException as e:
+            self._fail(e.status_code, e.detail)
+        except Exception as e:
+            self._fail(500, str(e))
+        finally:
+            db.close()
+            self._events.put(_END)
+
+    # Wait for the first event, so a check that fails up front (unknown patent or company)
+    # can still be answered with a plain error response instead of a stream. If no worker picks
+    # the check up in time, the stream consists of a single "error" event.
+    def first(self) -> Optional[Tuple[str, str]]:
+        try:
+            item = self._events.get(timeout=STREAM_START_TIMEOUT_SECONDS)
+        except queue.Empty:
+            self.cancel_event.set()
+            self._timed_out = True
+            item = ("error", json.dumps({"status_code": 503, "detail": "All analysis workers are busy, try again later"}))
+        self._first = None if item is _END else item
+        return self._first
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            if self._first is not None:
+                yield format_event(*self._first)
+            if self._timed_out:
+                return
+            while True:
+                try:
+                    item = self._events.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is _END:
+                    return
+                yield format_event(*item)
+        finally:
+            # Also reached when the client disconnects, stop the analysis instead of finishing it unread
+            self.cancel_event.set()
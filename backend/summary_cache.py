@@ -0,0 +1,160 @@
+# backend/app/summary_cache.py
+import argparse
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+import metrics
+from models import Patent, PatentSummary, SessionLocal
+
+# Entries older than this are summarized again, 0 keeps them forever
+SUMMARY_CACHE_TTL_DAYS = float(os.getenv("SUMMARY_CACHE_TTL_DAYS", "90"))
+# Least recently used entries are evicted above this size
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "100000"))
+# A hit only writes its last-used time when the stored one is older than this, so most reads stay reads
+SUMMARY_TOUCH_INTERVAL_SECONDS = int(os.getenv("SUMMARY_TOUCH_INTERVAL_SECONDS", "60"))
+# Eviction runs once every this many stores per process, the cache may exceed its size by that much
+SUMMARY_EVICT_EVERY = int(os.getenv("SUMMARY_EVICT_EVERY", "100"))
+
+stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_stores_since_evict = 0
+metrics.register_cache("summary", lambda: (stats["hits"], stats["misses"]))
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        stats[name] += n
+
+
+# `kind` separates summaries made with different prompts (e.g. chunk summaries) of the same text
+def summary_key(text: str, model: str, max_length: int, kind: str = "summarize") -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{model}\0{max_length}\0".encode("utf-8"))
+    if kind != "summarize":
+        digest.update(f"{kind}\0".encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _is_expired(entry: PatentSummary, now: datetime) -> bool:
+    return bool(SUMMARY_CACHE_TTL_DAYS) and entry.created_at < now - timedelta(days=SUMMARY_CACHE_TTL_DAYS)
+
+
+def get_summary(key: str) -> Optional[str]:
+    db = SessionLocal()
+    try:
+        entry = db.get(PatentSummary, key)
+        now = datetime.utcnow()
+        if entry is None or _is_expired(entry, now):
+            _count("misses")
+            return None
+        if entry.last_used_at < now - timedelta(seconds=SUMMARY_TOUCH_INTERVAL_SECONDS):
+            entry.last_used_at = now
+            db.commit()
+        _count("hits")
+        return entry.summary
+    finally:
+        db.close()
+
+
+def store_summary(key: str, model: str, max_length: int, summary: str) -> None:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.merge(PatentSummary(
+            key=key,
+            model=model,
+            max_length=max_length,
+            summary=summary,
+            created_at=now,
+            last_used_at=now,
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process stored the same summary between our merge() lookup and the insert
+            db.rollback()
+            return
+        if _evict_due():
+            evict(db)
+    finally:
+        db.close()
+
+
+def _evict_due() -> bool:
+    global _stores_since_evict
+    with _stats_lock:
+        _stores_since_evict += 1
+        if _stores_since_evict < SUMMARY_EVICT_EVERY:
+            return False
+        _stores_since_evict = 0
+        return True
+
+
+# Drop expired entries, then the least recently used ones above the size limit
+def evict(db) -> int:
+    removed = 0
+    if SUMMARY_CACHE_TTL_DAYS:
+        cutoff = datetime.utcnow() - timedelta(days=SUMMARY_CACHE_TTL_DAYS)
+        removed += db.query(PatentSummary).filter(PatentSummary.created_at < cutoff).delete(synchronize_session=False)
+
+    excess = db.query(PatentSummary).count() - SUMMARY_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = (
+            db.query(PatentSummary.key)
+            .order_by(PatentSummary.last_used_at)
+            .limit(excess)
+            .subquery()
+        )
+        removed += db.query(PatentSummary).filter(PatentSummary.key.in_(oldest.select())).delete(synchronize_session=False)
+
+    db.commit()
+    if removed:
+        _count("evictions", removed)
+    return removed
+
+
+# Summarize every patent that does not have a cached summary yet
+def warm(workers: int = 4, batch_size: int = 100) -> int:
+    from service import patent_summary_input, summarize_text
+
+    db = SessionLocal()
+    try:
+        patent_ids = [patent_id for (patent_id,) in db.query(Patent.id).order_by(Patent.id)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(patent_ids), batch_size):
+                # Read a batch fully before summarizing so no read cursor is held during the writes
+                rows = (
+                    db.query(Patent.abstract, Patent.description)
+                    .filter(Patent.id.in_(patent_ids[start:start + batch_size]))
+                    .all()
+                )
+                list(executor.map(summarize_text, [patent_summary_input(row) for row in rows]))
+    finally:
+        db.close()
+    return len(patent_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the cached LLM patent summaries.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warm_parser = subparsers.add_parser("warm", help="Summarize all patents ahead of time")
+    warm_parser.add_argument("--workers", type=int, default=4, help="Concurrent summarize calls")
+    subparsers.add_parser("evict", help="Remove expired and least recently used summaries")
+    args = parser.parse_args()
+
+    if args.command == "warm":
+        count = warm(args.workers)
+        print(f"Warmed {count} patents: {stats['hits']} already cached, {stats['misses']} summarized")
+    else:
+        db = SessionLocal()
+        try:
+            print(f"Evicted {evict(db)} summaries")
+        finally:
+            db.close()
@@ -0,0 +1,113 @@
+# backend/tests/conftest.py
+# The app reads its configuration at import time, so the environment is set before anything from
+# the backend is imported. Tests run against a throwaway SQLite file unless TEST_DATABASE_URL
+# points at another (disposable!) database, e.g. a local Postgres.
+import json
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date
+
+import pytest
+
+_tmp_dir = tempfile.mkdtemp(prefix="patent-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_tmp_dir}/test.db"
+os.environ["LOCK_DIR"] = _tmp_dir
+os.environ["OPENAI_API_KEY"] = "test"
+os.environ["SYNC_ON_STARTUP"] = "false"
+os.environ["LAZY_STARTUP"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Claim, Company, InfringementAnalysis, InfringingProduct, Patent, Product, SessionLocal  # noqa: E402
+
+
+# OpenAI client replaced by the in-process stand-in for the duration of a test
+@pytest.fixture
+def fake_openai():
+    import service
+    from benchmarks.fake_openai import FakeOpenAI, install
+
+    fake = FakeOpenAI(latency_ms=0, response_chars=200, seed=1)
+    previous = install(fake)
+    try:
+        yield fake
+    finally:
+        service.client = previous
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def patent(db):
+    publication_number = f"US-{uuid.uuid4().hex[:10].upper()}-B2"
+    patent = Patent(publication_number=publication_number, title="Shopping list device", abstract="A mobile device.",
+                    assignee="Acme", claims=[Claim(num="00001", text="A mobile device comprising a display.")])
+    db.add(patent)
+    db.commit()
+    return patent
+
+
+@pytest.fixture
+def company(db):
+    company = Company(name=f"Company {uuid.uuid4().hex[:8]}",
+                      products=[Product(name="Shopping app", description="Mobile shopping list app")])
+    db.add(company)
+    db.commit()
+    return company
+
+
+# Finished analysis of the patent against the company, with one infringing product per entry of
+# `relevant_claims` (a list of claim dicts as the LLM returned them)
+@pytest.fixture
+def make_analysis(db, patent, company):
+    def make(relevant_claims=({"num": "00001", "text": "A mobile device comprising a display."},),
+             specific_features=("Shopping list",)):
+        analysis = InfringementAnalysis(
+            patent_id=patent.publication_number,
+            company_id=company.id,
+            analysis_date=date.today(),
+            overall_risk_assessment="Moderate risk.",
+            top_infringing_products=[InfringingProduct(
+                product_id=company.products[0].id,
+                product_name=company.products[0].name,
+                infringement_likelihood="High",
+                relevant_claims=list(relevant_claims),
+                explanation="Matches the claims.",
+                specific_features=list(specific_features),
+            )],
+        )
+        db.add(analysis)
+        db.commit()
+        return analysis
+    return make
+
+
+# Source file with a single patent. Ingests here never prune, other tests' rows live in the same database.
+@pytest.fixture
+def patent_source(tmp_path):
+    path = tmp_path / "patents.json"
+    record = {
+        "publication_number": f"US-{uuid.uuid4().hex[:10].upper()}-B1",
+        "title": "Shopping list device",
+        "abstract": "A mobile device.",
+        "description": "",
+        "assignee": "Acme",
+        "claims": json.dumps([{"num": "00001", "text": "A mobile device comprising a display."}]),
+    }
+
+    def write(**changes):
+        record.update(changes)
+        path.write_text(json.dumps([record]), encoding="utf-8")
+        return str(path)
+
+    write()
+    return record, write
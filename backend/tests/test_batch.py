@@ -0,0 +1,58 @@
+# backend/tests/test_batch.py
+import uuid
+
+from fastapi.testclient import TestClient
+
+import main
+import service
+from candidates import refresh_candidates
+from models import Company, InfringementAnalysis, Product
+
+
+def test_failed_pair_does_not_fail_the_batch(db, patent, company, fake_openai, monkeypatch):
+    failing = Company(name=f"Company {uuid.uuid4().hex[:8]}",
+                      products=[Product(name="Scanner", description="Handheld barcode scanner that fails")])
+    db.add(failing)
+    db.commit()
+
+    analyze = service.get_detailed_infringement_analysis
+
+    def flaky(patent_summary, claims, product_description):
+        if product_description == "Handheld barcode scanner that fails":
+            raise RuntimeError("rate limited")
+        return analyze(patent_summary, claims, product_description)
+
+    monkeypatch.setattr(service, "get_detailed_infringement_analysis", flaky)
+    response = TestClient(main.app).post("/patent-infringement/batch", json={
+        "publication_numbers": [patent.publication_number], "company_names": [company.name, failing.name], "top_n": 1,
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["infringement_analysis"]["company_name"] for result in body["results"]] == [company.name]
+    assert body["errors"] == [{
+        "publication_number": patent.publication_number, "company_name": failing.name,
+        "detail": "Analysis failed: rate limited",
+    }]
+    stored = db.query(InfringementAnalysis).filter(InfringementAnalysis.patent_id == patent.publication_number).all()
+    assert [analysis.company_id for analysis in stored] == [company.id]
+    assert stored[0].id == body["results"][0]["infringement_analysis"]["id"]
+
+
+def test_batch_uses_the_precomputed_candidates(db, patent, company, fake_openai, monkeypatch):
+    refresh_candidates()
+
+    def score_products(*args, **kwargs):
+        raise AssertionError("products were scored although their candidates are stored")
+
+    monkeypatch.setattr(service, "score_products", score_products)
+    response = TestClient(main.app).post("/patent-infringement/batch", json={
+        "publication_numbers": [patent.publication_number], "company_names": [company.name], "top_n": 1,
+    })
+
+    assert response.status_code == 200
+    assert response.json()["errors"] == []
+    [result] = response.json()["results"]
+    assert [product["product_name"] for product in result["infringement_analysis"]["top_infringing_products"]] == [
+        "Shopping app"
+    ]
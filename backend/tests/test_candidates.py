@@ -0,0 +1,83 @@
+# backend/tests/test_candidates.py
+import random
+import string
+import uuid
+
+import pytest
+
+from candidates import refresh_candidates
+from models import Claim, Company, Patent, PatentCandidate, Product
+
+TOP_K = 2
+
+
+def _word() -> str:
+    return "".join(random.choice(string.ascii_lowercase) for _ in range(12))
+
+
+# Patents and products sharing terms nothing else in the database uses, with clearly separated
+# scores, so the rankings don't depend on the rest of the corpus
+@pytest.fixture
+def corpus(db):
+    a, b = _word(), _word()
+    patents = [
+        Patent(publication_number=f"US-{uuid.uuid4().hex[:10].upper()}-B2", title=title,
+               claims=[Claim(num="00001", text=text)])
+        for title, text in (("A", f"A device with {a}."), ("B", f"A device with {b}."),
+                            ("AB", f"A device with {a} and {b}."))
+    ]
+    company = Company(name=f"Company {uuid.uuid4().hex[:8]}", products=[
+        Product(name=name, description=description) for name, description in (
+            ("a3", f"{a} {a} {a} tool"),
+            ("a2", f"{a} {a} tool tool tool"),
+            ("a1", f"{a} tool tool tool tool tool tool"),
+            ("b2", f"{b} {b} tool tool"),
+            ("b1", f"{b} tool tool tool tool tool"),
+        )
+    ])
+    db.add_all(patents + [company])
+    db.commit()
+    return patents, company, a, b
+
+
+def _rows(db, patents):
+    db.expire_all()
+    return {
+        patent.title: [
+            row.product_id for row in
+            db.query(PatentCandidate).filter(PatentCandidate.patent_id == patent.id).order_by(PatentCandidate.rank)
+        ]
+        for patent in patents
+    }
+
+
+def _names(db, rows):
+    names = dict(db.query(Product.id, Product.name))
+    return {title: [names[product_id] for product_id in product_ids] for title, product_ids in rows.items()}
+
+
+def test_incremental_update_matches_a_full_recompute(db, corpus):
+    patents, company, a, b = corpus
+    refresh_candidates(top_k=TOP_K)
+    # How the two terms of AB weigh against each other depends on the rest of the corpus
+    names = _names(db, _rows(db, patents))
+    assert (names["A"], names["B"]) == (["a3", "a2"], ["b2", "b1"])
+
+    # A product that makes the top k of some rows, one that makes none, and removing one that is stored
+    by_name = {product.name: product for product in company.products}
+    company.products.append(Product(name="a4", description=f"{a} {a} {a} {a}"))
+    company.products.append(Product(name="b0", description=f"{b} tool tool tool tool tool tool tool tool"))
+    db.delete(by_name["b2"])
+    db.commit()
+
+    stats = refresh_candidates(top_k=TOP_K)
+    assert stats["products scored"] == 2
+    incremental = _rows(db, patents)
+    refresh_candidates(top_k=TOP_K, full=True)
+    assert incremental == _rows(db, patents)
+    names = _names(db, incremental)
+    assert (names["A"], names["B"]) == (["a4", "a3"], ["b1", "b0"])
+
+    # Nothing changed since, so nothing is scored
+    assert refresh_candidates(top_k=TOP_K) == {"patents scored": 0, "products scored": 0, "patents updated": 0,
+                                               "patents removed": 0}
@@ -0,0 +1,105 @@
+# backend/tests/test_coalescing.py
+# Identical checks in flight at the same time share one pipeline run (service.analysis_flights)
+import threading
+import time
+import uuid
+
+import pytest
+
+import service
+from models import Claim, InfringementAnalysis, Patent, SessionLocal
+
+# Summary of the patent, one product analysis (top_n=1) and the risk assessment
+CALLS_PER_ANALYSIS = 3
+
+
+# A patent nobody has summarized yet, so the summary cache doesn't hide the summary call
+@pytest.fixture
+def fresh_patent(db):
+    publication_number = f"US-{uuid.uuid4().hex[:10].upper()}-B2"
+    patent = Patent(publication_number=publication_number, title="Shopping list device",
+                    abstract=f"A mobile device {uuid.uuid4().hex}.", assignee="Acme",
+                    claims=[Claim(num="00001", text="A mobile device comprising a display.")])
+    db.add(patent)
+    db.commit()
+    return patent
+
+
+# Runs the check in its own thread and session, like a second request
+class Check(threading.Thread):
+    def __init__(self, patent, company, cancel_event=None):
+        super().__init__()
+        self.args = (patent.publication_number, company.name)
+        self.cancel_event = cancel_event
+        self.result = self.error = None
+
+    def run(self):
+        db = SessionLocal()
+        try:
+            self.result = service.patent_infringement_check_logic(*self.args, db, top_n=1, cancel_event=self.cancel_event)
+        except Exception as e:
+            self.error = e
+        finally:
+            db.close()
+
+
+def _wait_for_flight(key_count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while len(service.analysis_flights._calls) < key_count:
+        assert time.monotonic() < deadline, "the check never started its analysis"
+        time.sleep(0.01)
+
+
+# Set once a check is waiting on another one's run, i.e. calls the waiting check without a cancel event
+@pytest.fixture
+def follower_waiting(monkeypatch):
+    waiting = threading.Event()
+    check_cancelled = service._check_cancelled
+
+    def check(cancel_event):
+        if cancel_event is None:
+            waiting.set()
+        check_cancelled(cancel_event)
+
+    monkeypatch.setattr(service, "_check_cancelled", check)
+    return waiting
+
+
+def test_identical_checks_share_one_set_of_llm_calls(db, fresh_patent, company, fake_openai, follower_waiting):
+    fake_openai.latency_ms = 200
+    leader = Check(fresh_patent, company, threading.Event())
+    leader.start()
+    _wait_for_flight(1)
+    follower = Check(fresh_patent, company)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert leader.error is None and follower.error is None
+    assert follower_waiting.is_set()
+    assert fake_openai.snapshot()["calls"] == CALLS_PER_ANALYSIS
+    assert follower.result == leader.result
+
+
+def test_cancelled_leader_does_not_fail_the_waiting_check(db, fresh_patent, company, fake_openai, follower_waiting):
+    fake_openai.latency_ms = 200
+    cancel = threading.Event()
+    leader = Check(fresh_patent, company, cancel)
+    leader.start()
+    _wait_for_flight(1)
+    follower = Check(fresh_patent, company)
+    follower.start()
+    assert follower_waiting.wait(5)
+    cancel.set()
+    leader.join()
+    follower.join()
+
+    assert isinstance(leader.error, service.AnalysisCancelled)
+    assert follower.error is None
+    analysis = follower.result["infringement_analysis"]
+    assert len(analysis["top_infringing_products"]) == 1
+    assert analysis["overall_risk_assessment"]
+    # The follower ran the pipeline itself, the cancelled run left nothing behind
+    stored = db.query(InfringementAnalysis).filter(InfringementAnalysis.patent_id == fresh_patent.publication_number)
+    assert [row.id for row in stored] == [analysis["id"]]
+    assert fake_openai.snapshot()["calls"] <= 2 * CALLS_PER_ANALYSIS
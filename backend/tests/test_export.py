@@ -0,0 +1,35 @@
+# backend/tests/test_export.py
+import csv
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+# Claim numbers as the shipped patent_data.db stores them
+INT_CLAIMS = [{"num": 1, "text": "A mobile device comprising a display."}, {"num": 2, "text": "The device of claim 1."}]
+
+
+def _export(patent, export_format):
+    response = TestClient(main.app).get("/export/analyses",
+                                        params={"format": export_format, "patent_id": patent.publication_number})
+    assert response.status_code == 200
+    return response.content
+
+
+def test_csv_export_with_integer_claim_numbers(patent, make_analysis):
+    analysis = make_analysis(relevant_claims=INT_CLAIMS)
+    rows = list(csv.DictReader(io.StringIO(_export(patent, "csv").decode("utf-8"))))
+    assert [(row["analysis_id"], row["relevant_claims"], row["specific_features"]) for row in rows] == [
+        (analysis.id, "1; 2", "Shopping list"),
+    ]
+
+
+def test_parquet_export_with_integer_claim_numbers(patent, make_analysis):
+    pq = pytest.importorskip("pyarrow.parquet")
+    analysis = make_analysis(relevant_claims=INT_CLAIMS)
+    table = pq.read_table(io.BytesIO(_export(patent, "parquet")))
+    [row] = table.to_pylist()
+    assert row["analysis_id"] == analysis.id
+    assert row["top_infringing_products"][0]["relevant_claims"] == ["1", "2"]
@@ -0,0 +1,36 @@
+# backend/tests/test_fulltext.py
+import json
+
+import pytest
+
+from fulltext import search_fulltext
+from ingest import ingest_patents
+from models import IS_SQLITE
+
+pytestmark = pytest.mark.skipif(not IS_SQLITE, reason="full-text search needs SQLite FTS5")
+
+
+def _found(db, query, publication_number):
+    return publication_number in {hit["publication_number"] for hit in search_fulltext(db, query, limit=100)}
+
+
+def test_ingested_claims_are_searchable(db, patent_source):
+    record, write = patent_source
+    ingest_patents(write(claims=json.dumps([
+        {"num": "00001", "text": "A mobile device comprising a zorblax."},
+        {"num": "00002", "text": "The device of claim 1 with a frobnicator."},
+    ])), prune=False)
+    assert _found(db, "zorblax frobnicator", record["publication_number"])
+
+    ingest_patents(write(claims=json.dumps([{"num": "00001", "text": "A mobile device comprising a quuxotic."}])),
+                   prune=False)
+    assert _found(db, "quuxotic", record["publication_number"])
+    assert not _found(db, "zorblax", record["publication_number"])
+
+
+def test_claims_written_through_the_orm_are_searchable(db, patent):
+    assert _found(db, "display", patent.publication_number)
+    patent.claims[0].text = "A mobile device comprising a glimmerscope."
+    db.flush()
+    assert _found(db, "glimmerscope", patent.publication_number)
+    assert not _found(db, "display", patent.publication_number)
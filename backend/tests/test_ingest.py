@@ -0,0 +1,172 @@
+# backend/tests/test_ingest.py
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import ingest
+import invalidation
+import main
+from ingest import ingest_companies, ingest_patents, iter_json_array
+from models import Claim, Company, Patent, Product, engine
+from service import patent_infringement_check_logic
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Items with escapes, brackets and separators inside strings, nesting and numbers that a chunk
+# boundary can cut in half
+STREAMED_ITEMS = [
+    {"publication_number": "US-1", "title": "Quote \" and ] bracket, comma", "claims": "[{\"num\": 1}]"},
+    {"nested": {"list": [[1, 2], [3, [4, {"deep": "]}"}]]], "empty": {}, "none": None}},
+    {"unicode": "café ☃ \U0001f600", "escaped": "\\u005d\\n\\t\\\\"},
+    1234567890, -0.5e-3, "plain string", [], True, None,
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16, 64, 4096])
+def test_iter_json_array_across_chunk_boundaries(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(ingest, "READ_CHUNK_SIZE", chunk_size)
+    path = tmp_path / "items.json"
+    path.write_text(json.dumps(STREAMED_ITEMS, indent=2, ensure_ascii=False), encoding="utf-8")
+    assert list(iter_json_array(str(path))) == STREAMED_ITEMS
+
+    path.write_text(json.dumps({"meta": {"count": 9}, "companies": STREAMED_ITEMS}), encoding="utf-8")
+    assert list(iter_json_array(str(path), key="companies")) == STREAMED_ITEMS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_iter_json_array_edge_cases(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(ingest, "READ_CHUNK_SIZE", chunk_size)
+    path = tmp_path / "items.json"
+    path.write_text(" \n [ ] ", encoding="utf-8")
+    assert list(iter_json_array(str(path))) == []
+
+    path.write_text('[{"a": 1}, {"b": ', encoding="utf-8")
+    with pytest.raises(ValueError, match="Truncated"):
+        list(iter_json_array(str(path)))
+
+    path.write_text('{"a": 1}', encoding="utf-8")
+    with pytest.raises(ValueError, match="No JSON array"):
+        list(iter_json_array(str(path)))
+
+
+def _patent_record(number: str, title: str, claims: list) -> dict:
+    return {"publication_number": number, "title": title, "abstract": "", "description": "", "assignee": "Acme",
+            "claims": json.dumps(claims)}
+
+
+# Pruning removes every patent and company that is not in the source, so these tests only use their own rows
+def test_ingest_patents_upserts_and_prunes(db, tmp_path):
+    path = tmp_path / "patents.json"
+    kept, changed, removed = (_patent_record(f"US-{n}-PRUNE", f"Patent {n}", [{"num": "00001", "text": f"Claim {n}."}])
+                              for n in (1, 2, 3))
+    path.write_text(json.dumps([kept, changed, removed]), encoding="utf-8")
+    ingest_patents(str(path), batch_size=2)
+    ids = dict(db.query(Patent.publication_number, Patent.id))
+
+    changed = dict(changed, title="Patent 2, amended",
+                   claims=json.dumps([{"num": "00001", "text": "New claim."}, {"num": "00002", "text": "Another."}]))
+    path.write_text(json.dumps([kept, changed]), encoding="utf-8")
+    stats = ingest_patents(str(path), batch_size=2)
+
+    assert stats == {"new patents": 0, "changed patents": 1, "unchanged patents": 1, "removed patents": 1,
+                     "claims written": 2}
+    db.expire_all()
+    patents = {patent.publication_number: patent for patent in db.query(Patent)}
+    assert set(patents) == {"US-1-PRUNE", "US-2-PRUNE"}
+    # Changed patents keep their id and have their claims replaced
+    assert {number: patent.id for number, patent in patents.items()} == {
+        number: ids[number] for number in ("US-1-PRUNE", "US-2-PRUNE")
+    }
+    assert patents["US-2-PRUNE"].title == "Patent 2, amended"
+    assert sorted(claim.text for claim in patents["US-2-PRUNE"].claims) == ["Another.", "New claim."]
+    assert db.query(Claim).filter(Claim.patent_id == ids["US-3-PRUNE"]).count() == 0
+
+    # Nothing changed, nothing written
+    assert ingest_patents(str(path))["unchanged patents"] == 2
+
+
+def test_ingest_companies_diffs_products_and_prunes(db, tmp_path):
+    path = tmp_path / "companies.json"
+
+    def write(*companies):
+        path.write_text(json.dumps({"companies": [
+            {"name": name, "products": [{"name": product, "description": description}
+                                        for product, description in products.items()]}
+            for name, products in companies
+        ]}), encoding="utf-8")
+        return str(path)
+
+    ingest_companies(write(("Kept Co", {"App": "An app"}),
+                           ("Changed Co", {"Same": "Unchanged", "Edited": "Old text", "Dropped": "Gone soon"}),
+                           ("Removed Co", {"Widget": "A widget"})))
+    product_ids = {(company, name): product_id for company, name, product_id in
+                   db.query(Company.name, Product.name, Product.id).join(Product, Product.company_id == Company.id)}
+
+    stats = ingest_companies(write(("Kept Co", {"App": "An app"}),
+                                   ("Changed Co", {"Same": "Unchanged", "Edited": "New text", "Added": "New"})))
+
+    assert stats == {"new companies": 0, "changed companies": 1, "unchanged companies": 1, "removed companies": 1,
+                     "products written": 2, "products removed": 2}
+    db.expire_all()
+    products = {(company, name): (product_id, description) for company, name, product_id, description in
+                db.query(Company.name, Product.name, Product.id, Product.description)
+                .join(Product, Product.company_id == Company.id)}
+    assert set(products) == {("Kept Co", "App"), ("Changed Co", "Same"), ("Changed Co", "Edited"),
+                             ("Changed Co", "Added")}
+    # Unchanged and edited products keep their ids
+    for key in (("Kept Co", "App"), ("Changed Co", "Same"), ("Changed Co", "Edited")):
+        assert products[key][0] == product_ids[key]
+    assert products[("Changed Co", "Edited")][1] == "New text"
+
+
+def test_changed_patent_is_not_answered_from_the_previous_analysis(db, company, fake_openai, patent_source):
+    record, write = patent_source
+    ingest_patents(write(), prune=False)
+    first = patent_infringement_check_logic(record["publication_number"], company.name, db, top_n=1)
+    again = patent_infringement_check_logic(record["publication_number"], company.name, db, top_n=1)
+    assert again["infringement_analysis"]["id"] == first["infringement_analysis"]["id"]
+
+    claims = [{"num": "00001", "text": "A mobile device comprising a display and a scanner."}]
+    stats = ingest_patents(write(claims=json.dumps(claims)), prune=False)
+    assert stats["changed patents"] == 1
+    db.expire_all()
+
+    changed = patent_infringement_check_logic(record["publication_number"], company.name, db, top_n=1)
+    assert changed["infringement_analysis"]["id"] != first["infringement_analysis"]["id"]
+
+
+def test_ingest_in_another_process_refreshes_the_indexes(patent_source, monkeypatch):
+    monkeypatch.setattr(invalidation, "DATA_VERSION_CHECK_SECONDS", 0)
+    client = TestClient(main.app)
+    record, write = patent_source
+    path = write()
+    params = {"publication_number": record["publication_number"], "threshold": 100}
+    assert client.get("/patents/search", params=params).status_code == 404
+
+    subprocess.run(
+        [sys.executable, "-c", f"from ingest import ingest_patents; ingest_patents({path!r}, prune=False)"],
+        cwd=BACKEND_DIR, check=True,
+    )
+
+    # The next request notices the new data version and drops the stale index
+    response = client.get("/patents/search", params=params)
+    assert response.status_code == 200
+    assert response.json()["publication_number"] == record["publication_number"]
+
+
+def test_search_answers_404_for_a_patent_removed_behind_the_index(db, patent):
+    client = TestClient(main.app)
+    assert client.get("/patents/search", params={"publication_number": patent.publication_number}).status_code == 200
+
+    # Removed without telling this process, as a pruning ingest elsewhere would before the next check
+    with engine.begin() as conn:
+        conn.execute(delete(Claim.__table__).where(Claim.patent_id == patent.id))
+        conn.execute(delete(Patent.__table__).where(Patent.id == patent.id))
+
+    response = client.get("/patents/search", params={"publication_number": patent.publication_number})
+    assert response.status_code == 404
@@ -0,0 +1,90 @@
+# backend/tests/test_jobs.py
+# Two JobManager instances stand for two uvicorn workers sharing the database
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import jobs
+import main
+from jobs import CANCELLED, FINISHED, RUNNING, JobManager, JobQueueFull
+from models import InfringementAnalysis
+
+
+def _wait_for(manager, analysis_id, statuses, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(analysis_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {analysis_id} is still {job.status}")
+
+
+# A manager whose single job thread is held until release(), so submitted jobs stay queued
+@pytest.fixture
+def busy_manager():
+    manager = JobManager(max_workers=1, max_pending=1)
+    gate = threading.Event()
+    manager._executor.submit(gate.wait)
+
+    def release():
+        gate.set()
+        manager._executor.shutdown(wait=True)
+
+    manager.release = release
+    yield manager
+    release()
+
+
+def test_submitted_job_is_polled_until_its_report(patent, company, fake_openai):
+    client = TestClient(main.app)
+    response = client.post("/patent-infringement", params={
+        "patent_id": patent.publication_number, "company_name": company.name, "top_n": 1, "async_mode": True,
+    })
+    assert response.status_code == 202
+    analysis_id = response.json()["analysis_id"]
+
+    _wait_for(jobs.job_manager, analysis_id, FINISHED)
+    report = client.get(f"/infringement-report/{analysis_id}")
+    assert report.status_code == 200
+    assert report.json()["infringement_analysis"]["id"] == analysis_id
+    assert len(report.json()["infringement_analysis"]["top_infringing_products"]) == 1
+
+
+def test_running_job_is_polled_and_cancelled_from_another_worker(db, patent, company, fake_openai, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CANCEL_CHECK_SECONDS", 0)
+    fake_openai.latency_ms = 300
+    worker, other_worker = JobManager(), JobManager()
+    job = worker.submit(patent.publication_number, company.name, top_n=1)
+
+    polled = _wait_for(other_worker, job.analysis_id, (RUNNING,))
+    assert polled.snapshot()["infringement_analysis"]["patent_id"] == patent.publication_number
+    assert other_worker.cancel(job.analysis_id).status == RUNNING
+
+    assert _wait_for(other_worker, job.analysis_id, FINISHED).status == CANCELLED
+    assert db.get(InfringementAnalysis, job.analysis_id) is None
+
+
+def test_queued_job_cancelled_on_another_worker_never_runs(busy_manager, patent, company, fake_openai):
+    job = busy_manager.submit(patent.publication_number, company.name, top_n=1)
+    assert JobManager().cancel(job.analysis_id).status == CANCELLED
+
+    busy_manager.release()
+    assert busy_manager.get(job.analysis_id).status == CANCELLED
+    assert fake_openai.snapshot()["calls"] == 0
+
+
+def test_submissions_above_the_pending_limit_are_rejected(busy_manager, patent, company, monkeypatch):
+    job = busy_manager.submit(patent.publication_number, company.name, top_n=1)
+    with pytest.raises(JobQueueFull):
+        busy_manager.submit(patent.publication_number, company.name, top_n=1)
+
+    monkeypatch.setattr(main, "job_manager", busy_manager)
+    response = TestClient(main.app).post("/patent-infringement", params={
+        "patent_id": patent.publication_number, "company_name": company.name, "async_mode": True,
+    })
+    assert response.status_code == 429
+
+    assert busy_manager.cancel(job.analysis_id).status == CANCELLED
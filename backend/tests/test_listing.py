@@ -0,0 +1,47 @@
+# backend/tests/test_listing.py
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models import Company, Patent
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(main, "DEFAULT_PAGE_SIZE", 2)
+    db.add_all([Patent(publication_number=f"US-{uuid.uuid4().hex[:10].upper()}-B1", title="Listed") for _ in range(5)])
+    db.add_all([Company(name=f"Company {uuid.uuid4().hex[:8]}") for _ in range(5)])
+    db.commit()
+    return TestClient(main.app)
+
+
+def _pages(client, path, **params):
+    ids = []
+    while True:
+        response = client.get(path, params=params)
+        assert response.status_code == 200
+        ids.extend(row["id"] for row in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            return ids
+        params = {"after": response.headers["X-Next-Cursor"]}
+
+
+@pytest.mark.parametrize("path,model", [("/patents/", Patent), ("/companies/", Company)])
+def test_listing_without_limit_returns_every_row(client, db, path, model):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+    assert sorted(row["id"] for row in response.json()) == sorted(row_id for row_id, in db.query(model.id))
+
+
+@pytest.mark.parametrize("path,model", [("/patents/", Patent), ("/companies/", Company)])
+def test_pages_cover_every_row_once(client, db, path, model):
+    first = client.get(path, params={"limit": 3})
+    assert len(first.json()) == 3
+    # Later pages only pass `after` and get DEFAULT_PAGE_SIZE rows
+    second = client.get(path, params={"after": first.headers["X-Next-Cursor"]})
+    assert len(second.json()) == 2
+
+    assert sorted(_pages(client, path, limit=3)) == sorted(row_id for row_id, in db.query(model.id))
@@ -0,0 +1,138 @@
+# backend/tests/test_llm.py
+# RateLimiter and its parts on a fake clock: sleeping advances the clock instead of waiting
+import httpx
+import openai
+import pytest
+
+import llm
+from llm import AdaptiveConcurrency, RateLimiter, TokenBucket
+
+MESSAGES = [{"role": "user", "content": "Summarize this."}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm, "time", clock)
+    return clock
+
+
+def _error(status, headers=None, body=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, request=request, headers=headers)
+    error_class = openai.RateLimitError if status == 429 else openai.InternalServerError
+    return error_class(f"Simulated error {status}", response=response, body=body)
+
+
+# Raises the given errors in turn, then returns "ok"
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_bucket_makes_callers_wait_until_it_refills(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    # Waiters queue up behind earlier reservations
+    assert bucket.reserve(1) == pytest.approx(2.0)
+    clock.now += 2
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.now += 31
+    assert bucket.reserve(30) == 0
+    # Refills never go past one minute's worth
+    clock.now += 3600
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_adjust_and_pause(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.reserve(50)
+    # The call used 20 fewer tokens than reserved
+    bucket.adjust(-20)
+    assert bucket.reserve(30) == 0
+    bucket.pause(5)
+    assert bucket.reserve(1) == pytest.approx(6.0)
+
+
+def test_limiter_spaces_calls_to_the_request_rate(clock):
+    limiter = RateLimiter(rpm=60, tpm=1_000_000)
+    for _ in range(61):
+        assert limiter.call("test", Flaky(), MESSAGES) == "ok"
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_concurrency_halves_on_throttle_and_grows_back_additively():
+    concurrency = AdaptiveConcurrency(minimum=2, maximum=16)
+    concurrency.on_throttle()
+    assert concurrency.limit == 8
+    concurrency.on_success()
+    assert concurrency.limit == pytest.approx(8 + 1 / 8)
+    for _ in range(3):
+        concurrency.on_throttle()
+    assert concurrency.limit == 2
+    # About one more call in flight per limit's worth of successes, up to the maximum
+    concurrency.on_success()
+    concurrency.on_success()
+    assert concurrency.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    for _ in range(1000):
+        concurrency.on_success()
+    assert concurrency.limit == 16
+
+
+def test_throttled_call_backs_off_and_is_retried(clock):
+    limiter = RateLimiter(rpm=6000, tpm=1_000_000, max_concurrency=16)
+    func = Flaky(_error(429, headers={"retry-after-ms": "1500"}))
+    assert limiter.call("test", func, MESSAGES) == "ok"
+    assert func.calls == 2
+    # The retry waits as long as the API asked, and the requests bucket holds everyone else back as long
+    assert clock.sleeps[0] == 1.5
+    assert sum(clock.sleeps) == pytest.approx(1.5 + 1 / 100)
+    assert limiter.concurrency.limit == pytest.approx(8 + 1 / 8)
+
+
+def test_server_errors_are_retried_with_backoff_up_to_the_limit(clock):
+    limiter = RateLimiter(rpm=6000, tpm=1_000_000, max_retries=3)
+    func = Flaky(*[_error(503) for _ in range(10)])
+    with pytest.raises(openai.InternalServerError):
+        limiter.call("test", func, MESSAGES)
+    assert func.calls == 4
+    assert len(clock.sleeps) == 3
+    assert all(0 <= wait <= llm.LLM_RETRY_BASE_SECONDS * 2 ** attempt for attempt, wait in enumerate(clock.sleeps))
+    # Server errors are not throttling, the concurrency limit stays
+    assert limiter.concurrency.limit == limiter.concurrency.maximum
+
+
+def test_errors_that_waiting_cannot_fix_are_not_retried(clock):
+    limiter = RateLimiter(rpm=6000, tpm=1_000_000)
+    quota = Flaky(_error(429, body={"code": "insufficient_quota", "message": "You exceeded your current quota"}))
+    with pytest.raises(openai.RateLimitError):
+        limiter.call("test", quota, MESSAGES)
+    bad_request = Flaky(ValueError("bad request"))
+    with pytest.raises(ValueError):
+        limiter.call("test", bad_request, MESSAGES)
+    assert quota.calls == bad_request.calls == 1
+    assert clock.sleeps == []
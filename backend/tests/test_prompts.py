@@ -0,0 +1,87 @@
+# backend/tests/test_prompts.py
+import random
+
+import pytest
+
+from prompts import budget_claims, chunk_text, estimate_tokens
+
+
+def _description(seed: int = 1) -> str:
+    rng = random.Random(seed)
+    words = "signal module controller sensor network layer circuit interface processor memory".split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(3, 40))) + "."
+
+    sections = []
+    for heading in ("FIELD OF THE INVENTION", "BACKGROUND", "SUMMARY", "DETAILED DESCRIPTION"):
+        paragraphs = ["\n".join(" ".join(sentence() for _ in range(rng.randint(1, 12))) for _ in range(rng.randint(1, 3)))
+                      for _ in range(rng.randint(1, 6))]
+        sections.append(heading + "\n" + "\n\n".join(paragraphs))
+    # A run without any separator, only a character split can break it
+    sections.append("SEQUENCE LISTING\n" + "ACGT" * 400)
+    return "\n\n".join(sections)
+
+
+def _words(text: str) -> str:
+    return "".join(text.split())
+
+
+@pytest.mark.parametrize("max_tokens", [40, 120, 1000])
+def test_chunks_fit_the_budget_and_keep_all_text(max_tokens):
+    text = _description()
+    chunks = chunk_text(text, max_tokens, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= max_tokens for chunk in chunks)
+    # Nothing is lost or repeated, only whitespace at the cuts differs
+    assert _words("".join(chunks)) == _words(text)
+
+
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(40, 8), (120, 30), (1000, 100)])
+def test_chunks_overlap_as_configured(max_tokens, overlap_tokens):
+    text = _description(2)
+    chunks = chunk_text(text, max_tokens, overlap_tokens)
+    # Without the overlap the chunks are those cut with the remaining budget
+    base = chunk_text(text, max_tokens - overlap_tokens, overlap_tokens=0)
+    assert len(chunks) == len(base)
+    assert chunks[0] == base[0]
+    for previous, chunk, own in zip(base, chunks[1:], base[1:]):
+        assert estimate_tokens(chunk) <= max_tokens
+        assert chunk.endswith(own)
+        overlap = chunk[:-len(own)].removesuffix("\n\n")
+        assert overlap and previous.rstrip().endswith(overlap)
+        assert estimate_tokens(overlap) <= overlap_tokens
+
+
+def test_overlap_must_leave_room_for_text():
+    with pytest.raises(ValueError):
+        chunk_text("text", max_tokens=10, overlap_tokens=10)
+
+
+def _claims():
+    return [
+        {"num": "00001", "text": "A device comprising a sensor and a controller. " * 8},
+        {"num": "00002", "text": "The device of claim 1, wherein the sensor is optical. " * 6},
+        {"num": "00003", "text": "The device of claim 2, wherein the controller is wireless. " * 6},
+        {"num": "00004", "text": "A method of operating a network of sensors. " * 8},
+        {"num": "00005", "text": "The method of claim 4, further comprising a display. " * 6},
+    ]
+
+
+@pytest.mark.parametrize("max_tokens", [200, 300, 400, 10000])
+def test_budget_claims_keeps_order_and_whole_claims(max_tokens):
+    claims = _claims()
+    selected = budget_claims(claims, max_tokens)
+    nums = [claim["num"] for claim in selected]
+    assert nums == sorted(nums)
+    assert all(claim in claims for claim in selected)
+    assert sum(estimate_tokens(claim["text"]) + 3 for claim in selected) <= max_tokens
+    # Independent claims come first when the budget is short
+    assert {"00001", "00004"} <= set(nums)
+
+
+def test_budget_claims_cuts_a_lone_claim_over_the_whole_budget():
+    claims = [{"num": "00001", "text": "A device comprising a sensor. " * 100}]
+    [claim] = budget_claims(claims, max_tokens=50)
+    assert claims[0]["text"].startswith(claim["text"])
+    assert estimate_tokens(claim["text"]) + 3 <= 50
@@ -0,0 +1,62 @@
+# backend/tests/test_ranking.py
+import uuid
+
+import numpy as np
+
+from models import Company, Product
+from ranking import ProductRanker, query_terms
+
+QUERIES = [
+    query_terms(["A mobile device displaying a shopping list with advertisements."]),
+    query_terms(["Autonomous lawn mower with a boundary wire sensor."]),
+    query_terms(["Harvester header height control using a grain sensor and GPS."]),
+]
+
+
+# BM25 weight of every (product, term) pair, by term rather than by the ranker's term ids
+def _weights(ranker, db):
+    matrix, idf, product_ids, vocabulary = ranker.weight_matrix(db)
+    terms = {term_id: term for term, term_id in vocabulary.items()}
+    weights = {}
+    for row, product_id in enumerate(product_ids):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        for term_id, value in zip(matrix.indices[start:end], matrix.data[start:end]):
+            weights[(product_id, terms[term_id])] = value * idf[term_id]
+    return weights
+
+
+def _assert_same_scores(ranker, rebuilt, db):
+    product_ids = [product_id for product_id, in db.query(Product.id)]
+    for query in QUERIES:
+        assert np.allclose(ranker.score(db, product_ids, query), rebuilt.score(db, product_ids, query))
+    incremental, fresh = _weights(ranker, db), _weights(rebuilt, db)
+    assert incremental.keys() == fresh.keys()
+    assert np.allclose([incremental[key] for key in fresh], list(fresh.values()))
+
+
+def test_incremental_updates_score_like_a_rebuilt_ranker(db):
+    company = Company(name=f"Company {uuid.uuid4().hex[:8]}", products=[
+        Product(name="Shopping app", description="Mobile shopping list app with advertisement features"),
+        Product(name="Mower", description="Robotic lawn mower with boundary wire and rain sensor"),
+        Product(name="Combine", description="Combine harvester with automatic header height control"),
+    ])
+    db.add(company)
+    db.commit()
+    ranker = ProductRanker()
+    ranker.warm(db)
+
+    shopping, mower, combine = company.products
+    added = Product(company_id=company.id, name="Tractor", description="GPS guided tractor with grain sensor telemetry")
+    db.add(added)
+    db.delete(mower)
+    combine.description = "Combine harvester with header height control and yield mapping"
+    db.commit()
+    ranker.invalidate({added.id, mower.id, combine.id})
+
+    _assert_same_scores(ranker, ProductRanker(), db)
+
+    # A later removal keeps them in step as well
+    db.delete(shopping)
+    db.commit()
+    ranker.invalidate({shopping.id})
+    _assert_same_scores(ranker, ProductRanker(), db)
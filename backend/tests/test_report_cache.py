@@ -0,0 +1,29 @@
+# backend/tests/test_report_cache.py
+import service
+
+
+def test_new_analysis_keeps_other_cached_reports(db, make_analysis):
+    first = make_analysis()
+    second = make_analysis()
+    service.get_infringement_report_cached(first.id, db)
+    service.get_infringement_report_cached(second.id, db)
+
+    make_analysis()
+
+    assert service.report_cache.get(first.id) is not None
+    assert service.report_cache.get(second.id) is not None
+
+
+def test_rewritten_analysis_drops_only_its_report(db, make_analysis):
+    first = make_analysis()
+    second = make_analysis()
+    service.get_infringement_report_cached(first.id, db)
+    service.get_infringement_report_cached(second.id, db)
+
+    first.overall_risk_assessment = "High risk."
+    db.commit()
+
+    assert service.report_cache.get(first.id) is None
+    assert service.report_cache.get(second.id) is not None
+    body, _ = service.get_infringement_report_cached(first.id, db)
+    assert b"High risk." in body
@@ -0,0 +1,96 @@
+# backend/tests/test_search_index.py
+# The indexed lookups must find what a full fuzz.ratio scan over every key finds (the original
+# implementation), on the shipped fixtures.
+import json
+import os
+
+import pytest
+from rapidfuzz import fuzz
+
+import search_index
+from ingest import ingest_companies
+from search_index import FuzzyIndex, normalize_company_name, normalize_publication_number, token_grams
+from service import search_company_by_name
+
+JSON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "json")
+
+
+def _publication_numbers():
+    with open(os.path.join(JSON_DIR, "patents.json"), encoding="utf-8") as f:
+        return [patent["publication_number"] for patent in json.load(f)]
+
+
+def _company_names():
+    with open(os.path.join(JSON_DIR, "company_products.json"), encoding="utf-8") as f:
+        return [company["name"] for company in json.load(f)["companies"]]
+
+
+def _typos(value: str):
+    yield value
+    yield value.lower()
+    yield value.replace("-", "")
+    yield value[:-1]
+    yield value[1:]
+    yield value[:len(value) // 2] + value[len(value) // 2 + 1:]
+    middle = len(value) // 2
+    yield value[:middle - 1] + value[middle] + value[middle - 1] + value[middle + 1:]
+
+
+# Best score of the full scan, and every key that reaches it
+def _scan(keys, query, threshold):
+    scores = {key: fuzz.ratio(key, query) for key in keys}
+    best = max(scores.values())
+    if round(best) < threshold:
+        return None, set()
+    return best, {key for key, score in scores.items() if score == best}
+
+
+def _assert_parity(index, keys, queries, threshold=60):
+    for query in queries:
+        best, best_keys = _scan(keys, query, threshold)
+        matches = index.search(query, None, threshold)
+        if best is None:
+            assert matches == [], query
+        else:
+            assert matches and matches[0][1] in best_keys, (query, matches, best_keys)
+
+
+# A small MIN_CANDIDATES makes the n-gram narrowing do the work on a corpus this size
+@pytest.mark.parametrize("min_candidates", [search_index.MIN_CANDIDATES, 3])
+def test_patent_index_matches_a_full_scan(monkeypatch, min_candidates):
+    monkeypatch.setattr(search_index, "MIN_CANDIDATES", min_candidates)
+    numbers = _publication_numbers()
+    index = FuzzyIndex(lambda db: list(enumerate(numbers)), normalize_publication_number)
+    queries = [query for number in numbers for query in _typos(number)]
+    queries += ["US-1195", "11950524", "EP-11950524-A1", "XYZ"]
+    _assert_parity(index, numbers, queries)
+
+
+@pytest.mark.parametrize("min_candidates", [search_index.MIN_CANDIDATES, 1])
+def test_company_index_matches_a_full_scan(monkeypatch, min_candidates):
+    monkeypatch.setattr(search_index, "MIN_CANDIDATES", min_candidates)
+    names = _company_names()
+    index = FuzzyIndex(lambda db: list(enumerate(names)), normalize_company_name, token_grams)
+    # Lowercased names are left out: the case-sensitive scan can rank a name that only shares the legal
+    # suffix first, e.g. "Target Corporation" for "agco corporation", which the index ignores on purpose
+    queries = [query for name in names for query in _typos(name) if query == name or query != name.lower()]
+    queries += ["Walmart", "walmart inc", "John Dere", "Kroger", "Target", "Case IH", "irobot", "Amazon"]
+    _assert_parity(index, names, queries)
+    assert index.search("agco corporation", None)[0][1] == "AGCO Corporation"
+
+
+# Names resolved before an ingest are looked up again after it
+def test_company_matches_are_not_reused_after_an_ingest(db, tmp_path):
+    path = tmp_path / "companies.json"
+
+    def write(*names):
+        path.write_text(json.dumps({"companies": [
+            {"name": name, "products": [{"name": "Robot", "description": "A robot"}]} for name in names
+        ]}), encoding="utf-8")
+        return str(path)
+
+    ingest_companies(write("Zyxwv Robot Works"), prune=False)
+    assert search_company_by_name("Zyxwv Robotics", db).name == "Zyxwv Robot Works"
+
+    ingest_companies(write("Zyxwv Robot Works", "Zyxwv Robotics Inc"), prune=False)
+    assert search_company_by_name("Zyxwv Robotics", db).name == "Zyxwv Robotics Inc"
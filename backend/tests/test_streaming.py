@@ -0,0 +1,121 @@
+# backend/tests/test_streaming.py
+import json
+from itertools import groupby
+
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+
+import llm
+import main
+import streaming
+from service import patent_infringement_check_logic
+
+
+@pytest.fixture
+def client(fake_openai):
+    return TestClient(main.app)
+
+
+# (event, data) in the order they were sent
+def _stream(client, patent, company):
+    params = {"patent_id": patent.publication_number, "company_name": company.name, "top_n": 1}
+    with client.stream("POST", "/patent-infringement/stream", params=params) as response:
+        assert response.status_code == 200
+        lines = list(response.iter_lines())
+    events = [line[len("event: "):] for line in lines if line.startswith("event: ")]
+    data = [json.loads(line[len("data: "):]) for line in lines if line.startswith("data: ")]
+    return list(zip(events, data))
+
+
+def _events(client, patent, company):
+    events = _stream(client, patent, company)
+    # risk_assessment arrives in as many pieces as the model streams, compare the sequence of kinds
+    return [event for event, _ in groupby(event for event, _ in events)], dict(events)
+
+
+# Records whether each call to the fake client asked for a stream
+@pytest.fixture
+def streamed(fake_openai, monkeypatch):
+    calls = []
+    create = fake_openai.chat.completions.create
+
+    def record(*args, stream=False, **kwargs):
+        calls.append(stream)
+        return create(*args, stream=stream, **kwargs)
+
+    monkeypatch.setattr(fake_openai.chat.completions, "create", record)
+    return calls
+
+
+def test_reused_analysis_replays_the_events_of_a_fresh_run(client, patent, company):
+    fresh, fresh_data = _events(client, patent, company)
+    reused, reused_data = _events(client, patent, company)
+
+    assert fresh == ["resolved", "ranked", "product", "risk_assessment", "report"]
+    assert reused == fresh
+    assert reused_data["report"] == fresh_data["report"]
+    assert reused_data["ranked"] == fresh_data["ranked"]
+
+
+class _BusyExecutor:
+    def submit(self, *args, **kwargs):
+        pass
+
+
+def test_stream_gives_up_with_an_error_event_when_no_worker_is_free(client, patent, company, monkeypatch):
+    monkeypatch.setattr(streaming, "stream_executor", _BusyExecutor())
+    monkeypatch.setattr(streaming, "STREAM_START_TIMEOUT_SECONDS", 0.05)
+
+    events, data = _events(client, patent, company)
+
+    assert events == ["error"]
+    assert data["error"]["status_code"] == 503
+
+
+def test_only_streamed_checks_stream_the_risk_assessment(client, db, patent, company, streamed):
+    events = []
+    result = patent_infringement_check_logic(patent.publication_number, company.name, db, top_n=1,
+                                             progress=lambda event, data: events.append((event, data)))
+
+    assert True not in streamed
+    risk_assessment = result["infringement_analysis"]["overall_risk_assessment"]
+    assert [data for event, data in events if event == "risk_assessment"] == [risk_assessment]
+
+    streamed.clear()
+    # A changed product set, so the streamed check runs the pipeline instead of reusing the analysis
+    company.products[0].description += " with barcode scanner"
+    db.commit()
+    _stream(client, patent, company)
+    assert streamed.count(True) == 1
+
+
+def test_broken_off_stream_is_retried_and_its_partial_text_dropped(client, patent, company, fake_openai, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_RETRY_BASE_SECONDS", 0)
+    create = fake_openai.chat.completions.create
+    broken = []
+
+    def break_first_stream(*args, stream=False, **kwargs):
+        response = create(*args, stream=stream, **kwargs)
+        if not stream or broken:
+            return response
+
+        def break_off():
+            chunks = iter(response)
+            yield next(chunks)
+            yield next(chunks)
+            broken.append(True)
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+        return break_off()
+
+    monkeypatch.setattr(fake_openai.chat.completions, "create", break_first_stream)
+    events = _stream(client, patent, company)
+
+    names = [event for event, _ in groupby(event for event, _ in events)]
+    assert names == ["resolved", "ranked", "product", "risk_assessment", "risk_assessment_restart",
+                     "risk_assessment", "report"]
+    restart = [event for event, _ in events].index("risk_assessment_restart")
+    retried = "".join(data for event, data in events[restart:] if event == "risk_assessment")
+    assert dict(events)["report"]["infringement_analysis"]["overall_risk_assessment"] == retried.strip()
@@ -0,0 +1,76 @@
+# backend/tests/test_summary_cache.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import summary_cache
+from models import PatentSummary
+from summary_cache import evict, get_summary, store_summary
+
+
+@pytest.fixture
+def summaries(db, monkeypatch):
+    monkeypatch.setattr(summary_cache, "SUMMARY_EVICT_EVERY", 1000)
+    db.query(PatentSummary).delete()
+    db.commit()
+
+    # Store entries and backdate them: {key: (days since created, seconds since last used)}
+    def make(ages):
+        for key in ages:
+            store_summary(key, "model", 100, f"summary {key}")
+        now = datetime.utcnow()
+        for key, (created_days, used_seconds) in ages.items():
+            entry = db.get(PatentSummary, key)
+            entry.created_at = now - timedelta(days=created_days)
+            entry.last_used_at = now - timedelta(seconds=used_seconds)
+        db.commit()
+
+    return make
+
+
+def _keys(db):
+    db.expire_all()
+    return {key for key, in db.query(PatentSummary.key)}
+
+
+def test_expired_summaries_are_misses_and_evicted(db, summaries, monkeypatch):
+    monkeypatch.setattr(summary_cache, "SUMMARY_CACHE_TTL_DAYS", 30)
+    summaries({"fresh": (29, 0), "expired": (31, 0)})
+    assert get_summary("fresh") == "summary fresh"
+    assert get_summary("expired") is None
+    assert evict(db) == 1
+    assert _keys(db) == {"fresh"}
+
+
+def test_least_recently_used_summaries_are_evicted_first(db, summaries, monkeypatch):
+    monkeypatch.setattr(summary_cache, "SUMMARY_CACHE_MAX_ENTRIES", 2)
+    summaries({"a": (0, 3000), "b": (0, 2000), "c": (0, 1000)})
+    # Reading "a" makes it the most recently used
+    assert get_summary("a") == "summary a"
+    assert evict(db) == 1
+    assert _keys(db) == {"a", "c"}
+
+
+def test_recent_hits_do_not_write(db, summaries):
+    summaries({"a": (0, 10)})
+    used = db.get(PatentSummary, "a").last_used_at
+    assert get_summary("a") == "summary a"
+    db.expire_all()
+    assert db.get(PatentSummary, "a").last_used_at == used
+
+    summaries({"a": (0, summary_cache.SUMMARY_TOUCH_INTERVAL_SECONDS + 10)})
+    assert get_summary("a") == "summary a"
+    db.expire_all()
+    assert db.get(PatentSummary, "a").last_used_at > datetime.utcnow() - timedelta(seconds=10)
+
+
+def test_eviction_runs_every_n_stores(db, summaries, monkeypatch):
+    summaries({})
+    monkeypatch.setattr(summary_cache, "SUMMARY_CACHE_MAX_ENTRIES", 1)
+    monkeypatch.setattr(summary_cache, "SUMMARY_EVICT_EVERY", 3)
+    monkeypatch.setattr(summary_cache, "_stores_since_evict", 0)
+    for key in ("a", "b"):
+        store_summary(key, "model", 100, key)
+    assert len(_keys(db)) == 2
+    store_summary("c", "model", 100, "c")
+    assert len(_keys(db)) == 1
@@ -0,0 +1,88 @@
+# backend/app/warmup.py
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class _Step(NamedTuple):
+    name: str
+    func: Callable[[], None]
+    required: bool
+
+
+# Startup work, run in order before the server accepts requests or on a background thread.
+# Required steps (schema, data) must be done before requests get complete answers: the app is then
+# "accepting". The others only take the first-use cost off the first requests: once they are done
+# too the app is "warm".
+class Warmup:
+    def __init__(self):
+        self._steps: List[_Step] = []
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def add(self, name: str, func: Callable[[], None], required: bool = False) -> None:
+        self._steps.append(_Step(name, func, required))
+        self._state[name] = {"status": PENDING, "required": required, "seconds": None, "error": None}
+
+    def _set(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            self._state[name].update(fields)
+
+    # Run the pending steps (only the required ones if required=True). A failed required step
+    # stops the run, since what follows depends on it; a failed optional step is left to first use.
+    def run(self, required: Optional[bool] = None, raise_errors: bool = False) -> None:
+        for step in self._steps:
+            if required is not None and step.required != required:
+                continue
+            if self._state[step.name]["status"] != PENDING:
+                continue
+            self._set(step.name, status=RUNNING)
+            started = time.perf_counter()
+            try:
+                step.func()
+            except Exception as e:
+                self._set(step.name, status=FAILED, seconds=time.perf_counter() - started, error=str(e))
+                if raise_errors:
+                    raise
+                traceback.print_exc()
+                if step.required:
+                    return
+            else:
+                self._set(step.name, status=DONE, seconds=time.perf_counter() - started)
+
+    def start(self, required: Optional[bool] = None) -> threading.Thread:
+        thread = threading.Thread(target=self.run, args=(required,), name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _done(self, required_only: bool) -> bool:
+        return all(
+            state["status"] == DONE for state in self._state.values() if state["required"] or not required_only
+        )
+
+    @property
+    def accepting(self) -> bool:
+        return self._done(required_only=True)
+
+    @property
+    def warm(self) -> bool:
+        return self._done(required_only=False)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: dict(state) for name, state in self._state.items()}
+        return {
+            "status": "warm" if self.warm else "accepting" if self.accepting else "starting",
+            "uptime_seconds": time.perf_counter() - self._started,
+            "steps": steps,
+        }
+
+
+warmup = Warmup()